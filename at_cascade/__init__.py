@@ -58,22 +58,30 @@ constant_table_list = [
    at_cascade/empty_avgint_table.py
    at_cascade/empty_directory.py
    at_cascade/extract_avgint.py
+   at_cascade/fit_multi_host.py
    at_cascade/fit_one_job.py
    at_cascade/fit_one_process.py
    at_cascade/fit_or_root_class.py
    at_cascade/fit_parallel.py
+   at_cascade/get_cascade_context.py
    at_cascade/get_cov_info.py
    at_cascade/get_database_dir.py
    at_cascade/get_fit_children.py
    at_cascade/get_fit_integrand.py
    at_cascade/get_freeze_dict.py
    at_cascade/get_parent_node.py
+   at_cascade/get_smooth_grid_index.py
    at_cascade/get_var_id.py
    at_cascade/job_descendent.py
+   at_cascade/light_command.py
    at_cascade/map_shared.py
    at_cascade/move_table.py
    at_cascade/no_ode_fit.py
    at_cascade/omega_constraint.py
+   at_cascade/stage_resource_class.py
+   at_cascade/subtree_data_count.py
+   at_cascade/sum_stage_resource.py
+   at_cascade/system_command.py
    at_cascade/table_exists.py
    at_cascade/table_name2id.py
 }
@@ -105,22 +113,37 @@ from .data_include          import data_include
 from .empty_avgint_table    import empty_avgint_table
 from .empty_directory       import empty_directory
 from .extract_avgint        import extract_avgint
+from .fit_multi_host        import fit_multi_host
 from .fit_one_job           import fit_one_job
+from .fit_one_job           import prepare_job
 from .fit_one_process       import fit_one_process
+from .fit_one_process       import get_descendant_list
+from .fit_one_process       import run_fit_type_list
 from .fit_or_root_class     import fit_or_root_class
 from .fit_parallel          import fit_parallel
+from .fit_parallel          import get_job_priority
+from .fit_parallel          import get_shared_memory_prefix
+from .get_cascade_context   import get_cascade_context
 from .get_cov_info          import get_cov_info
 from .get_database_dir      import get_database_dir
 from .get_fit_children      import get_fit_children
 from .get_fit_integrand     import get_fit_integrand
 from .get_freeze_dict       import get_freeze_dict
 from .get_parent_node       import get_parent_node
+from .get_smooth_grid_index import get_smooth_grid_index
 from .get_var_id            import get_var_id
 from .job_descendent        import job_descendent
+from .light_command         import light_command
+from .light_command         import run_light_command
 from .map_shared            import map_shared
 from .move_table            import move_table
 from .no_ode_fit            import no_ode_fit
 from .omega_constraint      import omega_constraint
+from .stage_resource_class  import stage_resource_class
+from .subtree_data_count    import subtree_data_count
+from .sum_stage_resource    import sum_stage_resource
+from .system_command        import get_preexec_fn
+from .system_command        import system_command
 from .table_exists          import table_exists
 from .table_name2id         import table_name2id
 # END_SORT_THIS_LINE_MINUS_1
@@ -108,17 +108,17 @@ import at_cascade
 # ----------------------------------------------------------------------------
 # cov_reference_list =
 def get_cov_reference_list(
-   n_covariate, cov_reference_table, node_id, split_reference_id
+   n_covariate, cov_reference_index, node_id, split_reference_id
 ) :
    #
-   #
+   # cov_reference_index[ (node_id, split_reference_id) ]
+   # is the list of cov_reference table rows for this node and reference
    cov_reference_list = n_covariate * [None]
-   for row in cov_reference_table :
-      if row['node_id'] == node_id :
-         if row['split_reference_id'] == split_reference_id :
-            covariate_id = row['covariate_id']
-            if covariate_id < len(cov_reference_list) :
-               cov_reference_list[covariate_id] = row['reference_value']
+   key                = (node_id, split_reference_id)
+   for row in cov_reference_index.get(key, list() ) :
+      covariate_id = row['covariate_id']
+      if covariate_id < len(cov_reference_list) :
+         cov_reference_list[covariate_id] = row['reference_value']
    if None in cov_reference_list :
       covariate_id = cov_reference_list.index(None)
       msg  = 'all_node database: cov_reference table: '
@@ -260,21 +260,14 @@ def avgint_parent_grid(
    # END_DEF
    #
    # option_all_table
-   connection = dismod_at.create_connection(
-      all_node_database, new = False, readonly = True
-   )
-   get_table             = dismod_at.get_table_dict
-   option_all_table      = get_table(connection, 'option_all')
-   node_split_table      = get_table(connection, 'node_split')
-   split_reference_table = get_table(connection, 'split_reference')
-   cov_reference_table   = get_table(connection, 'cov_reference')
-   connection.close()
+   cascade_context       = at_cascade.get_cascade_context(all_node_database)
+   option_all_table      = cascade_context.table('option_all')
+   node_split_table      = cascade_context.table('node_split')
+   split_reference_table = cascade_context.table('split_reference')
+   cov_reference_index   = cascade_context.cov_reference_index
    #
    # root_database
-   root_database      = None
-   for row in option_all_table :
-      if row['option_name'] == 'root_database' :
-         root_database      = row['option_value']
+   root_database = cascade_context.root_database
    assert root_database != None
    #
    # fit_tables
@@ -290,6 +283,7 @@ def avgint_parent_grid(
       'node',
       'option',
       'rate',
+      'smooth',
       'smooth_grid',
       'time',
    ] :
@@ -320,6 +314,13 @@ def avgint_parent_grid(
    # n_covariate
    n_covariate = len( fit_tables['covariate'] )
    #
+   # smooth_grid_index
+   # smooth_grid_index[smooth_id] is the list of fit_tables['smooth_grid'] rows
+   # with the specified smooth_id (in smooth_grid_id order).
+   smooth_grid_index = at_cascade.get_smooth_grid_index(
+      fit_tables['smooth'], fit_tables['smooth_grid']
+   )
+   #
    # parent_node_id
    parent_node_name = None
    for row in fit_tables['option'] :
@@ -349,7 +350,7 @@ def avgint_parent_grid(
       # cov_reference_list
       cov_reference_list = get_cov_reference_list(
          n_covariate,
-         cov_reference_table,
+         cov_reference_index,
          parent_node_id,
          fit_split_reference_id
       )
@@ -367,7 +368,7 @@ def avgint_parent_grid(
          assert shift_node_id == parent_node_id or node_id == parent_node_id
          cov_reference_list = get_cov_reference_list(
             n_covariate,
-            cov_reference_table,
+            cov_reference_index,
             shift_node_id,
             shift_split_reference_id
          )
@@ -440,39 +441,38 @@ def avgint_parent_grid(
          )
          #
          # grid_row
-         for grid_row in fit_tables['smooth_grid'] :
-            if grid_row['smooth_id'] == group_smooth_id :
-               #
-               # age_id
-               age_id    = grid_row['age_id']
-               age_lower = fit_tables['age'][age_id]['age']
-               age_upper = age_lower
-               #
-               # time_id
-               time_id    = grid_row['time_id']
-               time_lower = fit_tables['time'][time_id]['time']
-               time_upper = time_lower
-               #
-               # row
-               node_id            = None
-               subgroup_id        = 0
-               weight_id          = None
-               split_reference_id = None
-               row = [
-                  integrand_id,
-                  node_id,
-                  subgroup_id,
-                  weight_id,
-                  age_lower,
-                  age_upper,
-                  time_lower,
-                  time_upper,
-               ]
-               row += n_covariate * [ None ]
-               row += [ age_id, time_id, split_reference_id ]
-               #
-               # add to row_list
-               row_list.append( row )
+         for grid_row in smooth_grid_index[group_smooth_id] :
+            #
+            # age_id
+            age_id    = grid_row['age_id']
+            age_lower = fit_tables['age'][age_id]['age']
+            age_upper = age_lower
+            #
+            # time_id
+            time_id    = grid_row['time_id']
+            time_lower = fit_tables['time'][time_id]['time']
+            time_upper = time_lower
+            #
+            # row
+            node_id            = None
+            subgroup_id        = 0
+            weight_id          = None
+            split_reference_id = None
+            row = [
+               integrand_id,
+               node_id,
+               subgroup_id,
+               weight_id,
+               age_lower,
+               age_upper,
+               time_lower,
+               time_upper,
+            ]
+            row += n_covariate * [ None ]
+            row += [ age_id, time_id, split_reference_id ]
+            #
+            # add to row_list
+            row_list.append( row )
    #
    # rate_name
    for rate_name in name_rate2integrand :
@@ -493,50 +493,49 @@ def avgint_parent_grid(
          )
          #
          # grid_row
-         for grid_row in fit_tables['smooth_grid'] :
-            if grid_row['smooth_id'] == parent_smooth_id :
+         for grid_row in smooth_grid_index[parent_smooth_id] :
+            #
+            # age_id
+            age_id    = grid_row['age_id']
+            age_lower = fit_tables['age'][age_id]['age']
+            age_upper = age_lower
+            #
+            # prior for pini must use age index zero
+            if rate_name == 'pini' :
+               assert age_id == minimum_age_id
+            #
+            # time_id
+            time_id    = grid_row['time_id']
+            time_lower = fit_tables['time'][time_id]['time']
+            time_upper = time_lower
+            #
+            # key
+            for key in cov_reference_dict :
                #
-               # age_id
-               age_id    = grid_row['age_id']
-               age_lower = fit_tables['age'][age_id]['age']
-               age_upper = age_lower
+               # node_id
+               node_id = key[0]
                #
-               # prior for pini must use age index zero
-               if rate_name == 'pini' :
-                  assert age_id == minimum_age_id
+               # split_reference_id
+               split_reference_id = key[1]
                #
-               # time_id
-               time_id    = grid_row['time_id']
-               time_lower = fit_tables['time'][time_id]['time']
-               time_upper = time_lower
+               # row
+               subgroup_id = 0
+               weight_id   = None
+               row = [
+                  integrand_id,
+                  node_id,
+                  subgroup_id,
+                  weight_id,
+                  age_lower,
+                  age_upper,
+                  time_lower,
+                  time_upper,
+               ]
+               row += cov_reference_dict[key]
+               row += [ age_id, time_id, split_reference_id ]
                #
-               # key
-               for key in cov_reference_dict :
-                  #
-                  # node_id
-                  node_id = key[0]
-                  #
-                  # split_reference_id
-                  split_reference_id = key[1]
-                  #
-                  # row
-                  subgroup_id = 0
-                  weight_id   = None
-                  row = [
-                     integrand_id,
-                     node_id,
-                     subgroup_id,
-                     weight_id,
-                     age_lower,
-                     age_upper,
-                     time_lower,
-                     time_upper,
-                  ]
-                  row += cov_reference_dict[key]
-                  row += [ age_id, time_id, split_reference_id ]
-                  #
-                  # add to row_list
-                  row_list.append( row )
+               # add to row_list
+               row_list.append( row )
    #
    # put new avgint table in fit_database
    connection    = dismod_at.create_connection(
@@ -41,7 +41,8 @@ job_table
 *********
 This is the :ref:`create_job_table@job_table` that we are checking
 the log messages in.
-Only jobs for which :ref:`create_job_table@job_table@prior_only` is false
+Only jobs for which :ref:`create_job_table@job_table@prior_only` and
+:ref:`create_job_table@job_table@no_data` are false
 are included; i.e., only jobs that correspond to fits.
 
 start_job_id
@@ -167,7 +168,8 @@ def check_log(
       else :
          include_this_job = job_depth <= max_job_depth
       if include_this_job :
-         include_this_job = not job_table[job_id]['prior_only']
+         row              = job_table[job_id]
+         include_this_job = not ( row['prior_only'] or row['no_data'] )
       if include_this_job :
          #
          # job_name
@@ -1,6 +1,6 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 # SPDX-FileCopyrightText: University of Washington <https://www.washington.edu>
-# SPDX-FileContributor: 2021-24 Bradley M. Bell
+# SPDX-FileContributor: 2021-25 Bradley M. Bell
 # ----------------------------------------------------------------------------
 r'''
 {xrst_begin create_job_table}
@@ -115,6 +115,20 @@ These priors are intended to be used by a subsequent call to
 :ref:`continue_cascade-name` where this job is the start job
 ( and *prior_only* is false because we have a different *fit_goal_set* ).
 
+no_data
+=======
+This ``bool`` is true if
+:ref:`option_all_table@skip_no_data` is true and
+the :ref:`subtree_data_count@data_count` for this job,
+or for one of its ancestors, is zero.
+Otherwise it is false.
+It is always false for the start job.
+A job with *no_data* true would fail with ``no data: abort``.
+It is not run, and its shift database is not created when its parent is fit.
+It is still in the job table, so the job ids and child ranges
+do not depend on *skip_no_data* and its results can come from the
+nearest ancestor that was fit; e.g., see :ref:`csv.ancestor_fit-name` .
+
 fit_node_id
 ===========
 This is an ``int`` containing the node_id for the
@@ -151,6 +165,10 @@ this job is completed. If end_child_job_id is equal to start_child_job_id,
 there are no jobs that require the results of this job.
 Note that this job is the parent of each job between the start and end,
 
+skip_no_data
+************
+See :ref:`create_job_table@job_table@no_data` .
+
 
 {xrst_end create_job_table}
 '''
@@ -229,6 +247,7 @@ def get_child_job_table(
          row = {
             'job_name'           : job_name,
             'prior_only'         : prior_only,
+            'no_data'            : False,
             'fit_node_id'        : shift_node_id,
             'split_reference_id' : shift_split_reference_id,
             'parent_job_id'      : job_id,
@@ -327,6 +346,19 @@ def create_job_table(
    else :
       refit_split = False
    #
+   # data_count
+   data_count = None
+   if 'skip_no_data' in option_all_dict :
+      skip_no_data = option_all_dict['skip_no_data']
+      if skip_no_data not in [ 'true', 'false' ] :
+         msg  = 'option_all table: skip_no_data = '
+         msg += f'{skip_no_data} is not true or false'
+         assert False, msg
+      if skip_no_data == 'true' :
+         data_count = at_cascade.subtree_data_count(
+            all_node_database, node_table
+         )
+   #
    # root_node_name
    assert 'root_node_name' in option_all_dict
    root_node_name = option_all_dict['root_node_name']
@@ -370,6 +402,7 @@ def create_job_table(
    job_table = [ {
       'job_name'           : job_name,
       'prior_only'         : False,
+      'no_data'            : False,
       'fit_node_id'        : start_node_id,
       'split_reference_id' : start_split_reference_id,
       'parent_job_id'      : None,
@@ -404,6 +437,15 @@ def create_job_table(
             node_table,
          )
          #
+         # child_job_table
+         # mark the jobs that have no data to fit
+         if data_count is not None :
+            for child_row in child_job_table :
+               key = (
+                  child_row['fit_node_id'], child_row['split_reference_id']
+               )
+               child_row['no_data'] = row['no_data'] or data_count[key] == 0
+         #
          # job_table
          row['start_child_job_id'] = len(job_table)
          job_table                += child_job_table
@@ -419,6 +461,7 @@ def create_job_table(
    assert job_table[0]['fit_node_id'] == start_node_id
    assert job_table[0]['split_reference_id'] == start_split_reference_id
    assert job_table[0]['prior_only'] == False
+   assert job_table[0]['no_data'] == False
    for job_id in range(1, len(job_table) ) :
       parent_job_id = job_table[job_id]['parent_job_id']
       assert job_table[parent_job_id]['prior_only'] == False
@@ -111,9 +111,27 @@ The mean of the dage and dtime priors
 are replaced using the corresponding difference in the
 predict tables in the *fit_database*.
 
-Log Table
-=========
-There is no log table in the shifted databases.
+Input Tables
+============
+The shifted databases are created from scratch and only contain the
+dismod_at input tables in *fit_database* .
+The dismod_at output tables (e.g., fit_var and sample),
+the at_cascade tables that begin with ``c_`` (e.g., the
+:ref:`stage_resource_class@c_stage_resource Table` ),
+and the log table are not included.
+The avgint table is empty.
+
+c_warm_start Table
+==================
+If :ref:`option_all_table@warm_start` appears in the option_all table,
+the shifted databases contain a c_warm_start table.
+It has one row for each smoothing grid point that has a value prior
+(is a model variable) and is a fixed effect for the shift node.
+Its columns are smooth_id, age_id, time_id (which identify the grid point
+in the shift database) and warm_value.
+The warm_value is the prediction in the c_shift_predict_fit_var table
+for the grid point, limited to be within the lower and upper limits
+for its value prior.
 
 no_ode_fit
 **********
@@ -131,30 +149,44 @@ job_table
 If *no_ode_fit* is true this argument must be None.
 Otherwise it is the :ref:`create_job_table@job_table` for this cascade.
 
+number_thread
+*************
+This ``int`` is the maximum number of threads used to create the
+shift databases.
+If it is greater than one, the shift databases are created
+at the same time using a pool of threads; i.e., the table construction,
+the SQLite input and output, and the :ref:`omega_constraint-name`
+for different shift databases overlap.
+The values computed from *fit_database* are shared by all the threads
+and only computed once.
+If one of the shift databases cannot be created,
+an exception is raised after all the threads complete.
+The default value for *number_thread* is one.
+
 {xrst_end create_shift_db}
 '''
 # ----------------------------------------------------------------------------
 import os
 import math
 import copy
-import shutil
+import concurrent.futures
 import numpy
 import dismod_at
 import at_cascade
 # ----------------------------------------------------------------------------
 # cov_reference_list =
 def get_cov_reference_list(
-   n_covariate, cov_reference_table, node_id, split_reference_id
+   n_covariate, cov_reference_index, node_id, split_reference_id
 ) :
    #
-   #
+   # cov_reference_index[ (node_id, split_reference_id) ]
+   # is the list of cov_reference table rows for this node and reference
    cov_reference_list = n_covariate * [None]
-   for row in cov_reference_table :
-      if row['node_id'] == node_id :
-         if row['split_reference_id'] == split_reference_id :
-            covariate_id = row['covariate_id']
-            if covariate_id < len(cov_reference_list) :
-               cov_reference_list[covariate_id] = row['reference_value']
+   key                = (node_id, split_reference_id)
+   for row in cov_reference_index.get(key, list() ) :
+      covariate_id = row['covariate_id']
+      if covariate_id < len(cov_reference_list) :
+         cov_reference_list[covariate_id] = row['reference_value']
    if None in cov_reference_list :
       covariate_id = cov_reference_list.index(None)
       msg  = 'all_node database: cov_reference table: '
@@ -166,6 +198,64 @@ def get_cov_reference_list(
    #
    return cov_reference_list
 # ----------------------------------------------------------------------------
+# output_table_set
+# tables that are created by dismod_at commands (not input tables)
+output_table_set = {
+   'age_avg',
+   'bnd_mulcov',
+   'data_sim',
+   'data_subset',
+   'depend_var',
+   'fit_data_subset',
+   'fit_var',
+   'hes_fixed',
+   'hes_random',
+   'log',
+   'mixed_info',
+   'predict',
+   'prior_sim',
+   'sample',
+   'scale_var',
+   'start_var',
+   'trace_fixed',
+   'truth_var',
+   'var',
+}
+# ----------------------------------------------------------------------------
+# create_input_db(fit_database, shift_database, empty_set)
+# Create shift_database containing the input tables in fit_database.
+# The dismod_at output tables, the at_cascade tables (names that begin with
+# c_), and the avgint table are not included. The tables with names in
+# empty_set are created with no rows. The other tables are copied using
+# one INSERT ... SELECT command per table; i.e., the output tables in
+# fit_database are never read or written.
+def create_input_db(fit_database, shift_database, empty_set) :
+   #
+   # connection
+   connection = dismod_at.create_connection(
+      shift_database, new = True, readonly = False
+   )
+   command = 'ATTACH DATABASE ? AS fit'
+   connection.execute(command, (fit_database,) )
+   #
+   # create_list
+   command  = "SELECT name, sql FROM fit.sqlite_master WHERE type = 'table'"
+   create_list = connection.execute(command).fetchall()
+   #
+   # shift_database
+   for (table_name, create_command) in create_list :
+      skip = table_name in output_table_set or table_name == 'avgint'
+      skip = skip or table_name.startswith('c_')
+      if not skip :
+         connection.execute(create_command)
+         if table_name not in empty_set :
+            command  = f'INSERT INTO main.{table_name} '
+            command += f'SELECT * FROM fit.{table_name}'
+            connection.execute(command)
+   connection.commit()
+   connection.execute('DETACH DATABASE fit')
+   connection.close()
+# ----------------------------------------------------------------------------
 def add_index_to_name(table, name_col) :
    row   = table[-1]
    name  = row[name_col]
@@ -240,12 +330,169 @@ def get_time_id_next_list(smooth_table, smooth_grid_table, time_table ) :
       time_id_next_list.append( time_id_dict )
    return time_id_next_list
 # ----------------------------------------------------------------------------
+# fit_std = get_fit_std(
+#  fit_database, fit_table, fit_fit_var, name_rate2integrand,
+#  smooth_grid_index, age_id_next_list, time_id_next_list
+# )
+# fit_std[key] is the standard deviation used by add_shift_grid_row for the
+# value prior at key = (integrand_id, node_id, split_id, age_id, time_id).
+# It is computed with respect to the value prior mean using the samples in the
+# c_shift_predict_sample table for sample_key where sample_key is
+# key with the next time_id, if there is one, otherwise key with the
+# next age_id, if there is one, otherwise key.
+# If the value prior has an eta, the standard deviation is computed in
+# log space and then transformed back. Only keys that correspond to grid
+# points with a value prior are included.
+def get_fit_std(
+   fit_database,
+   fit_table,
+   fit_fit_var,
+   name_rate2integrand,
+   smooth_grid_index,
+   age_id_next_list,
+   time_id_next_list,
+) :
+   #
+   # sample_array
+   # sample_array[avgint_id, sample_index] is the prediction for the
+   # c_shift_avgint row avgint_id and sample sample_index.
+   connection = dismod_at.create_connection(
+      fit_database, new = False, readonly = True
+   )
+   command  = 'SELECT avgint_id, sample_index, avg_integrand '
+   command += 'FROM c_shift_predict_sample'
+   predict  = numpy.array(
+      connection.execute(command).fetchall(), dtype = float
+   )
+   connection.close()
+   if len(predict) == 0 :
+      return dict()
+   avgint_index = predict[:, 0].astype(int)
+   sample_index = predict[:, 1].astype(int)
+   n_avgint     = len( fit_table['c_shift_avgint'] )
+   n_sample     = int( sample_index.max() ) + 1
+   sample_array = numpy.full( (n_avgint, n_sample), numpy.nan )
+   sample_array[avgint_index, sample_index] = predict[:, 2]
+   if len(predict) != n_avgint * n_sample or numpy.isnan(sample_array).any() :
+      msg  = 'create_shift_db: c_shift_predict_sample table does not have '
+      msg += 'one value for each c_shift_avgint row and sample_index'
+      assert False, msg
+   #
+   # integrand2smooth
+   # maps integrand_id to the smooth_id for the corresponding model variables
+   integrand2smooth = dict()
+   for (mulcov_id, mulcov_row) in enumerate( fit_table['mulcov'] ) :
+      if mulcov_row['group_smooth_id'] is not None :
+         integrand_id = at_cascade.table_name2id(
+            fit_table['integrand'], 'integrand', f'mulcov_{mulcov_id}'
+         )
+         integrand2smooth[integrand_id] = mulcov_row['group_smooth_id']
+   for rate_row in fit_table['rate'] :
+      rate_name = rate_row['rate_name']
+      if rate_name in name_rate2integrand :
+         if rate_row['parent_smooth_id'] is not None :
+            integrand_id = at_cascade.table_name2id(
+               fit_table['integrand'],
+               'integrand',
+               name_rate2integrand[rate_name],
+            )
+            integrand2smooth[integrand_id] = rate_row['parent_smooth_id']
+   #
+   # value_prior_id
+   # value_prior_id[ (smooth_id, age_id, time_id) ] is the value prior for
+   # the grid point (None if the grid point has a constant value).
+   value_prior_id = dict()
+   for smooth_id in integrand2smooth.values() :
+      for grid_row in smooth_grid_index[smooth_id] :
+         grid_key = (smooth_id, grid_row['age_id'], grid_row['time_id'])
+         value_prior_id[grid_key] = grid_row['value_prior_id']
+   #
+   # key2avgint
+   key2avgint = dict()
+   for (avgint_id, avgint_row) in enumerate( fit_table['c_shift_avgint'] ) :
+      key = (
+         avgint_row['integrand_id'],
+         avgint_row['node_id'],
+         avgint_row['c_split_reference_id'],
+         avgint_row['c_age_id'],
+         avgint_row['c_time_id'],
+      )
+      key2avgint[key] = avgint_id
+   #
+   # key_list, avgint_list, mean, eta
+   # eta is nan if the value prior does not have an eta
+   key_list    = list()
+   avgint_list = list()
+   mean        = list()
+   eta         = list()
+   for key in key2avgint :
+      (integrand_id, node_id, split_id, age_id, time_id) = key
+      smooth_id = integrand2smooth.get(integrand_id)
+      prior_id  = None
+      if smooth_id is not None :
+         prior_id = value_prior_id.get( (smooth_id, age_id, time_id) )
+      if prior_id is not None and key in fit_fit_var :
+         prior_row = fit_table['prior'][prior_id]
+         #
+         # value
+         value = fit_fit_var[key]
+         if prior_row['lower'] is not None :
+            value = max(value, prior_row['lower'])
+         if prior_row['upper'] is not None :
+            value = min(value, prior_row['upper'])
+         #
+         # sample_key
+         next_age_id  = age_id_next_list[smooth_id][age_id]
+         next_time_id = time_id_next_list[smooth_id][time_id]
+         sample_key = key
+         if next_time_id is not None :
+            sample_key = key[0 : 4] + (next_time_id,)
+         elif next_age_id is not None :
+            sample_key = key[0 : 3] + (next_age_id, time_id)
+         #
+         key_list.append( key )
+         avgint_list.append( key2avgint[sample_key] )
+         mean.append( value )
+         if prior_row['eta'] is None :
+            eta.append( numpy.nan )
+         else :
+            eta.append( prior_row['eta'] )
+   #
+   # std
+   sample = sample_array[avgint_list, :]
+   mean   = numpy.array(mean, dtype = float)
+   eta    = numpy.array(eta, dtype = float)
+   std    = numpy.sqrt(
+      numpy.mean( (sample - mean[:, numpy.newaxis])**2, axis = 1 )
+   )
+   #
+   # std
+   # There is a log trasnformation of variables with an eta before
+   # passing them to cppad_mixed. Hence their values are gaussian in log space.
+   log_row = numpy.logical_not( numpy.isnan(eta) )
+   if numpy.any(log_row) :
+      log_eta    = eta[log_row][:, numpy.newaxis]
+      log_sample = numpy.log(
+         numpy.maximum( - log_eta / 5.0, sample[log_row, :] ) + log_eta
+      )
+      log_mean   = numpy.log( mean[log_row] + eta[log_row] )
+      log_std    = numpy.sqrt( numpy.mean(
+         (log_sample - log_mean[:, numpy.newaxis])**2, axis = 1
+      ) )
+      std[log_row] = (numpy.exp(log_std) - 1) * (mean[log_row] + eta[log_row])
+   #
+   # fit_std
+   fit_std = dict()
+   for (i, key) in enumerate(key_list) :
+      fit_std[key] = float( std[i] )
+   return fit_std
+# ----------------------------------------------------------------------------
 # The smoothing for the new shift_table['smooth_grid'] row is the most
 # recent smoothing added to shift_table['smooth']; i.e., its smoothing_id
 # is len( shift_table['smooth'] ) - 1.
 def add_shift_grid_row(
    fit_fit_var,
-   fit_sample,
+   fit_std,
    fit_table,
    shift_table,
    fit_grid_row,
@@ -257,6 +504,7 @@ def add_shift_grid_row(
    copy_row,
    age_id_next,
    time_id_next,
+   warm_start_list = None,
 ) :
    assert freeze in { 'prior', 'mean', 'no' }
    if freeze == 'prior' :
@@ -332,37 +580,32 @@ def add_shift_grid_row(
             mean                     = max(mean, lower)
             shift_prior_row['mean']  = mean
             #
-            # if no_ode_fit then len(fit_sample) is zero
-            if len(fit_sample) > 0 :
-               #
-               # std
-               eta        = fit_prior_row['eta']
-               if eta is None :
-                  std  = numpy.std(fit_sample[key], mean=mean)
-               else:
-                  # There is a log trasnformation of this variable before
-                  # passing it to cppad_mixed. Hence its value are gaussian
-                  # in log space.
-                  #
-                  # log_sample
-                  log_sample = list()
-                  for sample in fit_sample[key] :
-                     sample = max( - eta / 5.0 , sample )
-                     log_sample.append( math.log( sample + eta ) )
-                  #
-                  # log_std
-                  log_mean = math.log(mean + eta)
-                  log_std  = numpy.std(log_sample, mean = log_mean, ddof = 0)
-                  #
-                  # inverse log transformation
-                  std      = (math.exp(log_std) - 1) * (mean + eta)
+            # if no_ode_fit then len(fit_std) is zero
+            if len(fit_std) > 0 :
                #
                # shift_prior_row['std']
-               shift_prior_row['std']         = shift_prior_std_factor * std
+               # see get_fit_std for the samples used to compute std
+               key = (integrand_id, shift_node_id, split_id, age_id, time_id)
+               std = fit_std[key]
+               shift_prior_row['std'] = shift_prior_std_factor * std
          #
          # shift_table['prior']
          shift_table['prior'].append( shift_prior_row )
          add_index_to_name( shift_table['prior'], 'prior_name' )
+         #
+         # warm_start_list
+         # the fit_var prediction for this grid point, within the limits
+         # of the shift prior (even if the prior is a copy).
+         warm_key = (integrand_id, shift_node_id, split_id, age_id, time_id)
+         if warm_start_list is not None and warm_key in fit_fit_var :
+            warm_value = fit_fit_var[warm_key]
+            if shift_prior_row['lower'] is not None :
+               warm_value = max(warm_value, shift_prior_row['lower'])
+            if shift_prior_row['upper'] is not None :
+               warm_value = min(warm_value, shift_prior_row['upper'])
+            warm_start_list.append( [
+               len( shift_table['smooth'] ) - 1, age_id, time_id, warm_value
+            ] )
    # -----------------------------------------------------------------------
    # dage_prior
    # -----------------------------------------------------------------------
@@ -425,6 +668,7 @@ def create_shift_db(
    shift_databases      ,
    no_ode_fit           = False,
    job_table            = None,
+   number_thread        = 1,
 ) :
    assert type(all_node_database) == str
    assert type(fit_database) == str
@@ -434,30 +678,24 @@ def create_shift_db(
       assert job_table == None
    else :
       assert type(job_table) == list
+   assert type(number_thread) == int
    # END_DEF
    #
    # predict_sample
    predict_sample = not no_ode_fit
    #
-   # all_table
-   connection = dismod_at.create_connection(
-      all_node_database, new = False, readonly = True
-   )
-   all_table  = dict()
+   # cascade_context, all_table
+   cascade_context = at_cascade.get_cascade_context(all_node_database)
+   all_table       = dict()
    for name in [
       'option_all',
       'split_reference',
       'mulcov_freeze',
-      'cov_reference',
    ] :
-      all_table[name] =  dismod_at.get_table_dict(connection, name)
-   connection.close()
+      all_table[name] = cascade_context.table(name)
    #
    # root_database
-   root_database      = None
-   for row in all_table['option_all'] :
-      if row['option_name'] == 'root_database' :
-         root_database      = row['option_value']
+   root_database = cascade_context.root_database
    assert root_database != None
    #
    # shift_prior_std_factor
@@ -488,6 +726,9 @@ def create_shift_db(
       msg += 'is not "mean" or "posterior"'
       assert False, msg
    #
+   # warm_start
+   warm_start = 'warm_start' in cascade_context.option_all_dict
+   #
    # fit_table
    fit_or_root = at_cascade.fit_or_root_class(
       fit_database, root_database
@@ -512,9 +753,6 @@ def create_shift_db(
       'var',
    ] :
       fit_table[name] = fit_or_root.get_table(name)
-   if predict_sample :
-      for name in [ 'c_shift_predict_sample', 'sample' ] :
-         fit_table[name] = fit_or_root.get_table(name)
    fit_or_root.close()
    #
    # age_id_next_list
@@ -527,6 +765,14 @@ def create_shift_db(
       fit_table['smooth'], fit_table['smooth_grid'], fit_table['time']
    )
    #
+   # smooth_grid_index
+   # smooth_grid_index[smooth_id] is the list of fit_table['smooth_grid'] rows
+   # with the specified smooth_id (in smooth_grid_id order).
+   # It is used for all the shift databases.
+   smooth_grid_index = at_cascade.get_smooth_grid_index(
+      fit_table['smooth'], fit_table['smooth_grid']
+   )
+   #
    # name_rate2integrand
    name_rate2integrand = {
       'pini'  : 'prevalence',
@@ -562,21 +808,19 @@ def create_shift_db(
       assert not key in fit_fit_var
       fit_fit_var[key] = predict_row['avg_integrand']
    #
-   # fit_sample
-   fit_sample = dict()
+   # fit_std
+   # The samples are only read once for all the shift databases.
+   fit_std = dict()
    if predict_sample :
-      for predict_row in fit_table['c_shift_predict_sample'] :
-         avgint_id          = predict_row['avgint_id']
-         avgint_row         = fit_table['c_shift_avgint'][avgint_id]
-         integrand_id       = avgint_row['integrand_id']
-         node_id            = avgint_row['node_id']
-         age_id             = avgint_row['c_age_id']
-         time_id            = avgint_row['c_time_id']
-         split_id           = avgint_row['c_split_reference_id']
-         key           = (integrand_id, node_id, split_id, age_id, time_id)
-         if not key in fit_sample :
-            fit_sample[key] = list()
-         fit_sample[key].append( predict_row['avg_integrand'] )
+      fit_std = get_fit_std(
+         fit_database,
+         fit_table,
+         fit_fit_var,
+         name_rate2integrand,
+         smooth_grid_index,
+         age_id_next_list,
+         time_id_next_list,
+      )
    #
    # fit_node_name
    fit_node_name = None
@@ -590,7 +834,11 @@ def create_shift_db(
    fit_node_id = at_cascade.table_name2id(
       fit_table['node'], 'node', fit_node_name
    )
-   for shift_name in shift_databases :
+   #
+   # create_one_shift_db
+   # This routine is called by more than one thread at the same time, so it
+   # must not change any of the values that are shared between calls.
+   def create_one_shift_db(shift_name) :
       # ---------------------------------------------------------------------
       # create shift_databases[shift_name]
       # ---------------------------------------------------------------------
@@ -611,6 +859,12 @@ def create_shift_db(
       shift_table['nslist']      = list()
       shift_table['nslist_pair'] = list()
       #
+      # warm_start_list
+      if warm_start :
+         warm_start_list = list()
+      else :
+         warm_start_list = None
+      #
       # shift_node_name, shift_split_reference_name
       shift_node_name            = None
       shift_split_reference_name = None
@@ -655,9 +909,10 @@ def create_shift_db(
             all_table['mulcov_freeze'],
          )
       #
-      # shift_database     = fit_database
+      # shift_database
+      # the shift_table tables are empty and replaced below
       shift_database = shift_databases[shift_name]
-      shutil.copyfile(fit_database, shift_database)
+      create_input_db(fit_database, shift_database, set(shift_table) )
       #
       # shift_table['option']
       # Set value for parent_node_name and other_database
@@ -678,7 +933,7 @@ def create_shift_db(
       n_covariate = len( fit_table['covariate'] )
       cov_reference_list = get_cov_reference_list(
          n_covariate,
-         all_table['cov_reference'],
+         cascade_context.cov_reference_index,
          shift_node_id,
          shift_split_reference_id
       )
@@ -765,23 +1020,23 @@ def create_shift_db(
             # add rows for this smoothing
             node_id  = None
             split_id = None
-            for fit_grid_row in fit_table['smooth_grid'] :
-               if fit_grid_row['smooth_id'] == fit_smooth_id :
-                  add_shift_grid_row(
-                     fit_fit_var,
-                     fit_sample,
-                     fit_table,
-                     shift_table,
-                     fit_grid_row,
-                     integrand_id,
-                     node_id,
-                     split_id,
-                     shift_prior_std_factor_mulcov,
-                     freeze,
-                     copy_row,
-                     age_id_next_list[fit_smooth_id],
-                     time_id_next_list[fit_smooth_id],
-                  )
+            for fit_grid_row in smooth_grid_index[fit_smooth_id] :
+               add_shift_grid_row(
+                  fit_fit_var,
+                  fit_std,
+                  fit_table,
+                  shift_table,
+                  fit_grid_row,
+                  integrand_id,
+                  node_id,
+                  split_id,
+                  shift_prior_std_factor_mulcov,
+                  freeze,
+                  copy_row,
+                  age_id_next_list[fit_smooth_id],
+                  time_id_next_list[fit_smooth_id],
+                  warm_start_list,
+               )
 
       # --------------------------------------------------------------------
       # shift_table['rate']
@@ -838,23 +1093,23 @@ def create_shift_db(
             #
             # shift_table['smooth_grid']
             # add rows for this smoothing
-            for fit_grid_row in fit_table['smooth_grid'] :
-               if fit_grid_row['smooth_id'] == fit_smooth_id :
-                  add_shift_grid_row(
-                     fit_fit_var,
-                     fit_sample,
-                     fit_table,
-                     shift_table,
-                     fit_grid_row,
-                     integrand_id,
-                     shift_node_id,
-                     shift_split_reference_id,
-                     shift_prior_std_factor,
-                     freeze,
-                     copy_row,
-                     age_id_next_list[fit_smooth_id],
-                     time_id_next_list[fit_smooth_id],
-                  )
+            for fit_grid_row in smooth_grid_index[fit_smooth_id] :
+               add_shift_grid_row(
+                  fit_fit_var,
+                  fit_std,
+                  fit_table,
+                  shift_table,
+                  fit_grid_row,
+                  integrand_id,
+                  shift_node_id,
+                  shift_split_reference_id,
+                  shift_prior_std_factor,
+                  freeze,
+                  copy_row,
+                  age_id_next_list[fit_smooth_id],
+                  time_id_next_list[fit_smooth_id],
+                  warm_start_list,
+               )
          # ----------------------------------------------------------------
          # fit_smooth_id
          fit_smooth_id = None
@@ -881,29 +1136,28 @@ def create_shift_db(
             shift_rate_row['child_smooth_id'] = shift_smooth_id
             #
             # add rows for this smoothing to shift_table['smooth_grid']
-            for fit_grid_row in fit_table['smooth_grid'] :
-               if fit_grid_row['smooth_id'] == fit_smooth_id :
-                  #
-                  # update: shift_table['smooth_grid']
-                  shift_grid_row = copy.copy( fit_grid_row )
-                  #
-                  for ty in [
-                     'value_prior_id', 'dage_prior_id', 'dtime_prior_id'
-                         ] :
-                     prior_id  = fit_grid_row[ty]
-                     if prior_id is None :
-                        shift_grid_row[ty] = None
-                     else :
-                        prior_row = fit_table['prior'][prior_id]
-                        prior_row = copy.copy(prior_row)
-                        prior_id  = len( shift_table['prior'] )
-                        shift_table['prior'].append( prior_row )
-                        add_index_to_name(
-                           shift_table['prior'], 'prior_name'
-                        )
-                        shift_grid_row[ty] = prior_id
-                  shift_grid_row['smooth_id']      = shift_smooth_id
-                  shift_table['smooth_grid'].append( shift_grid_row )
+            for fit_grid_row in smooth_grid_index[fit_smooth_id] :
+               #
+               # update: shift_table['smooth_grid']
+               shift_grid_row = copy.copy( fit_grid_row )
+               #
+               for ty in [
+                  'value_prior_id', 'dage_prior_id', 'dtime_prior_id'
+                      ] :
+                  prior_id  = fit_grid_row[ty]
+                  if prior_id is None :
+                     shift_grid_row[ty] = None
+                  else :
+                     prior_row = fit_table['prior'][prior_id]
+                     prior_row = copy.copy(prior_row)
+                     prior_id  = len( shift_table['prior'] )
+                     shift_table['prior'].append( prior_row )
+                     add_index_to_name(
+                        shift_table['prior'], 'prior_name'
+                     )
+                     shift_grid_row[ty] = prior_id
+               shift_grid_row['smooth_id']      = shift_smooth_id
+               shift_table['smooth_grid'].append( shift_grid_row )
       #
       # shift_connection
       new        = False
@@ -918,17 +1172,42 @@ def create_shift_db(
       # empty_avgint_table
       at_cascade.empty_avgint_table(shift_connection)
       #
-      # drop the following tables:
-      # log, c_shift_avgint, c_shift_predict_sample, c_shift_predict_fit_var
-      drop_list = [ 'log', 'c_shift_avgint' , 'c_shift_predict_fit_var' ]
-      if predict_sample :
-         drop_list.append(  'c_shift_predict_sample' )
-      for table_name in drop_list :
-         command  = f'DROP TABLE {table_name}'
-         dismod_at.sql_command(shift_connection, command)
+      # log
+      # empty_avgint_table adds an entry to the log table
+      command = 'DROP TABLE IF EXISTS log'
+      dismod_at.sql_command(shift_connection, command)
+      #
+      # c_warm_start
+      if warm_start :
+         col_name = [ 'smooth_id', 'age_id', 'time_id', 'warm_value' ]
+         col_type = [ 'integer',   'integer', 'integer', 'real' ]
+         dismod_at.create_table(
+            shift_connection,
+            'c_warm_start',
+            col_name,
+            col_type,
+            warm_start_list,
+         )
       #
       # shift_connection
       shift_connection.close()
       #
       # shift_database
       at_cascade.omega_constraint(all_node_database, shift_database)
+   #
+   # shift_databases
+   number_thread = min(number_thread, len(shift_databases) )
+   if number_thread <= 1 :
+      for shift_name in shift_databases :
+         create_one_shift_db(shift_name)
+   else :
+      with concurrent.futures.ThreadPoolExecutor(number_thread) as executor :
+         future_list = list()
+         for shift_name in shift_databases :
+            future = executor.submit(create_one_shift_db, shift_name)
+            future_list.append( future )
+         #
+         # raise the exception (if any) for the first shift database that
+         # failed
+         for future in future_list :
+            future.result()
@@ -1,6 +1,6 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 # SPDX-FileCopyrightText: University of Washington <https://www.washington.edu>
-# SPDX-FileContributor: 2024 Bradley M. Bell
+# SPDX-FileContributor: 2024-25 Bradley M. Bell
 r'''
 {xrst_begin data_include}
 
@@ -26,6 +26,13 @@ root_database
 This is the root node database. It contains the dismod_at tables
 that are the same for all the fits in the cascade.
 
+limit
+*****
+If *limit* is None, all the rows that are included in the fit are returned.
+Otherwise, it is a positive ``int`` and at most *limit* rows are returned.
+For example, if *limit* is one, the return value can be used to check
+if there is any data for the fit without reading all of the data table.
+
 data_include_table
 ******************
 This is the rows of the data table that are included in the fit; i.e.,
@@ -33,22 +40,31 @@ the rows that satisfy the following conditions:
 
 #. The node is the node being fit or a descendant of the node being fit.
 #. All the covariates are within their maximum difference limits.
-#. The hold_out value in the data table is zero
-#. The corresponding hold_out value in the data_subset table is zero.
+#. The hold_out value in the data table is zero (or null).
+#. The corresponding hold_out value in the data_subset table is zero
+   (or null).
 #. The corresponding integrand is not in the option table hold_out list.
 
+The rows are in the same order as in the data_subset table.
+These conditions are checked by an SQL query that joins the
+data_subset table in *fit_database* to the data table in *root_database* ,
+so the data table is not converted to python.
+
 {xrst_end data_include}
 '''
 import at_cascade
+import dismod_at
 #
 # BEGIN_DEF
 # at_cascade.data_include
 def data_include(
    fit_database,
-   root_database
+   root_database,
+   limit = None,
 ) :
    assert type( fit_database ) == str
    assert type( root_database ) == str
+   assert limit == None or ( type(limit) == int and limit > 0 )
    # END_DEF
    #
    # fit_or_root
@@ -56,12 +72,6 @@ def data_include(
       fit_database, root_database
    )
    #
-   # data_subset_table
-   data_subset_table = fit_or_root.get_table('data_subset')
-   #
-   # data_table
-   data_table = fit_or_root.get_table('data')
-   #
    # integrand_table
    integrand_table = fit_or_root.get_table('integrand')
    #
@@ -89,32 +99,43 @@ def data_include(
       )
       hold_out_id_set.add(integrand_id)
    #
+   # command
+   command  = 'SELECT root_db.data.* FROM data_subset '
+   command += 'JOIN root_db.data '
+   command += 'ON data_subset.data_id = root_db.data.data_id '
+   # a null hold_out value is the same as zero
+   command += 'WHERE IFNULL(data_subset.hold_out, 0) = 0 '
+   command += 'AND IFNULL(root_db.data.hold_out, 0) = 0 '
+   if len( hold_out_id_set ) > 0 :
+      id_list  = ','.join( [ str(i) for i in sorted(hold_out_id_set) ] )
+      command += f'AND root_db.data.integrand_id NOT IN ({id_list}) '
+   command += 'ORDER BY data_subset.data_subset_id'
+   if limit != None :
+      command += f' LIMIT {limit}'
+   #
+   # cursor
+   connection = dismod_at.create_connection(
+      fit_database, new = False, readonly = True
+   )
+   connection.execute( 'ATTACH DATABASE ? AS root_db', (root_database,) )
+   cursor     = connection.execute(command)
+   #
    # data_include_table
+   # Like dismod_at.get_table_dict, the data_id column is not included.
+   col_name_list      = [ col[0] for col in cursor.description ]
    data_include_table = list()
-   for subset_row in data_subset_table :
-      #
-      # data_id
-      data_id = subset_row['data_id']
-      #
-      # data_row
-      data_row = data_table[data_id]
-      #
-      # integrand_id
-      integrand_id = data_row['integrand_id']
-      #
-      # hold_out
-      hold_out = integrand_id in hold_out_id_set
-      hold_out = hold_out or bool( data_row['hold_out'] )
-      hold_out = hold_out or bool( subset_row['hold_out'] )
-      #
-      # data_include_table
-      if not hold_out :
-         data_include_table.append(data_row)
+   for result in cursor.fetchall() :
+      data_row = dict()
+      for (col_name, value) in zip(col_name_list, result) :
+         if col_name != 'data_id' :
+            data_row[col_name] = value
+      data_include_table.append(data_row)
+   connection.close()
    #
    # BEGIN_RETURN
    assert type( data_include_table ) == list
    if len( data_include_table ) > 0 :
       assert type( data_include_table[0] ) == dict
-      assert data_include_table[0]['hold_out'] == 0
+      assert not data_include_table[0]['hold_out']
    return data_include_table
    # END_RETURN
@@ -0,0 +1,402 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: University of Washington <https://www.washington.edu>
+# SPDX-FileContributor: 2021-25 Bradley M. Bell
+# ----------------------------------------------------------------------------
+'''
+{xrst_begin fit_multi_host}
+{xrst_spell
+  pid
+}
+
+Fit Using a Job Queue on a Shared File System
+#############################################
+
+Prototype
+*********
+{xrst_literal
+   # BEGIN_DEF
+   # END_DEF
+}
+
+Purpose
+*******
+The :ref:`fit_parallel-name` routine can only use the cpus on one machine.
+This routine runs jobs from a job queue database that is stored in
+:ref:`option_all_table@result_dir` .
+Any number of processes, on any number of hosts that share the file system
+containing *result_dir* , can call fit_multi_host at the same time
+with the same arguments.
+Each such call runs one job at a time, and returns when there are
+no jobs that are ready or running.
+To use more than one cpu on a host, start more than one process on that
+host that calls fit_multi_host.
+
+scratch_dir
+***********
+The :ref:`option_all_table@scratch_dir` option must be in the
+option_all table.
+Each process runs its jobs in its own copy of the job's databases
+and only copies them to *result_dir* if it still owns the job;
+see :ref:`fit_multi_host@stale_seconds` .
+
+job_table
+*********
+This is a :ref:`create_job_table@job_table` containing all the jobs
+necessary to fit the :ref:`glossary@fit_goal_set` .
+
+start_job_id
+************
+This is the :ref:`create_job_table@job_table@job_id`
+for the starting job.
+
+all_node_database
+*****************
+:ref:`fit_one_job@all_node_database`
+
+node_table
+**********
+:ref:`fit_one_job@node_table`
+
+fit_integrand
+*************
+:ref:`fit_one_job@fit_integrand`
+
+skip_start_job
+**************
+If this is true (false) the job corresponding to *start_job_id*
+will be skipped (will not be skipped).
+If this argument is true, the start job must have already been run.
+
+fit_type_list
+*************
+This is a list with one or two elements
+and its possible elements are ``both`` and ``fixed``.
+For each job, the first type of fit is attempted.
+If it fails, and there is a second type of fit, it is attempted.
+If it also fails, the corresponding job fails.
+
+shared_unique
+*************
+The job queue database is
+
+|  *result_dir*\ ``/job_queue`` *shared_memory_prefix* _ *job_name*
+   *shared_unique* ``.db``
+
+where *job_name* is *job_table* [ *start_job_id* ] [ ``"job_name"`` ]
+and :ref:`option_all_table@shared_memory_prefix` is specified
+in the option all table.
+All the calls that are working on the same cascade must use the same
+value for *shared_unique* .
+If the job queue database exists when fit_multi_host is called,
+it is used (it is not recreated).
+It is suggested that you remove this file before starting a new cascade.
+
+heartbeat_seconds
+*****************
+While a process is running a job, it updates the heartbeat time
+for the job in the queue every *heartbeat_seconds* seconds.
+If an update fails (e.g., the job queue database is locked),
+it is retried every second until it succeeds.
+
+stale_seconds
+*************
+If the heartbeat time for a job that is running is more than
+*stale_seconds* seconds old, the process that was running the job is
+assumed to have died and the job is made ready to run again.
+This must be larger than the worst case time between heartbeats;
+i.e., *heartbeat_seconds* plus the time an update can wait for
+the job queue database lock (up to 600 seconds)
+plus any delay in the shared file system.
+If the process that was running a reclaimed job is still running,
+it does not copy its databases to *result_dir* and
+its result is ignored by the job queue.
+The job is then run again by the process that reclaimed it.
+
+poll_seconds
+************
+If there are jobs running, but no jobs ready to run,
+this process waits *poll_seconds* seconds before checking the
+queue again.
+
+job_queue Table
+***************
+The job_queue table in the job queue database has the following columns:
+
+.. csv-table::
+   :header-rows: 1
+
+   Column,        Type,    Meaning
+   job_queue_id,  integer, :ref:`create_job_table@job_table@job_id`
+   job_name,      text,    :ref:`create_job_table@job_table@job_name`
+   parent_job_id, integer, :ref:`create_job_table@job_table@parent_job_id`
+   job_status,    text,    see :ref:`fit_one_process@job_status_name`
+   priority,      real,    see :ref:`option_all_table@job_priority`
+   owner,         text,    *host_name*\ ``:``\ *pid* for the running process
+   heartbeat,     integer, unix time of last heartbeat for a running job
+
+All the changes to this table are done using SQLite immediate transactions,
+so a job is claimed by only one process.
+Note that the file locking that SQLite depends on must work on
+the shared file system.
+
+trace.out
+*********
+The standard output for each job is written to a file called
+``trace.out`` in the same directory as the database for the job.
+
+{xrst_end fit_multi_host}
+'''
+# ----------------------------------------------------------------------------
+import os
+import time
+import socket
+import sqlite3
+import threading
+import at_cascade
+import dismod_at
+# ----------------------------------------------------------------------------
+# connection = queue_connection(job_queue_db)
+# Uses autocommit mode so that each transaction is started explicitly
+# with BEGIN IMMEDIATE.
+def queue_connection(job_queue_db) :
+   connection = sqlite3.connect(
+      job_queue_db, timeout = 600.0, isolation_level = None
+   )
+   return connection
+# ----------------------------------------------------------------------------
+# BEGIN_DEF
+# at_cascade.fit_multi_host
+def fit_multi_host(
+   job_table                  ,
+   start_job_id               ,
+   all_node_database          ,
+   node_table                 ,
+   fit_integrand              ,
+   skip_start_job             ,
+   fit_type_list              ,
+   shared_unique              ,
+   heartbeat_seconds  = 60.0  ,
+   stale_seconds      = 600.0 ,
+   poll_seconds       = 10.0  ,
+) :
+   #
+   assert type(job_table)         == list
+   assert type(start_job_id)      == int
+   assert type(all_node_database) == str
+   assert type(node_table)        == list
+   assert type(fit_integrand)     == set
+   assert type(skip_start_job)    == bool
+   assert type(fit_type_list)     == list
+   assert type(shared_unique)     == str
+   assert type(heartbeat_seconds) == float
+   assert type(stale_seconds)     == float
+   assert type(poll_seconds)      == float
+   # END_DEF
+   #
+   # option_all_dict
+   cascade_context = at_cascade.get_cascade_context(all_node_database)
+   option_all_dict = cascade_context.option_all_dict
+   #
+   # scratch_dir
+   if 'scratch_dir' not in option_all_dict :
+      msg  = 'fit_multi_host: scratch_dir is not in the option_all table'
+      assert False, msg
+   #
+   # job_queue_db
+   result_dir           = option_all_dict['result_dir']
+   shared_memory_prefix = at_cascade.get_shared_memory_prefix(
+      all_node_database
+   )
+   start_name   = job_table[start_job_id]['job_name']
+   job_queue_db = \
+      f'{result_dir}/job_queue{shared_memory_prefix}_{start_name}'
+   job_queue_db += f'{shared_unique}.db'
+   #
+   # owner
+   owner = f'{socket.gethostname()}:{os.getpid()}'
+   #
+   # connection
+   connection = queue_connection(job_queue_db)
+   #
+   # job_queue table
+   # The first process to get here initializes the table.
+   connection.execute('BEGIN IMMEDIATE')
+   cmd  = 'create table if not exists job_queue('
+   cmd += 'job_queue_id  integer primary key,'
+   cmd += 'job_name      text,'
+   cmd += 'parent_job_id integer,'
+   cmd += 'job_status    text,'
+   cmd += 'priority      real,'
+   cmd += 'owner         text,'
+   cmd += 'heartbeat     integer)'
+   connection.execute(cmd)
+   n_row = connection.execute('select count(*) from job_queue').fetchone()[0]
+   if n_row == 0 :
+      job_priority = at_cascade.get_job_priority(
+         option_all_dict, node_table, job_table
+      )
+      row_list     = list()
+      for (job_id, row) in enumerate(job_table) :
+         if row['prior_only'] or row['no_data'] :
+            job_status = 'skip'
+         elif job_id == start_job_id and skip_start_job :
+            job_status = 'done'
+         elif job_id == start_job_id :
+            job_status = 'ready'
+         elif skip_start_job and row['parent_job_id'] == start_job_id :
+            job_status = 'ready'
+         else :
+            job_status = 'wait'
+         row_list.append( (
+            job_id,
+            row['job_name'],
+            row['parent_job_id'],
+            job_status,
+            float( job_priority[job_id] ),
+         ) )
+      cmd  = 'insert into job_queue'
+      cmd += ' (job_queue_id,job_name,parent_job_id,job_status,priority)'
+      cmd += ' values (?,?,?,?,?)'
+      connection.executemany(cmd, row_list)
+   else :
+      cmd    = 'select job_name from job_queue order by job_queue_id'
+      result = connection.execute(cmd).fetchall()
+      ok     = len(result) == len(job_table)
+      for (job_id, row) in enumerate(result) :
+         ok = ok and row[0] == job_table[job_id]['job_name']
+      if not ok :
+         connection.execute('ROLLBACK')
+         msg  = f'fit_multi_host: {job_queue_db}\n'
+         msg += 'job_queue table does not correspond to job_table'
+         assert False, msg
+   connection.execute('COMMIT')
+   #
+   while True :
+      #
+      # claim a job
+      connection.execute('BEGIN IMMEDIATE')
+      now = int( time.time() )
+      #
+      # reclaim the jobs whose owner has not had a heartbeat
+      cmd  = "update job_queue set job_status = 'ready', owner = null "
+      cmd += "where job_status = 'run' and heartbeat < ?"
+      connection.execute(cmd, ( now - int(stale_seconds), ) )
+      #
+      # job_id
+      cmd  = "select job_queue_id from job_queue where job_status = 'ready' "
+      cmd += 'order by priority desc, job_queue_id limit 1'
+      result = connection.execute(cmd).fetchone()
+      if result == None :
+         job_id = None
+         cmd    = "select count(*) from job_queue where job_status = 'run'"
+         n_run  = connection.execute(cmd).fetchone()[0]
+      else :
+         job_id = result[0]
+         cmd  = "update job_queue set job_status = 'run', owner = ?, "
+         cmd += 'heartbeat = ? where job_queue_id = ?'
+         connection.execute(cmd, (owner, now, job_id) )
+      connection.execute('COMMIT')
+      #
+      if job_id == None :
+         if n_run == 0 :
+            # no jobs running or ready
+            connection.close()
+            return
+         #
+         # wait for a running job to finish or become stale
+         time.sleep(poll_seconds)
+      else :
+         #
+         # heartbeat_thread
+         # If an update fails, it is retried after one second.
+         stop_heartbeat = threading.Event()
+         def heartbeat() :
+            heartbeat_connection = None
+            wait_seconds         = heartbeat_seconds
+            while not stop_heartbeat.wait(wait_seconds) :
+               try :
+                  if heartbeat_connection is None :
+                     heartbeat_connection = queue_connection(job_queue_db)
+                  cmd  = 'update job_queue set heartbeat = ? '
+                  cmd += 'where job_queue_id = ? and owner = ?'
+                  heartbeat_connection.execute(
+                     cmd, ( int( time.time() ), job_id, owner )
+                  )
+                  wait_seconds = heartbeat_seconds
+               except Exception as error :
+                  msg  = f'fit_multi_host: {owner} heartbeat for '
+                  msg += f'job {job_id} failed: {error}'
+                  print( msg )
+                  wait_seconds = min(1.0, heartbeat_seconds)
+            if heartbeat_connection is not None :
+               heartbeat_connection.close()
+         heartbeat_thread = threading.Thread(target = heartbeat)
+         heartbeat_thread.start()
+         #
+         # publish_check
+         # Check that this process still owns the job and update its
+         # heartbeat so that it is not reclaimed while being published.
+         def publish_check() :
+            check_connection = queue_connection(job_queue_db)
+            check_connection.execute('BEGIN IMMEDIATE')
+            cmd    = "select owner, job_status from job_queue "
+            cmd   += 'where job_queue_id = ?'
+            result = check_connection.execute(cmd, (job_id,) ).fetchone()
+            ok     = result == (owner, 'run')
+            if ok :
+               cmd  = 'update job_queue set heartbeat = ? '
+               cmd += 'where job_queue_id = ?'
+               check_connection.execute(cmd, ( int( time.time() ), job_id) )
+            check_connection.execute('COMMIT')
+            check_connection.close()
+            return ok
+         #
+         # job_done, fit_type
+         use_trace_file     = True
+         speculative        = False
+         job_done, fit_type = at_cascade.run_fit_type_list(
+            job_table,
+            job_id,
+            all_node_database,
+            node_table,
+            fit_integrand,
+            fit_type_list,
+            use_trace_file,
+            speculative,
+            publish_check = publish_check,
+         )
+         #
+         # heartbeat_thread
+         stop_heartbeat.set()
+         heartbeat_thread.join()
+         #
+         # descendant_list
+         descendant_list = list()
+         if not job_done :
+            descendant_list = at_cascade.get_descendant_list(
+               job_table, job_id
+            )
+         #
+         # job_queue
+         connection.execute('BEGIN IMMEDIATE')
+         cmd    = 'select owner from job_queue where job_queue_id = ?'
+         result = connection.execute(cmd, (job_id,) ).fetchone()
+         if result[0] != owner :
+            # this job was reclaimed by another process
+            print( f'fit_multi_host: {owner} lost job {job_id}' )
+         elif job_done :
+            cmd  = "update job_queue set job_status = 'done' "
+            cmd += 'where job_queue_id = ?'
+            connection.execute(cmd, (job_id,) )
+            cmd  = "update job_queue set job_status = 'ready' "
+            cmd += "where parent_job_id = ? and job_status = 'wait'"
+            connection.execute(cmd, (job_id,) )
+         else :
+            cmd  = "update job_queue set job_status = 'error' "
+            cmd += 'where job_queue_id = ?'
+            connection.execute(cmd, (job_id,) )
+            cmd  = "update job_queue set job_status = 'abort' "
+            cmd += "where job_queue_id = ? and job_status != 'skip'"
+            for descendant_id in descendant_list :
+               connection.execute(cmd, (descendant_id,) )
+         connection.execute('COMMIT')
@@ -21,7 +21,9 @@ Prototype
 
 Default Value
 *************
-The only argument that can be None is *trace_file_obj*.
+The only arguments that can be None are *trace_file_obj* ,
+*speculative_fit_type* , *prepared* , *memory_limit* , and *publish_check* .
+The default value for *idle_cpu* is zero.
 
 job_table
 *********
@@ -66,6 +68,66 @@ If this argument is not None, it is a ``io.TextIOBase`` object
 corresponding to a file that is opened for writing the tracing output
 for this job.
 
+speculative_fit_type
+********************
+If this argument is not None, it is a fit type ( ``both`` or ``fixed`` )
+that is different from *fit_type* .
+In this case, while the dismod_at fit command for *fit_type* runs,
+a fit of type *speculative_fit_type* is run on a copy of *fit_database* .
+If the *fit_type* fit succeeds, the speculative fit is killed.
+Otherwise, if the speculative fit succeeds, its result replaces
+*fit_database* and the rest of this job uses *speculative_fit_type* .
+If both fits fail, this routine raises an exception
+with a message that starts with ``speculative fit failed`` .
+The output of both fits is written to *trace_file_obj*
+(standard output when *trace_file_obj* is None).
+
+prepared
+********
+If this argument is not None, it is the value returned by
+``prepare_job`` for this *run_job_id* ; see
+:ref:`fit_one_process@pipeline_worker` .
+The prepare_job routine does the input and output that is needed
+before the first dismod_at command for a job
+(including the copy to the :ref:`fit_one_job@Scratch Directory` ).
+It must be called after the parent of this job completes
+and its result can only be used once.
+
+idle_cpu
+********
+This ``int`` is the number of cpus that are not being used
+by other jobs when this job starts.
+If :ref:`option_all_table@sample_method` is ``simulate`` ,
+the sample simulate command is split between
+the minimum of :ref:`option_all_table@max_sample_process` ,
+*idle_cpu* + 1, and :ref:`option_all_table@number_sample` processes.
+Each process refits a subset of the simulated data sets
+using a copy of *fit_database* and the resulting samples are merged
+into the sample table for *fit_database*
+(in the same order as for one process).
+In addition, *idle_cpu* + 1 is the
+:ref:`create_shift_db@number_thread` used to create the child databases.
+
+memory_limit
+************
+If this argument is not None, it is an ``int`` number of bytes.
+In this case, the soft limit on the address space (``resource.RLIMIT_AS``)
+of each dismod_at process started by this job is set to *memory_limit*
+(or the hard limit if it is smaller).
+A dismod_at command that uses more memory than this fails
+instead of causing the system to run out of memory.
+The limit is not applied to the process that calls fit_one_job.
+
+publish_check
+*************
+If this argument is not None, it is a function with no arguments that
+returns a ``bool`` .
+It is called before the databases in the
+:ref:`fit_one_job@Scratch Directory` are copied to
+:ref:`option_all_table@result_dir` .
+If it returns false, they are not copied and fit_one_job raises an
+exception; e.g., see :ref:`fit_multi_host@stale_seconds` .
+
 fit_database
 ************
 The :ref:`glossary@fit_database` for this fit is
@@ -91,7 +153,8 @@ distribution for the model variables for the fit_node.
 
 log
 ===
-The log table is initialized as empty when ``fit_one_job`` starts.
+The log table is initialized as empty when ``fit_one_job`` starts
+(unless it is restarting; see :ref:`fit_one_job@Checkpoint` ).
 Upon return or abort due to an exception,
 the log table contains a summary of the operations preformed by dismod.
 In addition,
@@ -104,12 +167,19 @@ if the corresponding event occurs:
    message_type, message,        event
    at_cascade,   no data: abort, abort fit because all the data is held out
    at_cascade,   fit: OK,        the maximum likelihood problem was solved
+   at_cascade,   fit_type: *fit_type*, type of the fit that was solved
    at_cascade,   sample: OK,     the posterior samples were computed
+   at_cascade,   predict: OK,    the predictions for the children were computed
    at_cascade,   children: OK,   the child databases with priors were created
+   at_cascade,   timeout: *stage*, a dismod_at command in *stage* timed out
+   at_cascade,   speculative: *type*, the speculative fit of this type is used
+   at_cascade,   resume: after *stage*, this call restarted after *stage*
+   at_cascade,   warm_start: *n_var*, *n_var* variables used the parent fit
 
 Note that the events depend on each other in the following way:
 
-#. If children: OK is present, then sample: OK is present.
+#. If children: OK is present, then predict: OK is present.
+#. If predict: OK is present, then sample: OK is present.
 #. If sample: OK is present, then fit: OK is present.
 #. If fit: OK is present, then no data: abort is **not** present.
 
@@ -120,42 +190,641 @@ If there is no data from this fit, this routine will raise an exception
 with a message that starts with: ``no data: abort`` ; i.e., the same
 as the message it puts in the log.
 
+Checkpoint
+**********
+If a previous call to ``fit_one_job`` for this *fit_database*
+did not complete (``children: OK`` is not in the log table),
+this call restarts after the last stage that completed
+during the previous call:
+
+#. The fit stage completed if ``fit_type:`` *fit_type* and ``fit: OK``
+   are in the log table and the fit_var table exists.
+#. The sample stage completed if the fit stage completed,
+   ``sample: OK`` is in the log table, and the sample table exists.
+#. The predict stage completed if the sample stage completed,
+   ``predict: OK`` is in the log table, and the c_shift_avgint,
+   c_shift_predict_fit_var, and c_shift_predict_sample tables exist.
+
+The child databases are always created by the call that completes the job.
+For example, if a failure occurs while creating the child databases,
+the next call for this job will not repeat the fit and sample commands.
+Note that the previous call must have used the same *fit_type* for the
+fit stage to be skipped.
+
+Warm Start
+**********
+If :ref:`option_all_table@warm_start` is in the option_all table,
+and *fit_database* has a
+:ref:`create_shift_db@c_warm_start Table` ,
+the start_var (and possibly scale_var) table values for the fixed effects
+are set to the parent fit predictions before the fit.
+This is done after the init, hold_out, and bnd_mulcov commands,
+and before the perturbations specified by
+:ref:`option_all_table@perturb_optimization_scale` .
+
+Stage Resources
+***************
+The resources used by each stage of this job are recorded in the
+:ref:`stage_resource_class@c_stage_resource Table` of *fit_database* .
+The stages are
+``init`` , ``hold_out`` (which includes bnd_mulcov and perturb),
+``fit`` , ``sample`` , ``avgint_parent_grid`` ,
+``predict_fit_var`` , ``predict_sample`` , and ``create_shift_db`` .
+This table is cleared when the log table is cleared; see
+:ref:`fit_one_job@Checkpoint` .
+The :ref:`sum_stage_resource-name` routine can be used to sum
+this table over all the jobs in a cascade.
+
+Scratch Directory
+*****************
+If :ref:`option_all_table@scratch_dir` is in the option_all table,
+*fit_database* is copied to a directory below *scratch_dir*
+(the same *database_dir* below a directory that is specific to this process)
+and all the stages of the job are run using the copy.
+The :ref:`glossary@root_database` is copied to the scratch directory
+once per process and the other_database option in the copy of
+*fit_database* refers to this copy.
+The child databases are also created in the scratch directory.
+When the job completes,
+the child databases, and then *fit_database* , are copied to their
+locations in :ref:`option_all_table@result_dir` .
+Each of these copies is made in a temporary file and then renamed,
+so a database in *result_dir* changes in one atomic operation.
+If the job fails, the copy of *fit_database* (but not the child databases)
+is copied to *result_dir* ;
+i.e., *fit_database* , including its log table, is the same as if the
+scratch directory had not been used.
+Thus the next call for this job can use the :ref:`fit_one_job@Checkpoint`
+for this call.
+In either case, the scratch directory for this job is removed
+before fit_one_job returns.
+
+Return Value
+************
+The return value is the fit type that was used for this job; i.e.,
+*fit_type* or *speculative_fit_type* .
+
+Timeout
+*******
+If one of the dismod_at commands for a *stage* takes longer than the
+:ref:`option_all_table@timeout_stage` limit for that stage,
+the command is killed and this routine
+raises an exception with a message that starts with ``timeout:`` *stage* .
 
 {xrst_end fit_one_job}
 '''
 # ----------------------------------------------------------------------------
 import io
 import os
+import sys
 import time
+import shutil
+import signal
 import inspect
+import threading
+import statistics
+import subprocess
 import dismod_at
 import at_cascade
 # -----------------------------------------------------------------------------
-def system_command(command, file_stdout) :
-   if file_stdout is None :
-      dismod_at.system_command_prc(
-         command,
-         print_command = True,
-         return_stdout = False,
-         return_stderr = False,
-         file_stdout   = None,
-         file_stderr   = None,
-         write_command = False,
+# stage_seconds_dict[ (command_name, depth) ]
+# is the list of wall clock seconds for the dismod_at commands, with the
+# specified command_name, that completed in this process for jobs at the
+# specified depth in the job table.
+stage_seconds_dict = dict()
+# -----------------------------------------------------------------------------
+# fit_type = speculative_fit(
+#  command, speculative_fit_type, file_stdout, stage_resource,
+#  timeout, memory_limit
+# )
+# Run the fit in command and, at the same time, a fit of type
+# speculative_fit_type on a copy of the database. The result of the fit in
+# command is used if it succeeds. Otherwise, the result of the speculative fit
+# is used if it succeeds. The return value is the fit type that is used.
+# The memory_limit applies to each of the two fits and the resources used
+# by both fits are added to the current stage of stage_resource.
+def speculative_fit(
+   command,
+   speculative_fit_type,
+   file_stdout,
+   stage_resource,
+   timeout,
+   memory_limit = None,
+) :
+   #
+   # fit_database, fit_type, speculative_database
+   fit_database         = command[1]
+   fit_type             = command[3]
+   speculative_database = os.path.dirname(fit_database) + '/speculative.db'
+   shutil.copyfile(fit_database, speculative_database)
+   #
+   # speculative_command
+   speculative_command = [
+      'dismod_at', speculative_database, 'fit', speculative_fit_type
+   ]
+   #
+   # command_str
+   command_str = ' '.join(command)
+   for line in [ command_str, ' '.join(speculative_command) ] :
+      if file_stdout is None :
+         print( line )
+      else :
+         file_stdout.write( line + '\n' )
+   if file_stdout is not None :
+      file_stdout.flush()
+   #
+   # remaining
+   start_time = time.time()
+   def remaining() :
+      if timeout is None :
+         return None
+      return max(0.0, timeout - (time.time() - start_time) )
+   #
+   # fit_process, speculative_process
+   fit_process = subprocess.Popen(
+      command,
+      stdout     = file_stdout,
+      stderr     = subprocess.PIPE,
+      encoding   = 'utf-8',
+      preexec_fn = at_cascade.get_preexec_fn(memory_limit),
+   )
+   speculative_process = subprocess.Popen(
+      speculative_command,
+      stdout     = file_stdout,
+      stderr     = subprocess.PIPE,
+      encoding   = 'utf-8',
+      preexec_fn = at_cascade.get_preexec_fn(memory_limit),
+   )
+   #
+   # write_stderr
+   def write_stderr(stderr) :
+      if stderr != '' :
+         if file_stdout is None :
+            sys.stderr.write( stderr )
+         else :
+            file_stdout.write( stderr )
+            file_stdout.flush()
+   #
+   try :
+      (stdout, stderr) = stage_resource.communicate(
+         fit_process, remaining()
+      )
+      if fit_process.returncode == 0 :
+         # Popen.kill would wait for the process if it has completed
+         os.kill(speculative_process.pid, signal.SIGKILL)
+         stage_resource.communicate(speculative_process)
+         os.remove(speculative_database)
+         write_stderr(stderr)
+         return fit_type
+      (stdout, speculative_stderr) = stage_resource.communicate(
+         speculative_process, remaining()
+      )
+   except subprocess.TimeoutExpired :
+      # stage_resource.communicate killed the process that timed out
+      for process in [ fit_process, speculative_process ] :
+         if process.returncode is None :
+            os.kill(process.pid, signal.SIGKILL)
+            stage_resource.communicate(process)
+      os.remove(speculative_database)
+      raise
+   #
+   if speculative_process.returncode != 0 :
+      os.remove(speculative_database)
+      msg  = f'speculative fit failed: {command_str}\n'
+      msg += stderr
+      msg += speculative_stderr
+      raise Exception(msg)
+   #
+   # use the result of the speculative fit
+   write_stderr(stderr)
+   write_stderr(speculative_stderr)
+   os.replace(speculative_database, fit_database)
+   return speculative_fit_type
+# -----------------------------------------------------------------------------
+# simulate_sample(
+#  command, n_process, file_stdout, stage_resource, timeout, memory_limit
+# )
+# Run the dismod_at sample simulate command in command using n_process
+# copies of the database at the same time. Each copy refits a subset of the
+# simulated data sets and the resulting sample tables are merged into the
+# sample table for the database in command.
+# The memory_limit applies to each of the n_process processes and the
+# resources they use are added to the current stage of stage_resource.
+def simulate_sample(
+   command,
+   n_process,
+   file_stdout,
+   stage_resource,
+   timeout,
+   memory_limit = None,
+) :
+   #
+   # fit_database, number_simulate
+   fit_database    = command[1]
+   assert command[2] == 'sample' and command[3] == 'simulate'
+   number_simulate = int( command[5] )
+   assert 1 < n_process <= number_simulate
+   #
+   # sim_table
+   connection = dismod_at.create_connection(
+      fit_database, new = False, readonly = True
+   )
+   sim_table = dict()
+   for tbl_name in [ 'data_sim', 'prior_sim' ] :
+      sim_table[tbl_name] = dismod_at.get_table_dict(connection, tbl_name)
+   connection.close()
+   #
+   # start_index
+   # process k refits the simulated data sets with simulate_index in
+   # range( start_index[k], start_index[k+1] )
+   start_index = [
+      (k * number_simulate) // n_process for k in range(n_process + 1)
+   ]
+   #
+   # sample_database_list, sample_command_list
+   fit_dir              = os.path.dirname(fit_database)
+   sample_database_list = list()
+   sample_command_list  = list()
+   for k in range(n_process) :
+      sample_database = f'{fit_dir}/sample_{k}.db'
+      shutil.copyfile(fit_database, sample_database)
+      connection = dismod_at.create_connection(
+         sample_database, new = False, readonly = False
       )
+      for tbl_name in [ 'data_sim', 'prior_sim' ] :
+         sub_table = list()
+         for row in sim_table[tbl_name] :
+            simulate_index = row['simulate_index']
+            if start_index[k] <= simulate_index < start_index[k+1] :
+               sub_row = dict( row )
+               sub_row['simulate_index'] = simulate_index - start_index[k]
+               sub_table.append( sub_row )
+         dismod_at.replace_table(connection, tbl_name, sub_table)
+      connection.close()
+      #
+      n_sample = str( start_index[k+1] - start_index[k] )
+      sample_command = command[: 5] + [ n_sample ]
+      sample_command[1] = sample_database
+      sample_database_list.append( sample_database )
+      sample_command_list.append( sample_command )
+   #
+   # print commands
+   for sample_command in sample_command_list :
+      line = ' '.join( sample_command )
+      if file_stdout is None :
+         print( line )
+      else :
+         file_stdout.write( line + '\n' )
+   if file_stdout is not None :
+      file_stdout.flush()
+   #
+   # remove_copies
+   def remove_copies() :
+      for sample_database in sample_database_list :
+         os.remove(sample_database)
+   #
+   # process_list
+   process_list = list()
+   for sample_command in sample_command_list :
+      process = subprocess.Popen(
+         sample_command,
+         stdout     = file_stdout,
+         stderr     = subprocess.PIPE,
+         encoding   = 'utf-8',
+         preexec_fn = at_cascade.get_preexec_fn(memory_limit),
+      )
+      process_list.append( process )
+   #
+   # stderr_list
+   start_time  = time.time()
+   stderr_list = list()
+   try :
+      for process in process_list :
+         remaining = None
+         if timeout is not None :
+            remaining = max(0.0, timeout - (time.time() - start_time) )
+         (stdout, stderr) = stage_resource.communicate(process, remaining)
+         stderr_list.append( stderr )
+   except subprocess.TimeoutExpired :
+      # stage_resource.communicate killed the process that timed out
+      for process in process_list :
+         if process.returncode is None :
+            os.kill(process.pid, signal.SIGKILL)
+            stage_resource.communicate(process)
+      remove_copies()
+      raise
+   for k in range(n_process) :
+      if process_list[k].returncode != 0 :
+         remove_copies()
+         command_str = ' '.join( sample_command_list[k] )
+         msg  = f'system_command failed: {command_str}\n'
+         msg += stderr_list[k]
+         assert False, msg
+   #
+   # sample_table
+   # sample_index is shifted by the start index for each copy so that the
+   # samples are in the same order as for one sample simulate command.
+   sample_table = list()
+   for k in range(n_process) :
+      connection = dismod_at.create_connection(
+         sample_database_list[k], new = False, readonly = True
+      )
+      for row in dismod_at.get_table_dict(connection, 'sample') :
+         sample_table.append( [
+            row['sample_index'] + start_index[k],
+            row['var_id'],
+            row['var_value'],
+         ] )
+      connection.close()
+   remove_copies()
+   #
+   # fit_database: sample table
+   connection = dismod_at.create_connection(
+      fit_database, new = False, readonly = False
+   )
+   command  = 'DROP TABLE IF EXISTS sample'
+   dismod_at.sql_command(connection, command)
+   col_name = [ 'sample_index', 'var_id',  'var_value' ]
+   col_type = [ 'integer',      'integer', 'real'      ]
+   dismod_at.create_table(
+      connection, 'sample', col_name, col_type, sample_table
+   )
+   connection.close()
+# -----------------------------------------------------------------------------
+# checkpoint = get_checkpoint(fit_database, fit_type)
+# is the set of stages that completed during a previous call to fit_one_job
+# for this fit_database and fit_type. A stage is only included if the stages
+# before it are included. If the previous call completed,
+# the empty set is returned so that the job is run from the start.
+def get_checkpoint(fit_database, fit_type) :
+   #
+   # connection
+   connection = dismod_at.create_connection(
+      fit_database, new = False, readonly = True
+   )
+   if not at_cascade.table_exists(connection, 'log') :
+      connection.close()
+      return set()
+   #
+   # message_set
+   message_set = set()
+   for row in dismod_at.get_table_dict(connection, 'log') :
+      if row['message_type'] == 'at_cascade' :
+         message_set.add( row['message'] )
+   #
+   # stage_list
+   # each element is ( stage, messages in log, tables in database )
+   stage_list = [
+      ( 'fit',     [ f'fit_type: {fit_type}', 'fit: OK' ], [ 'fit_var' ] ),
+      ( 'sample',  [ 'sample: OK' ],  [ 'sample' ] ),
+      ( 'predict', [ 'predict: OK' ], [
+         'c_shift_avgint', 'c_shift_predict_fit_var', 'c_shift_predict_sample'
+      ] ),
+   ]
+   #
+   # checkpoint
+   checkpoint = set()
+   if 'children: OK' not in message_set :
+      for (stage, message_list, table_list) in stage_list :
+         done = True
+         for message in message_list :
+            done = done and message in message_set
+         for table_name in table_list :
+            done = done and at_cascade.table_exists(connection, table_name)
+         if not done :
+            break
+         checkpoint.add(stage)
+   connection.close()
+   return checkpoint
+# -----------------------------------------------------------------------------
+# timeout = get_stage_timeout(option_all_dict, stage, command_name, depth)
+def get_stage_timeout(option_all_dict, stage, command_name, depth) :
+   option_name = f'timeout_{stage}'
+   if option_name not in option_all_dict :
+      return None
+   option_value = option_all_dict[option_name]
+   if not option_value.endswith('x') :
+      return float( option_value )
+   #
+   # median of previous times for this command at this depth
+   factor       = float( option_value[: -1] )
+   seconds_list = stage_seconds_dict.get( (command_name, depth), list() )
+   if len( seconds_list ) < 3 :
+      return None
+   return factor * statistics.median( seconds_list )
+# -----------------------------------------------------------------------------
+# n_warm = warm_start_var(fit_database, fit_node_id, warm_start)
+# If fit_database has a c_warm_start table, set the start_var table
+# (and the scale_var table if 'scale' is in warm_start) using the
+# values in c_warm_start. The return value is the number of model variables
+# that were set.
+def warm_start_var(fit_database, fit_node_id, warm_start) :
+   #
+   # connection
+   connection = dismod_at.create_connection(
+      fit_database, new = False, readonly = False
+   )
+   #
+   # warm_start_table
+   if not at_cascade.table_exists(connection, 'c_warm_start') :
+      connection.close()
+      return 0
+   warm_start_table = dismod_at.get_table_dict(connection, 'c_warm_start')
+   #
+   # warm_value
+   warm_value = dict()
+   for row in warm_start_table :
+      key = ( row['smooth_id'], row['age_id'], row['time_id'] )
+      warm_value[key] = row['warm_value']
+   #
+   # var_table
+   var_table = dismod_at.get_table_dict(connection, 'var')
+   #
+   # table_name
+   for table_name in [ 'start_var', 'scale_var' ] :
+      key = table_name.replace('_var', '')
+      if key not in warm_start :
+         continue
+      #
+      # table_name
+      # Random effects, i.e., child rates and subgroup covariate multipliers,
+      # are not in c_warm_start but may use the same smoothing as a fixed
+      # effect.
+      table    = dismod_at.get_table_dict(connection, table_name)
+      col_name = f'{table_name}_value'
+      n_warm   = 0
+      for (var_id, var_row) in enumerate(var_table) :
+         random = var_row['subgroup_id'] is not None
+         if var_row['var_type'] == 'rate' :
+            random = var_row['node_id'] != fit_node_id
+         key = ( var_row['smooth_id'], var_row['age_id'], var_row['time_id'] )
+         if key in warm_value and not random :
+            table[var_id][col_name] = warm_value[key]
+            n_warm += 1
+      dismod_at.replace_table(connection, table_name, table)
+   #
+   connection.close()
+   return n_warm
+# -----------------------------------------------------------------------------
+# scratch_root_dict[root_database] = (file_key, scratch_root)
+# where root_database is an absolute path, file_key identifies the version
+# of root_database, and scratch_root is the copy of root_database in the
+# scratch directory for this process.
+scratch_root_dict = dict()
+#
+# set_other_database(database, root_database)
+# Set the other_database option in database so that it refers to
+# root_database (relative to the directory containing database unless
+# root_database is an absolute path).
+def set_other_database(database, root_database) :
+   if os.path.isabs( root_database ) :
+      other_database = root_database
    else :
-      dismod_at.system_command_prc(
-         command,
-         print_command = False,
-         return_stdout = False,
-         return_stderr = False,
-         file_stdout   = file_stdout,
-         file_stderr   = None,
-         write_command = True,
+      dirname        = os.path.dirname( database )
+      other_database = os.path.relpath( root_database, dirname )
+   connection = dismod_at.create_connection(
+      database, new = False, readonly = False
+   )
+   command  = 'UPDATE option SET option_value = ? '
+   command += "WHERE option_name = 'other_database'"
+   connection.execute(command, (other_database,) )
+   connection.commit()
+   connection.close()
+#
+# scratch_database = get_scratch_database(
+#  scratch_dir, root_database, database_dir, fit_database
+# )
+# Copy fit_database to scratch_database, in the scratch directory for this
+# process, and set its other_database to a scratch copy of root_database.
+# The copy of root_database is made once per process (and version of
+# root_database).
+def get_scratch_database(
+   scratch_dir, root_database, database_dir, fit_database
+) :
+   #
+   # process_dir
+   process_dir = f'{scratch_dir}/at_cascade_{os.getpid()}'
+   #
+   # scratch_root
+   root_database = os.path.abspath(root_database)
+   stat          = os.stat(root_database)
+   file_key      = (stat.st_mtime_ns, stat.st_size)
+   scratch_root  = None
+   if root_database in scratch_root_dict :
+      (cache_key, scratch_root) = scratch_root_dict[root_database]
+      if cache_key != file_key or not os.path.exists(scratch_root) :
+         scratch_root = None
+   if scratch_root is None :
+      os.makedirs(process_dir, exist_ok = True)
+      #
+      # scratch_root
+      # The temporary file name is different for each thread because
+      # prepare_job can run in a background thread.
+      scratch_root = f'{process_dir}/root.db'
+      tmp_root     = f'{scratch_root}.{threading.get_ident()}.tmp'
+      shutil.copyfile(root_database, tmp_root)
+      os.replace(tmp_root, scratch_root)
+      scratch_root_dict[root_database] = (file_key, scratch_root)
+   #
+   # scratch_database
+   scratch_database_dir = f'{process_dir}/{database_dir}'
+   if os.path.exists(scratch_database_dir) :
+      shutil.rmtree(scratch_database_dir)
+   os.makedirs(scratch_database_dir)
+   scratch_database = f'{scratch_database_dir}/dismod.db'
+   shutil.copyfile(fit_database, scratch_database)
+   set_other_database(scratch_database, scratch_root)
+   #
+   return scratch_database
+#
+# publish_database(scratch_database, result_database, root_database)
+# Copy scratch_database to result_database, setting other_database to
+# refer to root_database, so that result_database changes in one rename.
+def publish_database(scratch_database, result_database, root_database) :
+   #
+   # tmp_database
+   # is in the same directory as result_database so that relative paths,
+   # and the rename, are correct.
+   result_dir = os.path.dirname(result_database)
+   if not os.path.exists(result_dir) :
+      os.makedirs(result_dir)
+   tmp_database = f'{result_database}.tmp'
+   shutil.copyfile(scratch_database, tmp_database)
+   set_other_database(tmp_database, root_database)
+   os.replace(tmp_database, result_database)
+# -----------------------------------------------------------------------------
+# prepared = prepare_job(job_table, run_job_id, all_node_database, node_table)
+# Does the input and output operations that fit_one_job needs before it runs
+# dismod_at for this job; i.e., determine the fit database, check its parent
+# node, copy it to the scratch directory, and read its integrand table.
+# This does not change the fit database in result_dir and can be run in a
+# background thread.
+def prepare_job(job_table, run_job_id, all_node_database, node_table) :
+   #
+   # fit_node_id, fit_split_reference_id
+   fit_node_id            = job_table[run_job_id]['fit_node_id']
+   fit_split_reference_id = job_table[run_job_id]['split_reference_id']
+   #
+   # cascade_context, option_all_dict
+   cascade_context = at_cascade.get_cascade_context(all_node_database)
+   option_all_dict = cascade_context.option_all_dict
+   #
+   # root_node_id
+   name         = option_all_dict['root_node_name']
+   root_node_id = at_cascade.table_name2id(node_table, 'node', name)
+   #
+   # fit_database
+   database_dir = at_cascade.get_database_dir(
+      node_table              = node_table,
+      split_reference_table   = cascade_context.table('split_reference'),
+      node_split_set          = cascade_context.node_split_set,
+      root_node_id            = root_node_id,
+      root_split_reference_id = cascade_context.root_split_reference_id,
+      fit_node_id             = fit_node_id ,
+      fit_split_reference_id  = fit_split_reference_id,
+   )
+   result_dir   = option_all_dict['result_dir']
+   fit_database = f'{result_dir}/{database_dir}/dismod.db'
+   #
+   # check fit_database
+   parent_node_name = at_cascade.get_parent_node(fit_database)
+   assert parent_node_name == node_table[fit_node_id]['node_name']
+   #
+   # result_fit_database, fit_database
+   # If scratch_dir is not None, fit_database is a copy of
+   # result_fit_database in the scratch directory.
+   scratch_dir         = option_all_dict.get('scratch_dir', None)
+   root_database       = option_all_dict['root_database']
+   result_fit_database = fit_database
+   if scratch_dir is not None :
+      fit_database = get_scratch_database(
+         scratch_dir, root_database, database_dir, result_fit_database,
       )
+   #
+   # integrand_table
+   fit_or_root        = at_cascade.fit_or_root_class(
+      fit_database, root_database
+   )
+   integrand_table = fit_or_root.get_table('integrand')
+   fit_or_root.close()
+   #
+   # prepared
+   prepared = {
+      'run_job_id'          : run_job_id ,
+      'result_fit_database' : result_fit_database ,
+      'fit_database'        : fit_database ,
+      'integrand_table'     : integrand_table ,
+   }
+   return prepared
 # ----------------------------------------------------------------------------
-# BEGIN_DEF
-# at_cascade.fit_one_job
-def fit_one_job(
+# fit_type = run_one_job(
+#  job_table, run_job_id, all_node_database, node_table, fit_integrand,
+#  fit_type, first_fit, trace_file_obj, speculative_fit_type, prepared,
+#  idle_cpu, memory_limit, publish_check
+# )
+# This does the work for fit_one_job. Here prepared is not None. If the job
+# fails, fit_one_job publishes fit_database and removes the scratch directory.
+def run_one_job(
    job_table               ,
    run_job_id              ,
    all_node_database       ,
@@ -163,18 +832,13 @@ def fit_one_job(
    fit_integrand           ,
    fit_type                ,
    first_fit               ,
-   trace_file_obj   = None ,
+   trace_file_obj          ,
+   speculative_fit_type    ,
+   prepared                ,
+   idle_cpu                ,
+   memory_limit            ,
+   publish_check           ,
 ) :
-   assert type(job_table) == list
-   assert type(run_job_id) == int
-   assert type(all_node_database) == str
-   assert type(node_table) == list
-   assert type(fit_integrand) == set
-   assert fit_type in [ 'both', 'fixed' ]
-   assert type(first_fit) == bool
-   if trace_file_obj is not None :
-      assert isinstance(trace_file_obj, io.TextIOBase)
-   # END_DEF
    #
    # trace_line_number
    # You can use this routine to help track down a crash during fit_one_job.
@@ -202,19 +866,14 @@ def fit_one_job(
    # end_child_job_id
    end_child_job_id = job_table[run_job_id]['end_child_job_id']
    #
-   # all_table
-   connection  = dismod_at.create_connection(
-      all_node_database, new = False, readonly = True
-   )
-   all_table = dict()
+   # cascade_context, all_table
+   cascade_context = at_cascade.get_cascade_context(all_node_database)
+   all_table       = dict()
    for tbl_name in [
-      'option_all',
       'split_reference',
-      'node_split',
       'mulcov_freeze',
    ] :
-      all_table[tbl_name] = dismod_at.get_table_dict(connection, tbl_name)
-   connection.close()
+      all_table[tbl_name] = cascade_context.table(tbl_name)
    #
    # double_max_fit
    double_max_fit = False
@@ -224,9 +883,7 @@ def fit_one_job(
             double_max_fit = True
    #
    # option_all_dict
-   option_all_dict = dict()
-   for row in all_table['option_all'] :
-      option_all_dict[ row['option_name']  ] = row['option_value']
+   option_all_dict = cascade_context.option_all_dict
    #
    # sample_method
    if 'sample_method' in option_all_dict :
@@ -237,6 +894,13 @@ def fit_one_job(
    else :
       sample_method = 'asymptotic'
    #
+   # max_sample_process
+   max_sample_process = int( option_all_dict.get('max_sample_process', '1') )
+   if max_sample_process < 1 :
+      msg  = 'option_all table: max_sample_process = '
+      msg += f'{max_sample_process} is less than one'
+      assert False, msg
+   #
    # refit_split
    if 'refit_split' in option_all_dict :
       refit_split = option_all_dict['refit_split']
@@ -253,14 +917,9 @@ def fit_one_job(
    root_node_id = at_cascade.table_name2id(node_table, 'node', name)
    #
    # root_split_reference_id
-   if 'root_split_reference_name' not in option_all_dict :
-      root_split_reference_id = None
+   root_split_reference_id = cascade_context.root_split_reference_id
+   if root_split_reference_id is None :
       assert refit_split == False
-   else :
-      name = option_all_dict['root_split_reference_name']
-      root_split_reference_id   = at_cascade.table_name2id(
-         all_table['split_reference'], 'split_reference', name
-      )
    #
    # max_fit_parent
    if 'max_fit_parent' not in option_all_dict :
@@ -287,121 +946,267 @@ def fit_one_job(
          msg += 'list with three elements'
          assert False, msg
    #
+   # in_process_command
+   in_process_command = option_all_dict.get('in_process_command', 'false')
+   if in_process_command not in [ 'true', 'false' ] :
+      msg  = 'option_all table: in_process_command = '
+      msg += f'{in_process_command} is not true or false'
+      assert False, msg
+   in_process_command = in_process_command == 'true'
+   #
    # node_split_set
-   node_split_set = set()
-   for row in all_table['node_split'] :
-      node_split_set.add( row['node_id'] )
+   node_split_set = cascade_context.node_split_set
    #
-   # fit_database
-   database_dir = at_cascade.get_database_dir(
-      node_table              = node_table,
-      split_reference_table   = all_table['split_reference'],
-      node_split_set          = node_split_set,
-      root_node_id            = root_node_id,
-      root_split_reference_id = root_split_reference_id,
-      fit_node_id             = fit_node_id ,
-      fit_split_reference_id  = fit_split_reference_id,
-   )
-   fit_database      = f'{result_dir}/{database_dir}/dismod.db'
+   # scratch_dir, root_database
+   scratch_dir   = option_all_dict.get('scratch_dir', None)
+   root_database = option_all_dict['root_database']
    #
-   # check fit_database
-   parent_node_name = at_cascade.get_parent_node(fit_database)
-   assert parent_node_name == node_table[fit_node_id]['node_name']
+   # result_fit_database, fit_database, integrand_table
+   # If scratch_dir is not None, fit_database is a copy of
+   # result_fit_database in the scratch directory.
+   result_fit_database = prepared['result_fit_database']
+   fit_database        = prepared['fit_database']
+   integrand_table     = prepared['integrand_table']
    #
-   # integrand_table
-   root_database      = option_all_dict['root_database']
-   fit_or_root        = at_cascade.fit_or_root_class(
-      fit_database, root_database
-   )
-   integrand_table = fit_or_root.get_table('integrand')
-   fit_or_root.close()
+   # job_depth
+   job_depth = 0
+   job_id    = job_table[run_job_id]['parent_job_id']
+   while job_id is not None :
+      job_depth += 1
+      job_id     = job_table[job_id]['parent_job_id']
    #
-   # fit_database: log table
-   connection = dismod_at.create_connection(
-      fit_database, new = False, readonly = False
-   )
-   command = 'DROP TABLE IF EXISTS log'
-   dismod_at.sql_command(connection, command)
+   # run_stage
+   # If speculative_fit_type is not None, the return value is the fit type
+   # that was used. Otherwise the return value is None.
+   # If sample_process is greater than one, command is a sample simulate
+   # command and it is run using sample_process processes.
+   def run_stage(
+      stage, command, speculative_fit_type = None, sample_process = 1
+   ) :
+      command_name = command[2]
+      timeout      = get_stage_timeout(
+         option_all_dict, stage, command_name, job_depth
+      )
+      start_time   = time.time()
+      result       = None
+      try :
+         if sample_process > 1 :
+            simulate_sample(
+               command,
+               sample_process,
+               file_stdout,
+               stage_resource,
+               timeout,
+               memory_limit,
+            )
+         elif speculative_fit_type is None :
+            at_cascade.system_command(
+               command, file_stdout, stage_resource, timeout, memory_limit
+            )
+         else :
+            result = speculative_fit(
+               command,
+               speculative_fit_type,
+               file_stdout,
+               stage_resource,
+               timeout,
+               memory_limit,
+            )
+      except subprocess.TimeoutExpired :
+         connection = dismod_at.create_connection(
+            fit_database, new = False, readonly = False
+         )
+         msg = f'timeout: {stage}'
+         at_cascade.add_log_entry(connection, msg)
+         connection.close()
+         #
+         job_name = job_table[run_job_id]['job_name']
+         msg      = f'timeout: {stage} {job_name}'
+         raise Exception(msg)
+      key = (command_name, job_depth)
+      if key not in stage_seconds_dict :
+         stage_seconds_dict[key] = list()
+      stage_seconds_dict[key].append( time.time() - start_time )
+      return result
    #
-   # init
-   command = [ 'dismod_at', fit_database, 'init' ]
-   system_command(command, file_stdout)
-   #
-   # max_fit
-   if 'max_fit' in option_all_dict :
-      max_fit = option_all_dict['max_fit']
-      if double_max_fit :
-         max_fit = str( 2 * int(max_fit) )
-      for integrand_id in fit_integrand :
-         integrand_name = integrand_table[integrand_id]['integrand_name']
-         command = [
-            'dismod_at', fit_database,
-            'hold_out', integrand_name, max_fit
-         ]
-         if max_fit_parent is not None :
-            command += [ max_fit_parent ]
-         if balance_fit is not None :
-            command += balance_fit
-         system_command(command, file_stdout)
-   #
-   # max_abs_effect
-   if 'max_abs_effect' in option_all_dict:
-      max_abs_effect = option_all_dict['max_abs_effect']
-      command =[
-         'dismod_at', fit_database, 'bnd_mulcov', max_abs_effect
-      ]
-      system_command(command, file_stdout)
-   #
-   # perturb_optimization
-   perturb_optimization = dict()
-   for key in [ 'start', 'scale' ] :
-      long_key = f'perturb_optimization_{key}'
-      if long_key in option_all_dict :
-         sigma = option_all_dict[long_key]
-         if float(sigma) < 0.0 :
-            msg = f'fit_one_job: perturb_optimization_{key} = '
-            msg += sigma
-            msg += ' is less than zero'
-            assert False, msg
-         if float(sigma) > 0.0 :
-            perturb_optimization[key] = sigma
+   # checkpoint
+   checkpoint = get_checkpoint(fit_database, fit_type)
    #
-   # fit_database: scale_var and start_var tables
-   for key in perturb_optimization :
-      sigma = perturb_optimization[key]
-      table = f'{key}_var'
-      command = [
-         'dismodat.py', fit_database, 'perturb', table, sigma
-      ]
-      system_command(command, file_stdout)
+   # stage_resource
+   stage_resource = at_cascade.stage_resource_class(fit_database)
    #
-   # fit_node_datase.log_table
-   # if fit has no data, abort with 'fit: error: no data abort' in log_table
-   data_include_table = at_cascade.data_include(
-      fit_database, root_database
-   )
-   if len( data_include_table )  == 0 :
-      msg        = 'no data: abort'
+   if len(checkpoint) == 0 :
+      #
+      # fit_database: log table
       connection = dismod_at.create_connection(
          fit_database, new = False, readonly = False
       )
-      at_cascade.add_log_entry(connection, msg)
+      command = 'DROP TABLE IF EXISTS log'
+      dismod_at.sql_command(connection, command)
+      connection.close()
       #
-      job_name = job_table[run_job_id]['job_name']
-      msg      = f'no data: abort {job_name}'
-      raise Exception(msg)
-   #
-   # fit
-   command = [ 'dismod_at', fit_database, 'fit', fit_type ]
-   system_command(command, file_stdout)
+      # fit_database: c_stage_resource table
+      stage_resource.drop()
+   else :
+      #
+      # fit_database: log table
+      connection = dismod_at.create_connection(
+         fit_database, new = False, readonly = False
+      )
+      for stage in [ 'fit', 'sample', 'predict' ] :
+         if stage in checkpoint :
+            last_stage = stage
+      at_cascade.add_log_entry(connection, f'resume: after {last_stage}')
+      connection.close()
    #
-   # fit_database.log_table
-   connection = dismod_at.create_connection(
-      fit_database, new = False, readonly = False
-   )
-   msg      = 'fit: OK'
-   at_cascade.add_log_entry(connection, msg)
-   connection.close()
+   if 'fit' not in checkpoint :
+      #
+      # init
+      command = [ 'dismod_at', fit_database, 'init' ]
+      stage_resource.start('init')
+      run_stage('init', command)
+      stage_resource.stop()
+      #
+      # light_command_list
+      # commands that are run in this process when in_process_command is true
+      light_command_list = list()
+      stage_resource.start('hold_out')
+      #
+      # max_fit
+      # The hold_out command is always run by dismod_at so that the subset
+      # of the data that is fit does not depend on in_process_command.
+      if 'max_fit' in option_all_dict :
+         max_fit = option_all_dict['max_fit']
+         if double_max_fit :
+            max_fit = str( 2 * int(max_fit) )
+         for integrand_id in fit_integrand :
+            integrand_name = integrand_table[integrand_id]['integrand_name']
+            command = [
+               'dismod_at', fit_database,
+               'hold_out', integrand_name, max_fit
+            ]
+            if max_fit_parent is not None :
+               command += [ max_fit_parent ]
+            if balance_fit is not None :
+               command += balance_fit
+            at_cascade.system_command(
+               command,
+               file_stdout,
+               stage_resource,
+               memory_limit = memory_limit,
+            )
+      #
+      # max_abs_effect
+      if 'max_abs_effect' in option_all_dict:
+         max_abs_effect = option_all_dict['max_abs_effect']
+         command =[
+            'dismod_at', fit_database, 'bnd_mulcov', max_abs_effect
+         ]
+         light_command_list.append( command )
+      #
+      # fit_database: bnd_mulcov table
+      at_cascade.run_light_command(
+         light_command_list,
+         root_database,
+         in_process_command,
+         file_stdout,
+         stage_resource,
+         memory_limit = memory_limit,
+      )
+      light_command_list = list()
+      #
+      # warm_start
+      if 'warm_start' in option_all_dict :
+         warm_start = option_all_dict['warm_start'].split()
+         for key in warm_start :
+            if key not in [ 'start', 'scale' ] :
+               msg  = 'fit_one_job: warm_start = '
+               msg += option_all_dict['warm_start']
+               msg += ' is not a list containing start and scale'
+               assert False, msg
+         n_warm = warm_start_var(fit_database, fit_node_id, warm_start)
+         if n_warm > 0 :
+            connection = dismod_at.create_connection(
+               fit_database, new = False, readonly = False
+            )
+            msg = f'warm_start: {n_warm}'
+            at_cascade.add_log_entry(connection, msg)
+            connection.close()
+      #
+      # perturb_optimization
+      perturb_optimization = dict()
+      for key in [ 'start', 'scale' ] :
+         long_key = f'perturb_optimization_{key}'
+         if long_key in option_all_dict :
+            sigma = option_all_dict[long_key]
+            if float(sigma) < 0.0 :
+               msg = f'fit_one_job: perturb_optimization_{key} = '
+               msg += sigma
+               msg += ' is less than zero'
+               assert False, msg
+            if float(sigma) > 0.0 :
+               perturb_optimization[key] = sigma
+      #
+      # fit_database: scale_var and start_var tables
+      for key in perturb_optimization :
+         sigma = perturb_optimization[key]
+         table = f'{key}_var'
+         command = [
+            'dismodat.py', fit_database, 'perturb', table, sigma
+         ]
+         light_command_list.append( command )
+      at_cascade.run_light_command(
+         light_command_list,
+         root_database,
+         in_process_command,
+         file_stdout,
+         stage_resource,
+         memory_limit = memory_limit,
+      )
+      stage_resource.stop()
+      #
+      # fit_node_datase.log_table
+      # if fit has no data, abort with 'no data: abort' in log_table;
+      # only need to know if there is at least one row
+      data_include_table = at_cascade.data_include(
+         fit_database, root_database, limit = 1
+      )
+      if len( data_include_table )  == 0 :
+         msg        = 'no data: abort'
+         connection = dismod_at.create_connection(
+            fit_database, new = False, readonly = False
+         )
+         at_cascade.add_log_entry(connection, msg)
+         #
+         job_name = job_table[run_job_id]['job_name']
+         msg      = f'no data: abort {job_name}'
+         raise Exception(msg)
+      #
+      # fit
+      command = [ 'dismod_at', fit_database, 'fit', fit_type ]
+      stage_resource.start('fit')
+      if speculative_fit_type is None :
+         run_stage('fit', command)
+      else :
+         used_fit_type = run_stage('fit', command, speculative_fit_type)
+         if used_fit_type != fit_type :
+            connection = dismod_at.create_connection(
+               fit_database, new = False, readonly = False
+            )
+            msg = f'speculative: {used_fit_type}'
+            at_cascade.add_log_entry(connection, msg)
+            connection.close()
+            fit_type = used_fit_type
+      stage_resource.stop()
+      #
+      # fit_database.log_table
+      connection = dismod_at.create_connection(
+         fit_database, new = False, readonly = False
+      )
+      at_cascade.add_log_entry(connection, f'fit_type: {fit_type}')
+      msg      = 'fit: OK'
+      at_cascade.add_log_entry(connection, msg)
+      connection.close()
    #
    # number_simulate
    if 'number_sample' not in option_all_dict :
@@ -409,71 +1214,106 @@ def fit_one_job(
    else :
       number_simulate = option_all_dict['number_sample']
    #
-   # sample
-   if sample_method == 'simulate' :
-      if int( number_simulate ) > 20 :
-         msg  = 'option_all table: number_sample > 20 and '
-         msg += 'sample_method is simulate.'
-         assert False, msg
-      command = [
-         'dismod_at', fit_database, 'set', 'truth_var', 'fit_var'
-      ]
-      system_command(command, file_stdout)
+   if 'sample' not in checkpoint :
+      #
+      # sample_process
+      # number of processes used by the sample simulate command
+      sample_process = 1
+      if sample_method == 'simulate' :
+         sample_process = min(
+            max_sample_process, 1 + max(0, idle_cpu), int(number_simulate)
+         )
+      #
+      # sample
+      stage_resource.start('sample')
+      if sample_method == 'simulate' :
+         if int( number_simulate ) > 20 :
+            msg  = 'option_all table: number_sample > 20 and '
+            msg += 'sample_method is simulate.'
+            assert False, msg
+         command = [
+            'dismod_at', fit_database, 'set', 'truth_var', 'fit_var'
+         ]
+         at_cascade.system_command(
+            command, file_stdout, stage_resource, memory_limit = memory_limit
+         )
+         command = [
+            'dismod_at', fit_database, 'simulate', number_simulate
+         ]
+         run_stage('sample', command)
       command = [
-         'dismod_at', fit_database, 'simulate', number_simulate
+         'dismod_at',
+         fit_database,
+         'sample',
+         sample_method,
+         fit_type,
+         number_simulate
       ]
-      system_command(command, file_stdout)
-   command = [
-      'dismod_at',
-      fit_database,
-      'sample',
-      sample_method,
-      fit_type,
-      number_simulate
-   ]
-   system_command(command, file_stdout)
-   #
-   # fit_database.log_table
-   connection = dismod_at.create_connection(
-      fit_database, new = False, readonly = False
-   )
-   msg      = 'sample: OK'
-   at_cascade.add_log_entry(connection, msg)
-   connection.close()
-   #
-   # avgint_parent_grid
-   at_cascade.avgint_parent_grid(
-      all_node_database = all_node_database ,
-      fit_database      = fit_database ,
-      job_table         = job_table         ,
-      fit_job_id        = run_job_id        ,
-   )
-   #
-   # connection
-   connection = dismod_at.create_connection(
-      fit_database, new = False, readonly = False
-   )
-   #
-   # c_shift_predict_fit_var
-   command = [ 'dismod_at', fit_database, 'predict', 'fit_var' ]
-   system_command(command, file_stdout)
-   at_cascade.move_table(connection, 'predict', 'c_shift_predict_fit_var')
-   #
-   # c_shift_predict_sample
-   command = [ 'dismod_at', fit_database, 'predict', 'sample' ]
-   system_command(command, file_stdout)
-   at_cascade.move_table(connection, 'predict', 'c_shift_predict_sample')
-   #
-   # c_shift_avgint
-   # is the table created by avgint_parent_grid
-   at_cascade.move_table(connection, 'avgint', 'c_shift_avgint')
+      run_stage('sample', command, sample_process = sample_process)
+      stage_resource.stop()
+      #
+      # fit_database.log_table
+      connection = dismod_at.create_connection(
+         fit_database, new = False, readonly = False
+      )
+      msg      = 'sample: OK'
+      at_cascade.add_log_entry(connection, msg)
+      connection.close()
    #
-   # connection
-   connection.close()
+   if 'predict' not in checkpoint :
+      #
+      # avgint_parent_grid
+      stage_resource.start('avgint_parent_grid')
+      at_cascade.avgint_parent_grid(
+         all_node_database = all_node_database ,
+         fit_database      = fit_database ,
+         job_table         = job_table         ,
+         fit_job_id        = run_job_id        ,
+      )
+      stage_resource.stop()
+      #
+      # connection
+      connection = dismod_at.create_connection(
+         fit_database, new = False, readonly = False
+      )
+      #
+      # c_shift_predict_fit_var
+      command = [ 'dismod_at', fit_database, 'predict', 'fit_var' ]
+      stage_resource.start('predict_fit_var')
+      run_stage('predict', command)
+      at_cascade.move_table(
+         connection, 'predict', 'c_shift_predict_fit_var'
+      )
+      stage_resource.stop()
+      #
+      # c_shift_predict_sample
+      command = [ 'dismod_at', fit_database, 'predict', 'sample' ]
+      stage_resource.start('predict_sample')
+      run_stage('predict', command)
+      at_cascade.move_table(
+         connection, 'predict', 'c_shift_predict_sample'
+      )
+      stage_resource.stop()
+      #
+      # c_shift_avgint
+      # is the table created by avgint_parent_grid
+      at_cascade.move_table(connection, 'avgint', 'c_shift_avgint')
+      #
+      # fit_database.log_table
+      msg      = 'predict: OK'
+      at_cascade.add_log_entry(connection, msg)
+      #
+      # connection
+      connection.close()
    #
-   # shift_databases
+   # shift_databases, publish_list
+   # publish_list is a list of (scratch_database, result_database) pairs
+   # There is no shift database for a child job that has no data.
    shift_databases = dict()
+   publish_list    = list()
    for job_id in range(start_child_job_id, end_child_job_id) :
+      if job_table[job_id]['no_data'] :
+         continue
       #
       # shift_node_id
       shift_node_id = job_table[job_id]['fit_node_id']
@@ -498,6 +1338,18 @@ def fit_one_job(
       # shift_node_database
       shift_node_database = f'{shift_database_dir}/dismod.db'
       #
+      # publish_list, shift_node_database
+      if scratch_dir is not None :
+         scratch_node_database = os.path.dirname(fit_database) + '/'
+         scratch_node_database += os.path.relpath(
+            shift_node_database, os.path.dirname(result_fit_database)
+         )
+         os.makedirs(
+            os.path.dirname(scratch_node_database), exist_ok = True
+         )
+         publish_list.append( (scratch_node_database, shift_node_database) )
+         shift_node_database = scratch_node_database
+      #
       # skip_refit
       if refit_split :
          skip_refit = False
@@ -515,13 +1367,16 @@ def fit_one_job(
       shift_databases[shift_name] = shift_node_database
    #
    # create shifted databases
+   stage_resource.start('create_shift_db')
    at_cascade.create_shift_db(
       all_node_database = all_node_database,
       fit_database      = fit_database,
       shift_databases   = shift_databases,
       no_ode_fit        = False,
       job_table         = job_table,
+      number_thread     = 1 + max(0, idle_cpu),
    )
+   stage_resource.stop()
    #
    # empty_avgint_table
    connection = dismod_at.create_connection(
@@ -539,4 +1394,108 @@ def fit_one_job(
    at_cascade.add_log_entry(connection, msg)
    connection.close()
    #
+   # publish_list
+   # The child databases are published before the fit database so that
+   # children: OK in result_fit_database implies the children exist.
+   if scratch_dir is not None :
+      if publish_check is not None and not publish_check() :
+         msg  = 'fit_one_job: publish_check is false for '
+         msg += job_table[run_job_id]['job_name']
+         assert False, msg
+      root_database = option_all_dict['root_database']
+      publish_list.append( (fit_database, result_fit_database) )
+      for (scratch_database, result_database) in publish_list :
+         publish_database(scratch_database, result_database, root_database)
+         os.remove(scratch_database)
+   #
    # trace_line_number( inspect.currentframe().f_lineno )
+   return fit_type
+# ----------------------------------------------------------------------------
+# BEGIN_DEF
+# at_cascade.fit_one_job
+def fit_one_job(
+   job_table               ,
+   run_job_id              ,
+   all_node_database       ,
+   node_table              ,
+   fit_integrand           ,
+   fit_type                ,
+   first_fit               ,
+   trace_file_obj        = None ,
+   speculative_fit_type  = None ,
+   prepared              = None ,
+   idle_cpu              = 0 ,
+   memory_limit          = None ,
+   publish_check         = None ,
+) :
+   assert type(job_table) == list
+   assert type(run_job_id) == int
+   assert type(all_node_database) == str
+   assert type(node_table) == list
+   assert type(fit_integrand) == set
+   assert fit_type in [ 'both', 'fixed' ]
+   assert type(first_fit) == bool
+   if trace_file_obj is not None :
+      assert isinstance(trace_file_obj, io.TextIOBase)
+   assert speculative_fit_type in [ None, 'both', 'fixed' ]
+   assert speculative_fit_type != fit_type
+   assert prepared is None or prepared['run_job_id'] == run_job_id
+   assert type(idle_cpu) == int
+   assert memory_limit is None or type(memory_limit) == int
+   assert publish_check is None or callable(publish_check)
+   # END_DEF
+   #
+   # prepared
+   if prepared is None :
+      prepared = prepare_job(
+         job_table, run_job_id, all_node_database, node_table
+      )
+   #
+   # fit_database, result_fit_database
+   # If they are different, fit_database is in the scratch directory.
+   fit_database        = prepared['fit_database']
+   result_fit_database = prepared['result_fit_database']
+   use_scratch         = fit_database != result_fit_database
+   #
+   # fit_type
+   try :
+      fit_type = run_one_job(
+         job_table            = job_table ,
+         run_job_id           = run_job_id ,
+         all_node_database    = all_node_database ,
+         node_table           = node_table ,
+         fit_integrand        = fit_integrand ,
+         fit_type             = fit_type ,
+         first_fit            = first_fit ,
+         trace_file_obj       = trace_file_obj ,
+         speculative_fit_type = speculative_fit_type ,
+         prepared             = prepared ,
+         idle_cpu             = idle_cpu ,
+         memory_limit         = memory_limit ,
+         publish_check        = publish_check ,
+      )
+   except Exception :
+      # publish fit_database so its log table is in result_dir and the next
+      # call for this job can use its checkpoint
+      publish = use_scratch and os.path.exists(fit_database)
+      if publish and publish_check is not None :
+         publish = publish_check()
+      if publish :
+         #
+         # connection
+         # If a dismod_at command was killed, opening the database rolls
+         # back its incomplete transaction before the database is copied.
+         connection = dismod_at.create_connection(
+            fit_database, new = False, readonly = False
+         )
+         connection.execute('SELECT COUNT(*) FROM sqlite_master').fetchall()
+         connection.close()
+         #
+         cascade_context = at_cascade.get_cascade_context(all_node_database)
+         root_database   = cascade_context.option_all_dict['root_database']
+         publish_database(fit_database, result_fit_database, root_database)
+      raise
+   finally :
+      if use_scratch :
+         shutil.rmtree( os.path.dirname(fit_database), ignore_errors = True )
+   return fit_type
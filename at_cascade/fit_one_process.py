@@ -30,13 +30,6 @@ job_table
 This is a :ref:`create_job_table@job_table` containing all the jobs
 necessary to fit the :ref:`glossary@fit_goal_set` .
 
-this_job_id
-***********
-if skip_this_job is false,
-the fit for this ref:`create_job_table@job_table@job_id` is ready to be fit
-and will be fit first.
-Otherwise, *this_job_id* is ignored.
-
 all_node_database
 *****************
 :ref:`fit_one_job@all_node_database`
@@ -49,16 +42,34 @@ fit_integrand
 *************
 :ref:`fit_one_job@fit_integrand`
 
-skip_this_job
-*************
-see :ref:`fit_one_process@this_job_id` above.
-
 max_number_cpu
 **************
 This is the maximum number of cpus (processes) to use.
 This must be greater than zero.
 If it is one, the jobs are run sequentially; i.e., not in parallel.
 
+master_process
+**************
+If *master_process* is true,
+this process decides which jobs to run and when to run them;
+see *job_priority* below.
+If *max_number_cpu* is one, it also runs the jobs.
+Otherwise, it starts a pool of *max_number_cpu* worker processes,
+each with its own *job_queue* .
+It puts the job_id for each job that is ready to run in
+the *job_queue* for a worker that is not running a job,
+while keeping the number of jobs in the queues or running
+less than or equal *max_number_cpu* ,
+and then waits for a message in *done_queue* .
+It returns, after telling the workers to return,
+when there are no jobs ready or running.
+
+If *master_process* is false,
+this process is one of the workers in the pool.
+It gets a job_id from *job_queue* , runs the corresponding job,
+puts a message in *done_queue* ,
+and repeats until it gets None from *job_queue* .
+
 fit_type_list
 *************
 This is a list with one or two elements
@@ -77,7 +88,7 @@ corresponding name.
    :header-rows: 1
 
    Name,    Meaning
-   'skip' , This is a prior only job and completed by the parent fit
+   'skip' , This is a prior only or no data job and is not run
    'wait',  job is waiting for it's parent job to finish
    'ready', job is ready to run
    'run',   job is running
@@ -100,8 +111,8 @@ This is the name of the number of cpus in use memory.
 The corresponding multiprocessing shared memory is
 a numpy array with ``dtype`` equal to ``int`` and
 with length equal to one.
-The value *number_cpu_inuse* [0] is the number of cpus (precesses)
-currently fitting this cascade.
+The value *number_cpu_inuse* [0] is the number of jobs that
+the master process has put in *job_queue* and that have not yet completed.
 
 shared_lock
 ***********
@@ -109,17 +120,122 @@ is a shared memory lock, used by all the fit processes,
 that must be acquired to read or write shared memory; i.e.,
 *shared_job_status* or *shared_number_cpu_in_use* .
 
-shared_event
+
+job_queue
+*********
+If *master_process* is true, this is None.
+Otherwise, it is the ``multiprocessing.Queue`` that the master process uses
+to send job_id values to this worker.
+Only this worker gets values from its queue,
+so the master process decides which worker runs each job.
+The value None is used to tell a worker to return.
+
+done_queue
+**********
+If *master_process* is true, this is None.
+Otherwise, it is the ``multiprocessing.Queue`` that the workers use
+to tell the master process that a job has completed.
+Each element of the queue is a tuple ( *job_id* , *ready_list* )
+where *job_id* is the job that completed and *ready_list* is a list
+of the jobs that became ready to run because *job_id* completed.
+The master process blocks on this queue when it cannot dispatch another job,
+so it wakes up when a job completes.
+It also wakes up every few seconds to check that the workers are alive.
+If a worker has died, it is restarted with a new *job_queue* .
+The job that the worker was running has status ``error``
+(and its descendants have status ``abort`` ).
+The jobs that were given to the worker, and that it did not start,
+are ready to run again.
+
+memory_budget
+*************
+If this is None, there is no memory admission control.
+Otherwise it is a ``float`` specifying the memory budget in GB; see
+:ref:`fit_parallel@Memory Budget` .
+
+job_memory
+**********
+This is a numpy array with length equal to the length of *job_table* .
+If *memory_budget* is not None,
+*job_memory* [ *job_id* ] is the estimated memory in GB for the
+corresponding job.
+The master process will not dispatch a job if that would make the sum
+of the estimates for the running jobs greater than *memory_budget*
+(unless there are no other jobs running).
+When a worker runs a job,
+the soft limit on the address space (``resource.RLIMIT_AS``)
+of each dismod_at process that the job starts
+is set to the job's estimate; see :ref:`fit_one_job@memory_limit` .
+A job that uses more memory than its estimate fails
+instead of causing the system to run out of memory.
+The limit is not applied to the worker process itself.
+
+job_journal
+***********
+is the name of the job journal database; see
+:ref:`fit_parallel@resume@Job Journal` .
+This database must already exist and contain the job_journal table.
+The master process adds an entry to this table
+each time it sets a job status to ``run``
+and each time a job completes with status ``done`` or ``error`` .
+
+speculative_fit
+***************
+If this is true and *fit_type_list* has two elements,
+when a job starts and *number_cpu_inuse* [0]
+is less than *max_number_cpu* ,
+the second fit type is run at the same time as the first;
+see :ref:`fit_one_job@speculative_fit_type` .
+The number of cpus that are not being used by the other jobs,
+when a job starts, is passed to fit_one_job; see
+:ref:`fit_one_job@idle_cpu` .
+
+status_file
+***********
+is the name of the status file; see :ref:`fit_parallel@Status File` .
+The master process rewrites this file each time it dispatches jobs
+and each time a job completes.
+
+status_port
+***********
+If this is not None, it is the local port for the status server; see
+:ref:`option_all_table@status_port` .
+
+pipeline_worker
+***************
+If this is true, the master process can dispatch up to
+two times *max_number_cpu* jobs.
+A job is only given to a worker that is running a job
+when all the workers are running a job.
+While a worker is running a job, a background thread in the worker
+waits for the next job in its *job_queue* and does the input and output
+that is needed before its first dismod_at command;
+see :ref:`fit_one_job@prepared` .
+The worker starts the next job as soon as the current job completes.
+Jobs that have been dispatched, but are waiting for a worker,
+have status ``run`` .
+
+job_priority
 ************
-is multiprocessing event,  used by all the fit processes,
-that is used to signal that the shared memory has changed.
+This is a numpy array with length equal to the length of *job_table* .
+When the master process chooses between jobs that are ready,
+it runs the jobs with larger *job_priority* first.
+Jobs with the same priority are run in job_id order.
 
 {xrst_end fit_one_process}
 '''
 # ----------------------------------------------------------------------------
+import os
 import sys
+import json
+import time
+import queue
+import heapq
 import datetime
+import threading
+import http.server
 import multiprocessing
+import multiprocessing.queues
 from multiprocessing import shared_memory
 import numpy
 import at_cascade
@@ -136,91 +252,171 @@ def acquire_lock(shared_lock) :
       msg = f'pre_one_process: did not obtain lock in {seconds} seconds'
       sys.exit(msg)
 # ----------------------------------------------------------------------------
+# add_journal_entry
+def add_journal_entry(connection, job_table, job_id, job_status) :
+   assert type(job_table) == list
+   assert type(job_id) == int
+   assert job_status in [ 'run', 'done', 'error' ]
+   #
+   job_name = job_table[job_id]['job_name'].replace("'", "''")
+   seconds  = int( time.time() )
+   cmd  = 'insert into job_journal'
+   cmd += ' (job_id,job_name,job_status,unix_time) values('
+   cmd += f"{job_id},'{job_name}','{job_status}',{seconds})"
+   dismod_at.sql_command(connection, cmd)
+# ----------------------------------------------------------------------------
+# descendant_list = get_descendant_list(job_table, job_id)
+# The children of a job are a contiguous range in the job table,
+# so following these ranges only visits the jobs in this subtree.
+def get_descendant_list(job_table, job_id) :
+   assert type(job_table) == list
+   assert type(job_id) == int
+   #
+   descendant_list = list()
+   stack           = [ job_id ]
+   while len(stack) > 0 :
+      row = job_table[ stack.pop() ]
+      if not row['prior_only'] :
+         child_range = range(
+            row['start_child_job_id'], row['end_child_job_id']
+         )
+         descendant_list += child_range
+         stack           += child_range
+   return descendant_list
+# ----------------------------------------------------------------------------
+# status_snapshot = get_status_snapshot(
+#  job_table, status_count, run_start, start_time, n_complete
+# )
+def get_status_snapshot(
+   job_table, status_count, run_start, start_time, n_complete
+) :
+   #
+   # running
+   now     = time.time()
+   running = list()
+   for job_id in sorted( run_start ) :
+      running.append( {
+         'job_name'        : job_table[job_id]['job_name'] ,
+         'elapsed_seconds' : round( now - run_start[job_id], 1 ) ,
+      } )
+   #
+   # jobs_per_minute
+   minutes = (now - start_time) / 60.0
+   if minutes > 0.0 :
+      jobs_per_minute = n_complete / minutes
+   else :
+      jobs_per_minute = 0.0
+   #
+   # eta_seconds
+   n_remaining = 0
+   for name in [ 'wait', 'ready', 'run' ] :
+      n_remaining += status_count[name]
+   if jobs_per_minute > 0.0 :
+      eta_seconds = round( 60.0 * n_remaining / jobs_per_minute, 1 )
+   else :
+      eta_seconds = None
+   #
+   status_snapshot = {
+      'unix_time'       : int( now ) ,
+      'status_count'    : dict( status_count ) ,
+      'running'         : running ,
+      'jobs_per_minute' : round( jobs_per_minute, 3 ) ,
+      'eta_seconds'     : eta_seconds ,
+   }
+   return status_snapshot
+# ----------------------------------------------------------------------------
+# write_status_file(status_file, status_snapshot)
+# The file is replaced atomically so a reader never sees a partial file.
+def write_status_file(status_file, status_snapshot) :
+   temp_file = status_file + '.tmp'
+   with open(temp_file, 'w') as file_obj :
+      json.dump(status_snapshot, file_obj, indent = 3)
+   os.replace(temp_file, status_file)
+# ----------------------------------------------------------------------------
+# status_server = start_status_server(status_port, status_holder)
+# The server returns status_holder[0], as json, for every GET request.
+def start_status_server(status_port, status_holder) :
+   class StatusHandler(http.server.BaseHTTPRequestHandler) :
+      def do_GET(self) :
+         body = json.dumps( status_holder[0] ).encode('utf-8')
+         self.send_response(200)
+         self.send_header('Content-Type', 'application/json')
+         self.send_header('Content-Length', str( len(body) ) )
+         self.end_headers()
+         self.wfile.write(body)
+      def log_message(self, format, *args) :
+         pass
+   status_server = http.server.ThreadingHTTPServer(
+      ('localhost', status_port), StatusHandler
+   )
+   thread = threading.Thread(target = status_server.serve_forever)
+   thread.daemon = True
+   thread.start()
+   return status_server
+# ----------------------------------------------------------------------------
 def get_result_database_dir(
    all_node_database, node_table, fit_node_id, fit_split_reference_id
 ) :
    #
-   # option_all, node_split_table, split_reference_table
-   connection       = dismod_at.create_connection(
-      all_node_database, new = False, readonly = True
-   )
-   option_all_table = dismod_at.get_table_dict(connection, 'option_all')
-   node_split_table = dismod_at.get_table_dict(connection, 'node_split')
-   split_reference_table = \
-      dismod_at.get_table_dict(connection, 'split_reference')
-   connection.close()
-   #
-   # result_dir, root_node_name
-   result_dir              = None
-   root_node_id            = None
-   root_split_reference_id = None
-   for row in option_all_table :
-      if row['option_name'] == 'result_dir' :
-         result_dir = row['option_value']
-      if row['option_name'] == 'root_node_name' :
-         root_node_name = row['option_value']
-         root_node_id   = \
-            at_cascade.table_name2id(node_table, 'node', root_node_name)
-      if row['option_name'] == 'root_split_reference_name' :
-         root_split_reference_name = row['option_value']
-         root_split_reference_id = at_cascade.table_name2id(
-            split_reference_table,
-            'split_reference',
-            root_split_reference_name
-         )
-   assert result_dir is not None
-   assert root_node_id is not None
+   # cascade_context
+   cascade_context = at_cascade.get_cascade_context(all_node_database)
    #
-   # node_split_set
-   node_split_set = set()
-   for row in node_split_table :
-      node_split_set.add( row['node_id'] )
+   # result_dir, root_node_id
+   result_dir     = cascade_context.result_dir
+   root_node_name = cascade_context.root_node_name
+   assert result_dir is not None
+   assert root_node_name is not None
+   root_node_id   = \
+      at_cascade.table_name2id(node_table, 'node', root_node_name)
    #
    database_dir = at_cascade.get_database_dir(
       node_table              = node_table,
-      split_reference_table   = split_reference_table,
-      node_split_set          = node_split_set,
+      split_reference_table   = cascade_context.table('split_reference'),
+      node_split_set          = cascade_context.node_split_set,
       root_node_id            = root_node_id,
-      root_split_reference_id = root_split_reference_id,
+      root_split_reference_id = cascade_context.root_split_reference_id,
       fit_node_id             = fit_node_id,
       fit_split_reference_id  = fit_split_reference_id,
    )
    return f'{result_dir}/{database_dir}'
 # )
 # ----------------------------------------------------------------------------
-def try_one_job(
+# job_done, fit_type = run_fit_type_list(
+#  job_table, this_job_id, all_node_database, node_table, fit_integrand,
+#  fit_type_list, use_trace_file, speculative, prepared, idle_cpu,
+#  memory_limit
+# )
+# Try each fit type in fit_type_list until one succeeds.
+# If speculative is true, and fit_type_list has two elements, the second
+# fit type is run at the same time as the first; see the speculative_fit_type
+# argument to fit_one_job. The idle_cpu and memory_limit arguments are
+# passed to fit_one_job.
+# This does not use any shared memory.
+def run_fit_type_list(
    job_table,
    this_job_id,
    all_node_database,
    node_table,
    fit_integrand,
-   skip_this_job,
-   max_number_cpu,
-   master_process,
    fit_type_list,
-   shared_lock,
-   shared_event,
-   shared_job_status,
-   job_status_name,
-)  :
+   use_trace_file,
+   speculative   = False,
+   prepared      = None,
+   idle_cpu      = 0,
+   memory_limit  = None,
+   publish_check = None,
+) :
    assert type(job_table) == list
    assert type(this_job_id) == int
    assert type(all_node_database) == str
    assert type(node_table) == list
    assert type(fit_integrand) == set
-   assert type(skip_this_job) == bool
-   assert type(max_number_cpu) == int
-   assert type(master_process) == bool
    assert type(fit_type_list) == list
-   #
-   # job_status_name
-   job_status_skip  = job_status_name.index( 'skip' )
-   job_status_wait  = job_status_name.index( 'wait' )
-   job_status_ready = job_status_name.index( 'ready' )
-   job_status_run   = job_status_name.index( 'run' )
-   job_status_done  = job_status_name.index( 'done' )
-   job_status_error = job_status_name.index( 'error' )
-   job_status_abort = job_status_name.index( 'abort' )
+   assert type(use_trace_file) == bool
+   assert type(speculative) == bool
+   assert type(idle_cpu) == int
+   assert memory_limit is None or type(memory_limit) == int
+   assert publish_check is None or callable(publish_check)
    #
    # database_dir
    row = job_table[this_job_id]
@@ -241,10 +437,15 @@ def try_one_job(
    #
    # trace_file_obj
    trace_file_obj = None
-   if max_number_cpu > 1 :
+   if use_trace_file :
       trace_file_name = f'{result_database_dir}/trace.out'
       trace_file_obj  = open(trace_file_name, 'w')
    #
+   # speculative_fit_type
+   speculative_fit_type = None
+   if speculative and len(fit_type_list) == 2 :
+      speculative_fit_type = fit_type_list[1]
+   #
    # job_done, fit_type_index, fit_type, have_data
    job_done       = False
    have_data      = True
@@ -253,6 +454,12 @@ def try_one_job(
       fit_type        = fit_type_list[fit_type_index]
       fit_type_index += 1
       #
+      # speculative_fit_type, prepared
+      # prepared can only be used by the first fit
+      if fit_type_index > 1 :
+         speculative_fit_type = None
+         prepared             = None
+      #
       # print message at start of this fit
       now             = datetime.datetime.now()
       current_time    = now.strftime("%H:%M:%S")
@@ -261,30 +468,40 @@ def try_one_job(
       # fit_one_job
       # the lock should not be aquired during this operation
       if not catch_exceptions_and_continue :
-         at_cascade.fit_one_job(
-            job_table         = job_table,
-            run_job_id        = this_job_id ,
-            all_node_database = all_node_database,
-            node_table        = node_table,
-            fit_integrand     = fit_integrand,
-            fit_type          = fit_type,
-            first_fit         = fit_type_index == 1,
-            trace_file_obj    = trace_file_obj,
+         fit_type = at_cascade.fit_one_job(
+            job_table            = job_table,
+            run_job_id           = this_job_id ,
+            all_node_database    = all_node_database,
+            node_table           = node_table,
+            fit_integrand        = fit_integrand,
+            fit_type             = fit_type,
+            first_fit            = fit_type_index == 1,
+            trace_file_obj       = trace_file_obj,
+            speculative_fit_type = speculative_fit_type,
+            prepared             = prepared,
+            idle_cpu             = idle_cpu,
+            memory_limit         = memory_limit,
+            publish_check        = publish_check,
          )
          #
          # job_done
          job_done = True
       else :
          try :
-            at_cascade.fit_one_job(
-               job_table         = job_table,
-               run_job_id        = this_job_id ,
-               all_node_database = all_node_database,
-               node_table        = node_table,
-               fit_integrand     = fit_integrand,
-               fit_type          = fit_type,
-               first_fit         = fit_type_index == 1,
-               trace_file_obj    = trace_file_obj,
+            fit_type = at_cascade.fit_one_job(
+               job_table            = job_table,
+               run_job_id           = this_job_id ,
+               all_node_database    = all_node_database,
+               node_table           = node_table,
+               fit_integrand        = fit_integrand,
+               fit_type             = fit_type,
+               first_fit            = fit_type_index == 1,
+               trace_file_obj       = trace_file_obj,
+               speculative_fit_type = speculative_fit_type,
+               prepared             = prepared,
+               idle_cpu             = idle_cpu,
+               memory_limit         = memory_limit,
+               publish_check        = publish_check,
             )
             #
             # job_done
@@ -294,12 +511,87 @@ def try_one_job(
             msg      = str(e)
             if msg.startswith( 'no data: abort' ) :
                have_data = False
+            if msg.startswith( 'speculative fit failed' ) :
+               # both types of fit have already failed
+               have_data = False
             print( f'fit {fit_type} {job_name} message: ' + msg )
    #
    # trace_file_obj
    if trace_file_obj != None :
       trace_file_obj.close()
    #
+   return job_done, fit_type
+# ----------------------------------------------------------------------------
+def try_one_job(
+   job_table,
+   this_job_id,
+   all_node_database,
+   node_table,
+   fit_integrand,
+   max_number_cpu,
+   master_process,
+   fit_type_list,
+   shared_lock,
+   shared_job_status,
+   shared_number_cpu_inuse,
+   job_status_name,
+   speculative_fit,
+   prepared     = None,
+   memory_limit = None,
+)  :
+   assert type(job_table) == list
+   assert type(this_job_id) == int
+   assert type(all_node_database) == str
+   assert type(node_table) == list
+   assert type(fit_integrand) == set
+   assert type(max_number_cpu) == int
+   assert type(master_process) == bool
+   assert type(fit_type_list) == list
+   assert type(speculative_fit) == bool
+   #
+   # job_status_name
+   job_status_skip  = job_status_name.index( 'skip' )
+   job_status_wait  = job_status_name.index( 'wait' )
+   job_status_ready = job_status_name.index( 'ready' )
+   job_status_run   = job_status_name.index( 'run' )
+   job_status_done  = job_status_name.index( 'done' )
+   job_status_error = job_status_name.index( 'error' )
+   job_status_abort = job_status_name.index( 'abort' )
+   #
+   # idle_cpu
+   # number of cpus that are not being used by the other jobs.
+   # The master process does not use shared_number_cpu_inuse when there is
+   # no worker pool, in which case this job is the only one running.
+   acquire_lock(shared_lock)
+   n_busy = max(1, int( shared_number_cpu_inuse[0] ) )
+   shared_lock.release()
+   idle_cpu = max(0, max_number_cpu - n_busy)
+   #
+   # speculative
+   # only run a speculative fit when there are cpus that are not being used
+   speculative = speculative_fit and n_busy < max_number_cpu
+   #
+   # job_done, fit_type
+   # the lock should not be aquired during this operation
+   use_trace_file     = max_number_cpu > 1
+   job_done, fit_type = run_fit_type_list(
+      job_table,
+      this_job_id,
+      all_node_database,
+      node_table,
+      fit_integrand,
+      fit_type_list,
+      use_trace_file,
+      speculative,
+      prepared,
+      idle_cpu,
+      memory_limit,
+   )
+   #
+   # ready_list
+   # job_id for the jobs that became ready because this job completed
+   ready_list = list()
+   #
    if job_done :
       #
       # shared_lock
@@ -316,27 +608,22 @@ def try_one_job(
       for child_job_id in child_range :
          if shared_job_status[child_job_id] == job_status_wait :
             assert not job_table[child_job_id]['prior_only']
+            assert not job_table[child_job_id]['no_data']
             shared_job_status[child_job_id] = job_status_ready
+            ready_list.append( child_job_id )
          else :
-            assert job_table[child_job_id]['prior_only']
+            row = job_table[child_job_id]
+            assert row['prior_only'] or row['no_data']
             assert shared_job_status[child_job_id] == job_status_skip
       #
       # release
-      # shared memory has changed
-      shared_event.set()
       shared_lock.release()
       #
    else :
       # if job not ok
       #
-      # descendant_set
-      descendant_set = { this_job_id }
-      n_job          = len(job_table)
-      for job_id in range(this_job_id + 1, n_job) :
-         parent_job_id = job_table[job_id]['parent_job_id']
-         if parent_job_id in descendant_set :
-            descendant_set.add( job_id )
-      descendant_set.remove( this_job_id )
+      # descendant_list
+      descendant_list = get_descendant_list(job_table, this_job_id)
       #
       # shared_lock
       acquire_lock(shared_lock)
@@ -348,8 +635,8 @@ def try_one_job(
          print(msg)
       shared_job_status[this_job_id] = job_status_error
       #
-      # shared_job_status[descendant_set]
-      for job_id in descendant_set :
+      # shared_job_status[descendant_list]
+      for job_id in descendant_list :
          if shared_job_status[job_id] != job_status_skip :
             if shared_job_status[job_id] != job_status_wait :
                msg  = 'try_one_job: except: shared_job_status[job_id] = '
@@ -358,8 +645,6 @@ def try_one_job(
             shared_job_status[job_id] = job_status_abort
       #
       # release
-      # shared memory has changed
-      shared_event.set()
       shared_lock.release()
       #
       # ok
@@ -368,6 +653,7 @@ def try_one_job(
    if max_number_cpu > 1 :
       #
       # print message at end
+      # the master process prints the status count
       job_name     = job_table[this_job_id]['job_name']
       now          = datetime.datetime.now()
       current_time = now.strftime("%H:%M:%S")
@@ -376,28 +662,15 @@ def try_one_job(
       else :
          print( f'Error: {current_time}: fit {fit_type:<5} {job_name}' )
       #
-      # status_count
-      acquire_lock(shared_lock)
-      n_status      = len( job_status_name )
-      status_count  = dict()
-      for job_status_i in range(n_status) :
-         name               = job_status_name[job_status_i]
-         status_count[name] =  int( sum( shared_job_status == job_status_i ) )
-      shared_lock.release()
-      #
-      print( f'       {status_count}' )
-      #
-   return
+   return ready_list
 # ----------------------------------------------------------------------------
 # BEGIN_DEF
 # at_cascade.fit_one_process
 def fit_one_process(
    job_table,
-   this_job_id,
    all_node_database,
    node_table,
    fit_integrand,
-   skip_this_job,
    max_number_cpu,
    master_process,
    fit_type_list,
@@ -405,14 +678,21 @@ def fit_one_process(
    shared_job_status_name,
    shared_number_cpu_inuse_name,
    shared_lock,
-   shared_event,
+   job_queue,
+   done_queue,
+   job_priority,
+   job_journal,
+   memory_budget,
+   job_memory,
+   speculative_fit,
+   status_file,
+   status_port,
+   pipeline_worker,
 ) :
    assert type(job_table)            == list
-   assert type(this_job_id)          == int
    assert type(all_node_database)    == str
    assert type(node_table)           == list
    assert type(fit_integrand)        == set
-   assert type(skip_this_job)        == bool
    assert type(max_number_cpu)       == int
    assert type(master_process)       == bool
    assert type(fit_type_list)        == list
@@ -421,7 +701,21 @@ def fit_one_process(
    assert type(shared_job_status_name)       == str
    assert type(shared_number_cpu_inuse_name) == str
    assert type(shared_lock)          == multiprocessing.synchronize.Lock
-   assert type(shared_event)         == multiprocessing.synchronize.Event
+   if not master_process :
+      assert type(job_queue)  == multiprocessing.queues.Queue
+      assert type(done_queue) == multiprocessing.queues.Queue
+   else :
+      assert job_queue == None and done_queue == None
+   assert type(job_priority)         == numpy.ndarray
+   assert job_priority.size          == len(job_table)
+   assert type(job_journal)          == str
+   assert memory_budget == None or type(memory_budget) == float
+   assert type(job_memory)           == numpy.ndarray
+   assert job_memory.size            == len(job_table)
+   assert type(speculative_fit)      == bool
+   assert type(status_file)          == str
+   assert status_port == None or type(status_port) == int
+   assert type(pipeline_worker)      == bool
    # END_DEF
    # ----------------------------------------------------------------------
    job_status_skip  = job_status_name.index( 'skip' )
@@ -456,168 +750,462 @@ def fit_one_process(
    # job_table_index
    job_table_index = numpy.array( range(len(job_table)), dtype = int )
    #
-   if not skip_this_job :
+   if not master_process :
       #
-      # try_one_job
-      # assumes lock not aquired during this operation
-      try_one_job(
+      # This is a worker in the pool. Keep running the jobs that the
+      # master process puts in job_queue until it sends None.
+      #
+      # next_job
+      # If not None, this is ( job_id, prepared ) for the next job that
+      # this worker will run.
+      next_job = None
+      while True :
+         #
+         # job_id, prepared
+         if next_job == None :
+            job_id   = job_queue.get()
+            prepared = None
+         else :
+            (job_id, prepared) = next_job
+            next_job           = None
+         if job_id == None :
+            shm_job_status.close()
+            shm_number_cpu_inuse.close()
+            return
+         #
+         # prefetch_thread
+         # While this job runs, wait for the master process to put the next
+         # job for this worker in job_queue and prepare it. The master only
+         # does this when all the workers are running a job. If this job
+         # completes first, the next job is left in job_queue.
+         if pipeline_worker :
+            prefetch_stop   = threading.Event()
+            prefetch_result = list()
+            def prefetch() :
+               while not prefetch_stop.is_set() :
+                  try :
+                     next_job_id = job_queue.get(timeout = 0.1)
+                  except queue.Empty :
+                     continue
+                  #
+                  # next_prepared
+                  # If prepare_job fails, fit_one_job will call it
+                  # again and report the error.
+                  next_prepared = None
+                  if next_job_id != None :
+                     try :
+                        next_prepared = at_cascade.prepare_job(
+                           job_table,
+                           next_job_id,
+                           all_node_database,
+                           node_table,
+                        )
+                     except Exception :
+                        next_prepared = None
+                  prefetch_result.append( (next_job_id, next_prepared) )
+                  return
+            prefetch_thread = threading.Thread(target = prefetch)
+            prefetch_thread.start()
+         #
+         # memory_limit
+         # address space limit for the dismod_at processes this job starts
+         memory_limit = None
+         if memory_budget != None :
+            memory_limit = int( job_memory[job_id] * 1e9 )
+         #
+         # try_one_job
+         # assumes lock is not acquired during this operation
+         ready_list = try_one_job(
+            job_table,
+            job_id,
+            all_node_database,
+            node_table,
+            fit_integrand,
+            max_number_cpu,
+            master_process,
+            fit_type_list,
+            shared_lock,
+            shared_job_status,
+            shared_number_cpu_inuse,
+            job_status_name,
+            speculative_fit,
+            prepared,
+            memory_limit,
+         )
+         #
+         # done_queue
+         # tell the master process this job is finished. The master process
+         # decrements shared_number_cpu_inuse when it receives this message.
+         done_queue.put( (job_id, ready_list) )
+         #
+         # next_job
+         if pipeline_worker :
+            prefetch_stop.set()
+            prefetch_thread.join()
+            if len(prefetch_result) > 0 :
+               next_job = prefetch_result[0]
+   #
+   # n_worker
+   n_worker = 0
+   if max_number_cpu > 1 :
+      n_worker = max_number_cpu
+   #
+   # start_worker(worker_index)
+   # start (or restart) the worker process_list[worker_index]. The master
+   # process puts the job_id values for this worker in
+   # job_queue_list[worker_index].
+   job_queue_list = n_worker * [ None ]
+   process_list   = n_worker * [ None ]
+   def start_worker(worker_index) :
+      job_queue_list[worker_index] = multiprocessing.Queue()
+      args = (
          job_table,
-         this_job_id,
          all_node_database,
          node_table,
          fit_integrand,
-         skip_this_job,
          max_number_cpu,
-         master_process,
+         False,
          fit_type_list,
-         shared_lock,
-         shared_event,
-         shared_job_status,
          job_status_name,
+         shared_job_status_name,
+         shared_number_cpu_inuse_name,
+         shared_lock,
+         job_queue_list[worker_index],
+         done_queue,
+         job_priority,
+         job_journal,
+         memory_budget,
+         job_memory,
+         speculative_fit,
+         status_file,
+         status_port,
+         pipeline_worker,
       )
+      target = at_cascade.fit_one_process
+      p = multiprocessing.Process(target = target, args = args)
+      p.daemon = False
+      p.start()
+      process_list[worker_index] = p
+   #
+   # done_queue, process_list
+   # start the pool of worker processes
+   if n_worker > 0 :
+      done_queue = multiprocessing.Queue()
+   for worker_index in range(n_worker) :
+      start_worker(worker_index)
+   #
+   # worker_check_seconds
+   # maximum number of seconds between checks for workers that have died
+   worker_check_seconds = 10.0
+   #
+   # worker_job
+   # worker_job[i] is the list of jobs, in the order they were dispatched,
+   # that have been put in job_queue_list[i] and have not completed.
+   worker_job = [ list() for worker_index in range(n_worker) ]
+   #
+   # ready_heap
+   # This is a heap with an element ( - job_priority[job_id], job_id )
+   # for each job that is ready to run. The master process is the only
+   # process that changes a job status from ready to run, so this heap
+   # only needs to be updated when a job is dispatched or completed.
+   acquire_lock(shared_lock)
+   ready_heap = list()
+   for job_id in job_table_index[ shared_job_status == job_status_ready ] :
+      ready_heap.append( ( - float( job_priority[job_id] ), int(job_id) ) )
+   shared_lock.release()
+   heapq.heapify(ready_heap)
+   #
+   # n_job_run
+   # number of jobs that have been dispatched and have not completed
+   n_job_run = 0
+   #
+   # max_job_run
+   # maximum number of jobs that can be dispatched and not completed.
+   # If pipeline_worker is true, each worker can have one job that is
+   # being prepared while it runs another job.
+   max_job_run = max_number_cpu
+   if pipeline_worker :
+      max_job_run = 2 * max_number_cpu
+   #
+   # memory_inuse
+   # sum of job_memory for the jobs that are running
+   memory_inuse = 0.0
+   #
+   # journal_connection
+   journal_connection = dismod_at.create_connection(
+      job_journal, new = False, readonly = False
+   )
+   #
+   # status_count
+   # This is the only time the master process sums the shared_job_status
+   # array. After this it updates the counts as the job status changes.
+   status_count = dict()
+   acquire_lock(shared_lock)
+   for (job_status_i, name) in enumerate(job_status_name) :
+      status_count[name] = int( sum( shared_job_status == job_status_i ) )
+   shared_lock.release()
+   #
+   # run_start, start_time, n_complete
+   # run_start[job_id] is the time that the job was dispatched
+   run_start  = dict()
+   start_time = time.time()
+   n_complete = 0
+   #
+   # status_holder, status_server
+   status_holder = [ get_status_snapshot(
+      job_table, status_count, run_start, start_time, n_complete
+   ) ]
+   write_status_file(status_file, status_holder[0])
+   status_server = None
+   if status_port != None :
+      status_server = start_status_server(status_port, status_holder)
    #
    while True :
-      # shared_lock
-      acquire_lock(shared_lock)
-      #
-      # job_id_ready
-      job_id_ready = job_table_index[ shared_job_status == job_status_ready ]
       #
-      # job_id_run
-      job_id_run  = job_table_index[ shared_job_status == job_status_run ]
+      if len(ready_heap) == 0 and n_job_run == 0 :
+         # We are done, tell each worker to return and wait for it to finish.
+         # Then return to fit_parallel which will use
+         # the shared memory for error checking and then free it.
+         for worker_queue in job_queue_list :
+            worker_queue.put(None)
+         for p in process_list :
+            p.join()
+         if status_server != None :
+            status_server.shutdown()
+            status_server.server_close()
+         journal_connection.close()
+         shm_job_status.close()
+         shm_number_cpu_inuse.close()
+         return
       #
-      # n_job_ready
-      n_job_ready = job_id_ready.size
-      #
-      if n_job_ready == 0 :
-         if job_id_run.size == 0 :
-            #
-            # no jobs running or ready
-            if master_process :
-               if shared_number_cpu_inuse[0] == 1:
-                  # We are done, return to fit_parallel which wuill use
-                  # the shared memory for error checking and then free it.
-                  #
-                  # should not need this release
-                  shared_lock.release()
-                  #
-                  shm_job_status.close()
-                  shm_number_cpu_inuse.close()
-                  return
-               else :
-                  #
-                  # wait for another process to change shared memory,
-                  # then go back to the while True point above
-                  shared_event.clear()
-                  shared_lock.release()
-                  seconds = 10.0
-                  shared_event.wait(timeout = seconds)
-            else :
-               # return this processor
-               shared_number_cpu_inuse[0] -= 1
-               #
-               # release
-               # shared memory has changed
-               shared_event.set()
-               shared_lock.release()
-               #
-               shm_job_status.close()
-               shm_number_cpu_inuse.close()
-               return
-         else :
-            #
-            # jobs are running but none are ready
-            if master_process :
-               #
-               # wait for another process to change shared memory,
-               # then go back to the while True point above
-               shared_event.clear()
-               shared_lock.release()
-               seconds = 10.0
-               shared_event.wait(timeout = seconds)
-            else :
-               # return this processor
-               shared_number_cpu_inuse[0] -= 1
-               #
-               # release
-               shared_lock.release()
-               #
-               shm_job_status.close()
-               shm_number_cpu_inuse.close()
-               return
-      else :
+      if max_number_cpu == 1 :
          #
-         # n_cpu_spawn
-         n_cpu_available  = max_number_cpu - shared_number_cpu_inuse[0]
-         n_cpu_spawn      = min(n_cpu_available, n_job_ready - 1)
+         # There is no worker pool, so run the jobs sequentially
          #
-         # shared_numper_cpu_inuse
-         shared_number_cpu_inuse[0] += n_cpu_spawn
+         # job_id
+         job_id = heapq.heappop(ready_heap)[1]
          #
          # shared_job_status
-         for i in range( n_cpu_spawn + 1 ) :
-            job_id = job_id_ready[i]
-            #
-            assert shared_job_status[job_id] == job_status_ready
-            shared_job_status[job_id] = job_status_run
-         #
-         # release
-         # shared memory has changed
-         shared_event.set()
+         acquire_lock(shared_lock)
+         assert shared_job_status[job_id] == job_status_ready
+         shared_job_status[job_id] = job_status_run
          shared_lock.release()
+         add_journal_entry(journal_connection, job_table, job_id, 'run')
          #
-         # skip_child_job
-         skip_child_job = False
-         #
-         # is_child_master_process
-         is_child_master_process = False
-         #
-         # spawn the new processes
-         for i in range(n_cpu_spawn) :
-            #
-            # job_id
-            job_id = int( job_id_ready[i] )
-            #
-            # p
-            args = (
-               job_table,
-               job_id,
-               all_node_database,
-               node_table,
-               fit_integrand,
-               skip_child_job,
-               max_number_cpu,
-               is_child_master_process,
-               fit_type_list,
-               job_status_name,
-               shared_job_status_name,
-               shared_number_cpu_inuse_name,
-               shared_lock,
-               shared_event,
-            )
-            target = fit_one_process
-            p = multiprocessing.Process(target = target, args = args)
-            #
-            p.deamon = False
-            p.start()
-         #
-         # job_id
-         job_id = int( job_id_ready[n_cpu_spawn] )
+         # status_count, run_start
+         status_count['ready'] -= 1
+         status_count['run']   += 1
+         run_start[job_id]      = time.time()
          #
          # try_one_job
          # assumes lock is not acquired during this operation
-         try_one_job(
+         ready_list = try_one_job(
             job_table,
             job_id,
             all_node_database,
             node_table,
             fit_integrand,
-            skip_this_job,
             max_number_cpu,
             master_process,
             fit_type_list,
             shared_lock,
-            shared_event,
             shared_job_status,
+            shared_number_cpu_inuse,
             job_status_name,
+            speculative_fit,
          )
+         complete_list = [ (job_id, ready_list) ]
+      else :
+         #
+         # complete_list
+         # (job_id, ready_list) for each job that has completed
+         complete_list = list()
+         #
+         # dead workers
+         # If a worker has died, it is restarted. The first job that it was
+         # running has an error and the other jobs it was running are ready
+         # to run again. Jobs that it completed, but whose done_queue message
+         # has not been received, are completed as if the message had been
+         # received.
+         for worker_index in range(n_worker) :
+            if not process_list[worker_index].is_alive() :
+               #
+               # run_list, finish_list
+               # ready_list for a job in finish_list is its children that
+               # changed from wait to ready when it completed.
+               acquire_lock(shared_lock)
+               run_list    = list()
+               finish_list = list()
+               for job_id in worker_job[worker_index] :
+                  if shared_job_status[job_id] == job_status_run :
+                     run_list.append( job_id )
+                  else :
+                     ready_list = list()
+                     if shared_job_status[job_id] == job_status_done :
+                        start_child_job_id = \
+                           job_table[job_id]['start_child_job_id']
+                        end_child_job_id   = \
+                           job_table[job_id]['end_child_job_id']
+                        for child_job_id in range(
+                           start_child_job_id, end_child_job_id
+                        ) :
+                           child_status = shared_job_status[child_job_id]
+                           if child_status == job_status_ready :
+                              ready_list.append( child_job_id )
+                     finish_list.append( (job_id, ready_list) )
+               shared_lock.release()
+               #
+               # worker_job, exitcode, job_queue_list, process_list
+               worker_job[worker_index] = list()
+               exitcode = process_list[worker_index].exitcode
+               start_worker(worker_index)
+               #
+               # complete_list
+               complete_list += finish_list
+               #
+               if len(run_list) > 0 :
+                  #
+                  # dead_job_id, descendant_list
+                  dead_job_id     = run_list[0]
+                  descendant_list = get_descendant_list(job_table, dead_job_id)
+                  #
+                  # shared_job_status, shared_number_cpu_inuse
+                  acquire_lock(shared_lock)
+                  shared_job_status[dead_job_id] = job_status_error
+                  for job_id in descendant_list :
+                     if shared_job_status[job_id] != job_status_skip :
+                        shared_job_status[job_id] = job_status_abort
+                  for job_id in run_list[1 :] :
+                     shared_job_status[job_id] = job_status_ready
+                  shared_number_cpu_inuse[0] -= len(run_list) - 1
+                  shared_lock.release()
+                  #
+                  # ready_heap, status_count, run_start
+                  for job_id in run_list[1 :] :
+                     heapq.heappush( ready_heap,
+                        ( - float( job_priority[job_id] ), int(job_id) )
+                     )
+                     status_count['run']   -= 1
+                     status_count['ready'] += 1
+                     del run_start[job_id]
+                     n_job_run    -= 1
+                     memory_inuse -= job_memory[job_id]
+                  #
+                  # complete_list
+                  complete_list.append( (dead_job_id, list()) )
+                  #
+                  # print message for the job that had an error
+                  job_name     = job_table[dead_job_id]['job_name']
+                  now          = datetime.datetime.now()
+                  current_time = now.strftime("%H:%M:%S")
+                  msg  = f'Error: {current_time}: worker exitcode {exitcode} '
+                  msg += job_name
+                  print( msg )
+         #
+         # dispatch_list
+         # If the highest priority job does not fit in the memory budget,
+         # wait for running jobs to complete before dispatching it.
+         # Each job goes to the worker with the fewest jobs, so a job is only
+         # given to a busy worker when all the workers are busy.
+         dispatch_list = list()
+         while n_job_run < max_job_run and len(ready_heap) > 0 :
+            job_id = ready_heap[0][1]
+            if memory_budget != None and n_job_run > 0 :
+               if memory_inuse + job_memory[job_id] > memory_budget :
+                  break
+            heapq.heappop(ready_heap)
+            worker_index = min(
+               range(max_number_cpu), key = lambda i : len( worker_job[i] )
+            )
+            worker_job[worker_index].append( job_id )
+            dispatch_list.append( (job_id, worker_index) )
+            memory_inuse += job_memory[job_id]
+            n_job_run    += 1
+         #
+         if len(dispatch_list) > 0 :
+            #
+            # shared_job_status, shared_number_cpu_inuse
+            acquire_lock(shared_lock)
+            for (job_id, worker_index) in dispatch_list :
+               assert shared_job_status[job_id] == job_status_ready
+               shared_job_status[job_id] = job_status_run
+            shared_number_cpu_inuse[0] += len(dispatch_list)
+            shared_lock.release()
+            #
+            # job_queue_list, status_count, run_start
+            for (job_id, worker_index) in dispatch_list :
+               add_journal_entry(journal_connection, job_table, job_id, 'run')
+               job_queue_list[worker_index].put(job_id)
+               status_count['ready'] -= 1
+               status_count['run']   += 1
+               run_start[job_id]      = time.time()
+            status_holder[0] = get_status_snapshot(
+               job_table, status_count, run_start, start_time, n_complete
+            )
+            write_status_file(status_file, status_holder[0])
+         #
+         # complete_list
+         # wait until a worker completes a job or it is time to check for
+         # workers that have died. A message for a job that was completed
+         # when its worker died is ignored.
+         if len(complete_list) == 0 :
+            try :
+               (job_id, ready_list) = done_queue.get(
+                  timeout = worker_check_seconds
+               )
+            except queue.Empty :
+               continue
+            for job_list in worker_job :
+               if job_id in job_list :
+                  job_list.remove(job_id)
+                  complete_list.append( (job_id, ready_list) )
+            if len(complete_list) == 0 :
+               continue
+         #
+         # shared_number_cpu_inuse, n_job_run, memory_inuse
+         acquire_lock(shared_lock)
+         shared_number_cpu_inuse[0] -= len(complete_list)
+         shared_lock.release()
+         for (job_id, ready_list) in complete_list :
+            n_job_run    -= 1
+            memory_inuse -= job_memory[job_id]
+      #
+      # complete_list
+      for (job_id, ready_list) in complete_list :
+         #
+         # job_journal
+         # The worker sets the job status before it puts job_id in done_queue.
+         job_status = job_status_name[ shared_job_status[job_id] ]
+         add_journal_entry(journal_connection, job_table, job_id, job_status)
+         #
+         # status_count, run_start, n_complete
+         # If a job has an error, all its descendants that are not prior only
+         # or no data change from wait to abort.
+         status_count['run']      -= 1
+         status_count[job_status] += 1
+         if job_status == 'error' :
+            n_abort = 0
+            for descendant_id in get_descendant_list(job_table, job_id) :
+               row = job_table[descendant_id]
+               if not ( row['prior_only'] or row['no_data'] ) :
+                  n_abort += 1
+            status_count['wait']  -= n_abort
+            status_count['abort'] += n_abort
+         status_count['wait']  -= len(ready_list)
+         status_count['ready'] += len(ready_list)
+         del run_start[job_id]
+         n_complete += 1
+         if max_number_cpu > 1 :
+            print( f'       {status_count}' )
+         #
+         # status_holder
+         status_holder[0] = get_status_snapshot(
+            job_table, status_count, run_start, start_time, n_complete
+         )
+         write_status_file(status_file, status_holder[0])
+         #
+         # ready_heap
+         for ready_job_id in ready_list :
+            heapq.heappush( ready_heap,
+               ( - float( job_priority[ready_job_id] ), int(ready_job_id) )
+            )
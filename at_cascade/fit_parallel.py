@@ -6,6 +6,9 @@
 {xrst_begin fit_parallel}
 {xrst_spell
   cpus
+  http
+  json
+  localhost
 }
 
 Fit With Specified Maximum Number of Processes
@@ -55,6 +58,26 @@ max_number_cpu
 This is the maximum number of cpus (processes) to use.
 This must be greater than zero.
 If it is one, the jobs are run sequentially; i.e., not in parallel.
+Otherwise, a pool of *max_number_cpu* worker processes is started
+at the beginning of fit_parallel and they are used for all the jobs.
+The calling process starts the pool and
+decides which job each worker runs next; see
+:ref:`fit_one_process@master_process` .
+
+job_priority
+************
+The order in which the jobs that are ready get run is determined by the
+:ref:`option_all_table@job_priority` option.
+
+Memory Budget
+*************
+If :ref:`option_all_table@memory_budget_gb` appears in the option_all table,
+a job is only started if the sum of the memory estimates for the jobs
+that are running, plus its memory estimate, is less than or equal the budget
+(or if no other jobs are running).
+The memory estimate for a job is also a limit on the address space
+for each of the dismod_at processes that the job runs;
+see :ref:`fit_one_process@job_memory` .
 
 fit_type_list
 *************
@@ -82,6 +105,65 @@ shared memory names:
    It is suggested that you use the empty string for this value unless you
    are running more than one call with the same prefix and job name.
 
+resume
+******
+If this is false (true), the :ref:`fit_parallel@resume@Job Journal`
+is created (is used) at the start of fit_parallel.
+If *resume* is true and the job journal exists, the jobs that have status
+``done`` in the journal are not run again.
+Each job that is not done, and is the start job or has a parent job
+that is done, is ready to run.
+This can be used to restart a call to fit_parallel that was interrupted;
+e.g., because the system crashed.
+The other arguments to the call with resume true should be the same as
+for the call that was interrupted.
+
+Job Journal
+===========
+The job journal is a database in the same directory as *all_node_database*
+with the name
+
+|  ``job_journal`` *shared_memory_prefix* _ *job_name* *shared_unique* ``.db``
+
+see :ref:`fit_parallel@shared_unique` .
+Its ``job_journal`` table has the following columns:
+
+.. csv-table::
+   :header-rows: 1
+
+   Column,         Type,    Meaning
+   job_journal_id, integer, primary key for this table
+   job_id,         integer, :ref:`create_job_table@job_table@job_id`
+   job_name,       text,    :ref:`create_job_table@job_table@job_name`
+   job_status,     text,    ``run`` or ``done`` or ``error``
+   unix_time,      integer, time that this status was set
+
+A row is added each time a job is started and each time a job completes.
+
+Status File
+***********
+The status file is
+:ref:`option_all_table@result_dir` ``/job_status`` *shared_memory_prefix* _
+*job_name* *shared_unique* ``.json``
+(see :ref:`fit_parallel@shared_unique` ).
+It is rewritten, by writing a temporary file and then renaming it,
+each time jobs are started and each time a job completes.
+It contains a json object with the following keys:
+
+.. csv-table::
+   :header-rows: 1
+
+   Key,             Meaning
+   unix_time,       time that this status was computed
+   status_count,    number of jobs with each job status
+   running,         list of *job_name* and *elapsed_seconds* for running jobs
+   jobs_per_minute, jobs completed per minute during this call to fit_parallel
+   eta_seconds,     estimated seconds until done (null if not yet known)
+
+If :ref:`option_all_table@status_port` appears in the option_all table,
+the same json object is returned by a http GET request to
+``http://localhost:`` *status_port* while fit_parallel is running.
+
 trace.out
 *********
 If the *max_number_cpu* is one, standard output is not redirected.
@@ -91,6 +173,7 @@ Otherwise, standard output for each job is written to a file called
 {xrst_end fit_parallel}
 '''
 # ----------------------------------------------------------------------------
+import os
 import multiprocessing
 import numpy
 import at_cascade
@@ -100,16 +183,163 @@ import dismod_at
 def get_shared_memory_prefix(all_node_database) :
    assert type(all_node_database) == str
    #
-   connection           = dismod_at.create_connection(
-      all_node_database, new = False, readonly = True
+   cascade_context      = at_cascade.get_cascade_context(all_node_database)
+   shared_memory_prefix = \
+      cascade_context.option_all_dict.get('shared_memory_prefix', '')
+   return shared_memory_prefix
+# ----------------------------------------------------------------------------
+# journal_status = get_journal_status(job_journal, job_table)
+def get_journal_status(job_journal, job_table) :
+   assert type(job_journal) == str
+   assert type(job_table) == list
+   #
+   # journal_table
+   connection    = dismod_at.create_connection(
+      job_journal, new = False, readonly = True
    )
-   option_all_table     = dismod_at.get_table_dict(connection, 'option_all')
+   journal_table = dismod_at.get_table_dict(connection, 'job_journal')
    connection.close()
-   shared_memory_prefix = ""
-   for row in option_all_table :
-      if row['option_name'] == 'shared_memory_prefix' :
-         shared_memory_prefix = row['option_value']
-   return shared_memory_prefix
+   #
+   # journal_status
+   # the last status in the journal for each job that appears in it
+   journal_status = dict()
+   for row in journal_table :
+      job_id = row['job_id']
+      if job_id >= len(job_table) or \
+         row['job_name'] != job_table[job_id]['job_name'] :
+         msg  = f'fit_parallel: resume: {job_journal} job_id = {job_id}, '
+         msg += f'job_name = {row["job_name"]} does not match the job_table'
+         assert False, msg
+      journal_status[job_id] = row['job_status']
+   return journal_status
+# ----------------------------------------------------------------------------
+# subtree_count = get_subtree_count(option_all_dict, node_table)
+# subtree_count[node_id] is the number of data table rows that correspond
+# to node_id or one of its descendants.
+def get_subtree_count(option_all_dict, node_table) :
+   assert type(option_all_dict) == dict
+   assert type(node_table) == list
+   #
+   # node_count
+   # number of data table rows that have each node_id
+   root_database = option_all_dict['root_database']
+   connection    = dismod_at.create_connection(
+      root_database, new = False, readonly = True
+   )
+   command    = 'SELECT node_id, COUNT(*) FROM data GROUP BY node_id'
+   result     = dismod_at.sql_command(connection, command)
+   connection.close()
+   node_count = numpy.zeros( len(node_table), dtype = float )
+   for (node_id, count) in result :
+      if node_id != None :
+         node_count[node_id] = count
+   #
+   # subtree_count
+   subtree_count = numpy.zeros( len(node_table), dtype = float )
+   for node_id in range( len(node_table) ) :
+      ancestor_id = node_id
+      while ancestor_id != None :
+         subtree_count[ancestor_id] += node_count[node_id]
+         ancestor_id = node_table[ancestor_id]['parent']
+   return subtree_count
+# ----------------------------------------------------------------------------
+# job_priority = get_job_priority(option_all_dict, node_table, job_table)
+def get_job_priority(option_all_dict, node_table, job_table) :
+   assert type(option_all_dict) == dict
+   assert type(node_table) == list
+   assert type(job_table) == list
+   #
+   # priority_type
+   priority_type = 'job_id'
+   if 'job_priority' in option_all_dict :
+      priority_type = option_all_dict['job_priority']
+   if priority_type not in [ 'job_id', 'depth', 'descendant', 'data' ] :
+      msg  = f'option_all table: job_priority = {priority_type} is not '
+      msg += 'job_id, depth, descendant, or data'
+      assert False, msg
+   #
+   # n_job
+   n_job = len(job_table)
+   #
+   # job_priority
+   # Jobs that are ready with larger priority are run first.
+   # Ties are broken by running the smaller job_id first.
+   job_priority = numpy.zeros(n_job, dtype = float)
+   if priority_type == 'job_id' :
+      return job_priority
+   #
+   # job_cost
+   if priority_type != 'data' :
+      job_cost = numpy.ones(n_job, dtype = float)
+   else :
+      subtree_count = get_subtree_count(option_all_dict, node_table)
+      job_cost      = numpy.empty(n_job, dtype = float)
+      for job_id in range(n_job) :
+         fit_node_id      = job_table[job_id]['fit_node_id']
+         job_cost[job_id] = 1.0 + subtree_count[fit_node_id]
+   #
+   # job_priority
+   # Child job_id values are greater than their parent job_id values,
+   # so we can compute the priority for all the children of a job before
+   # computing the priority for the job.
+   for job_id in reversed( range(n_job) ) :
+      row = job_table[job_id]
+      if not row['prior_only'] :
+         child_priority = [ 0.0 ]
+         for child_job_id in range(
+            row['start_child_job_id'], row['end_child_job_id']
+         ) :
+            child_priority.append( job_priority[child_job_id] )
+         if priority_type == 'descendant' :
+            job_priority[job_id] = job_cost[job_id] + sum(child_priority)
+         else :
+            job_priority[job_id] = job_cost[job_id] + max(child_priority)
+   #
+   return job_priority
+# ----------------------------------------------------------------------------
+# memory_budget, job_memory =
+#  get_job_memory(option_all_dict, node_table, job_table)
+# memory_budget is None if there is no memory admission control.
+# Otherwise it and job_memory[job_id] are in GB.
+def get_job_memory(option_all_dict, node_table, job_table) :
+   assert type(option_all_dict) == dict
+   assert type(node_table) == list
+   assert type(job_table) == list
+   #
+   # n_job
+   n_job = len(job_table)
+   #
+   # memory_budget
+   if 'memory_budget_gb' not in option_all_dict :
+      memory_budget = None
+      job_memory    = numpy.zeros(n_job, dtype = float)
+      return memory_budget, job_memory
+   memory_budget = float( option_all_dict['memory_budget_gb'] )
+   #
+   # memory_per_job, memory_per_data
+   memory_per_job  = 2.0
+   memory_per_data = 0.0
+   if 'memory_per_job_gb' in option_all_dict :
+      memory_per_job = float( option_all_dict['memory_per_job_gb'] )
+   if 'memory_per_data_kb' in option_all_dict :
+      memory_per_data = float( option_all_dict['memory_per_data_kb'] ) / 1e6
+   if memory_budget <= 0.0 or memory_per_job <= 0.0 or memory_per_data < 0.0 :
+      msg  = 'option_all table: memory_budget_gb or memory_per_job_gb '
+      msg += 'is not positive, or memory_per_data_kb is negative'
+      assert False, msg
+   #
+   # job_memory
+   if memory_per_data == 0.0 :
+      job_memory = numpy.full(n_job, memory_per_job, dtype = float)
+   else :
+      subtree_count = get_subtree_count(option_all_dict, node_table)
+      job_memory    = numpy.empty(n_job, dtype = float)
+      for job_id in range(n_job) :
+         fit_node_id        = job_table[job_id]['fit_node_id']
+         job_memory[job_id] = \
+            memory_per_job + memory_per_data * subtree_count[fit_node_id]
+   #
+   return memory_budget, job_memory
 # ----------------------------------------------------------------------------
 # BEGIN_DEF
 # at_cascade.fit_parallel
@@ -123,6 +353,7 @@ def fit_parallel(
    max_number_cpu    ,
    fit_type_list     ,
    shared_unique     ,
+   resume            = False ,
 ) :
    #
    assert type(job_table)         == list
@@ -134,6 +365,7 @@ def fit_parallel(
    assert type(max_number_cpu)    == int
    assert type(fit_type_list)     == list
    assert type(shared_unique)     == str
+   assert type(resume)            == bool
    # END_DEF
    # ----------------------------------------------------------------------
    # job_status_name
@@ -196,11 +428,12 @@ def fit_parallel(
    ]
    #
    # shared_number_cpu_inuse
-   shared_number_cpu_inuse[0] = 1
+   shared_number_cpu_inuse[0] = 0
    #
    # shared_job_status
    for job_id in range( len(job_table) ) :
-      if job_table[job_id]['prior_only'] :
+      row = job_table[job_id]
+      if row['prior_only'] or row['no_data'] :
          shared_job_status[job_id] = job_status_skip
       else :
          shared_job_status[job_id]  = job_status_wait
@@ -212,30 +445,105 @@ def fit_parallel(
       end_child_job_id      = job_table[start_job_id ]['end_child_job_id']
       child_range = range(start_child_job_id, end_child_job_id)
       for child_job_id in child_range :
-         if not job_table[child_job_id]['prior_only'] :
+         if shared_job_status[child_job_id] == job_status_wait :
             shared_job_status[child_job_id] = job_status_ready
    else :
-      shared_job_status[start_job_id] = job_status_run
+      shared_job_status[start_job_id] = job_status_ready
    #
-   # master_process
-   master_process = True
+   # job_journal
+   job_journal = os.path.dirname( os.path.abspath(all_node_database) )
+   job_journal = f'{job_journal}/job_journal{shared_memory_prefix_plus}.db'
+   if resume and not os.path.exists(job_journal) :
+      print( f'resume: {job_journal} does not exist, starting from scratch' )
+   if resume and os.path.exists(job_journal) :
+      #
+      # shared_job_status
+      # Only the jobs that are not done will be run.
+      journal_status = get_journal_status(job_journal, job_table)
+      for job_id in range( len(job_table) ) :
+         if journal_status.get(job_id, None) == 'done' :
+            assert not job_table[job_id]['prior_only']
+            shared_job_status[job_id] = job_status_done
+      for job_id in range( len(job_table) ) :
+         status = shared_job_status[job_id]
+         if status not in [ job_status_skip, job_status_done ] :
+            if job_id == start_job_id :
+               shared_job_status[job_id] = job_status_ready
+            else :
+               parent_job_id = job_table[job_id]['parent_job_id']
+               if shared_job_status[parent_job_id] == job_status_done :
+                  shared_job_status[job_id] = job_status_ready
+               else :
+                  shared_job_status[job_id] = job_status_wait
+      n_done = int( sum( shared_job_status == job_status_done ) )
+      print( f'resume: {n_done} jobs are already done' )
+   else :
+      connection = dismod_at.create_connection(
+         job_journal, new = True, readonly = False
+      )
+      cmd  = 'create table job_journal('
+      cmd += 'job_journal_id integer primary key,'
+      cmd += 'job_id         integer,'
+      cmd += 'job_name       text,'
+      cmd += 'job_status     text,'
+      cmd += 'unix_time      integer)'
+      dismod_at.sql_command(connection, cmd)
+      connection.close()
    #
    # shared_lock
    shared_lock = multiprocessing.Lock()
    #
-   # shared_event
-   # shared memory has changed
-   shared_event = multiprocessing.Event()
-   shared_event.set()
+   # option_all_dict
+   cascade_context = at_cascade.get_cascade_context(all_node_database)
+   option_all_dict = cascade_context.option_all_dict
+   #
+   # job_priority
+   job_priority = get_job_priority(option_all_dict, node_table, job_table)
+   #
+   # memory_budget, job_memory
+   memory_budget, job_memory = \
+      get_job_memory(option_all_dict, node_table, job_table)
+   #
+   # speculative_fit
+   speculative_fit = False
+   if 'speculative_fit' in option_all_dict :
+      speculative_fit = option_all_dict['speculative_fit']
+      if speculative_fit not in [ 'true', 'false' ] :
+         msg = 'option_all table: speculative_fit is not true or false'
+         assert False, msg
+      speculative_fit = speculative_fit == 'true'
+   #
+   # status_file
+   result_dir  = option_all_dict['result_dir']
+   status_file = f'{result_dir}/job_status{shared_memory_prefix_plus}.json'
+   #
+   # status_port
+   status_port = None
+   if 'status_port' in option_all_dict :
+      status_port = int( option_all_dict['status_port'] )
+   #
+   # pipeline_worker
+   pipeline_worker = False
+   if 'pipeline_worker' in option_all_dict :
+      pipeline_worker = option_all_dict['pipeline_worker']
+      if pipeline_worker not in [ 'true', 'false' ] :
+         msg = 'option_all table: pipeline_worker is not true or false'
+         assert False, msg
+      pipeline_worker = pipeline_worker == 'true'
+   #
+   # job_queue, done_queue
+   # The master process creates these queues when it starts the workers.
+   job_queue  = None
+   done_queue = None
    #
    # fit_one_process
+   # this is the master process
+   master_process = True
    at_cascade.fit_one_process(
       job_table,
-      start_job_id,
       all_node_database,
       node_table,
       fit_integrand,
-      skip_start_job,
       max_number_cpu,
       master_process,
       fit_type_list,
@@ -243,11 +551,20 @@ def fit_parallel(
       shared_job_status_name,
       shared_number_cpu_inuse_name,
       shared_lock,
-      shared_event,
+      job_queue,
+      done_queue,
+      job_priority,
+      job_journal,
+      memory_budget,
+      job_memory,
+      speculative_fit,
+      status_file,
+      status_port,
+      pipeline_worker,
    )
    #
    # shared_number_cpu_inuse
-   if shared_number_cpu_inuse[0] != 1 :
+   if shared_number_cpu_inuse[0] != 0 :
       n_inuse = shared_number_cpu_inuse[0]
       msg =f'{shared_memory_prefix_plus}_number_cpu_inuse[0] = {n_inuse}'
       assert False, msg
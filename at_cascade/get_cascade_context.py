@@ -0,0 +1,247 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: University of Washington <https://www.washington.edu>
+# SPDX-FileContributor: 2021-25 Bradley M. Bell
+# ----------------------------------------------------------------------------
+'''
+{xrst_begin get_cascade_context}
+{xrst_spell
+  cov
+}
+
+Get Cached Information From an All Node Database
+################################################
+
+Prototype
+*********
+{xrst_literal
+   # BEGIN_DEF
+   # END_DEF
+}
+
+Purpose
+*******
+Each job in a cascade uses the same information from the
+:ref:`all_node_db-name` .
+This routine reads and processes that information at most once per process
+(instead of once or more per job).
+
+all_node_database
+*****************
+is a python string specifying the location of the
+:ref:`all_node_db-name`
+relative to the current working directory.
+
+cascade_context
+***************
+The return value is a ``cascade_context_class`` object.
+The same object is returned for every call,
+in the same process, with the same *all_node_database* ,
+as long as the modification time and size of the file have not changed.
+The values in *cascade_context* must not be modified.
+The attributes below that require reading a table
+are computed the first time they are used.
+This routine, and the attributes of *cascade_context* ,
+can be used by more than one thread at the same time.
+
+all_node_database
+=================
+*cascade_context*\ ``.all_node_database``
+is the absolute path for the all node database.
+
+option_all_dict
+===============
+*cascade_context*\ ``.option_all_dict`` is a ``dict`` where
+*option_all_dict* [ *option_name* ] is the corresponding *option_value*
+in the :ref:`option_all_table-name` .
+
+table
+=====
+*cascade_context*\ ``.table(`` *table_name* ``)``
+is a ``list`` of ``dict`` representation of the specified table
+in the all node database.
+Each table is read at most once.
+
+node_split_set
+==============
+*cascade_context*\ ``.node_split_set`` is a ``set`` containing the
+node_id values in the :ref:`node_split_table-name` .
+
+split_reference_id
+==================
+*cascade_context*\ ``.split_reference_id`` is a ``dict`` where
+*split_reference_id* [ *split_reference_name* ] is the corresponding
+split_reference_id in the :ref:`split_reference_table-name` .
+
+cov_reference_index
+===================
+*cascade_context*\ ``.cov_reference_index`` is a ``dict`` where
+*cov_reference_index* [ ( *node_id* , *split_reference_id* ) ]
+is the list of rows in the :ref:`cov_reference_table-name`
+with the specified node_id and split_reference_id.
+
+omega_index
+===========
+*cascade_context*\ ``.omega_index`` is a ``dict`` where
+*omega_index* [ ( *node_id* , *split_reference_id* ) ]
+is the :ref:`omega_all@omega_index Table@omega_all_id` for the first
+omega_all table row for the specified node_id and split_reference_id.
+If a (node_id, split_reference_id) pair is not in the
+:ref:`omega_all@omega_index Table`, it is not in *omega_index* .
+
+Options That Must Appear
+========================
+*cascade_context*\ ``.result_dir`` ,
+*cascade_context*\ ``.root_database`` , and
+*cascade_context*\ ``.root_node_name`` are the values of the
+:ref:`option_all_table@result_dir` ,
+:ref:`option_all_table@root_database` , and
+:ref:`option_all_table@root_node_name` options.
+
+root_split_reference_id
+=======================
+*cascade_context*\ ``.root_split_reference_id`` is the split_reference_id
+corresponding to :ref:`option_all_table@root_split_reference_name` .
+If that option does not appear, it is None.
+
+{xrst_end get_cascade_context}
+'''
+# ----------------------------------------------------------------------------
+import os
+import threading
+import dismod_at
+# ----------------------------------------------------------------------------
+# cascade_context_cache[all_node_database] = (file_key, cascade_context)
+# where all_node_database is an absolute path and file_key identifies the
+# version of the file that cascade_context corresponds to.
+cascade_context_cache = dict()
+#
+# cascade_context_lock
+# lock used to access cascade_context_cache
+cascade_context_lock = threading.Lock()
+# ----------------------------------------------------------------------------
+class cascade_context_class :
+   #
+   # __init__
+   def __init__(self, all_node_database) :
+      assert type(all_node_database) == str
+      #
+      # lock
+      # The lazy values can be requested by more than one thread at the
+      # same time. Each value is computed in a local variable, while
+      # holding this lock, and only then stored in self.
+      self.lock = threading.RLock()
+      #
+      self.all_node_database = all_node_database
+      self.table_dict        = dict()
+      #
+      # option_all_dict
+      option_all_dict = dict()
+      for row in self.table('option_all') :
+         option_all_dict[ row['option_name'] ] = row['option_value']
+      self.option_all_dict = option_all_dict
+      #
+      # result_dir, root_database, root_node_name
+      self.result_dir     = self.option_all_dict.get('result_dir', None)
+      self.root_database  = self.option_all_dict.get('root_database', None)
+      self.root_node_name = self.option_all_dict.get('root_node_name', None)
+      #
+      # lazy values
+      self._node_split_set      = None
+      self._split_reference_id  = None
+      self._cov_reference_index = None
+      self._omega_index         = None
+   #
+   # table
+   def table(self, table_name) :
+      assert type(table_name) == str
+      with self.lock :
+         if table_name not in self.table_dict :
+            connection = dismod_at.create_connection(
+               self.all_node_database, new = False, readonly = True
+            )
+            table = dismod_at.get_table_dict(connection, table_name)
+            connection.close()
+            self.table_dict[table_name] = table
+         return self.table_dict[table_name]
+   #
+   # node_split_set
+   @property
+   def node_split_set(self) :
+      with self.lock :
+         if self._node_split_set is None :
+            node_split_set = set()
+            for row in self.table('node_split') :
+               node_split_set.add( row['node_id'] )
+            self._node_split_set = node_split_set
+         return self._node_split_set
+   #
+   # split_reference_id
+   @property
+   def split_reference_id(self) :
+      with self.lock :
+         if self._split_reference_id is None :
+            split_reference_id = dict()
+            for (row_id, row) in enumerate( self.table('split_reference') ) :
+               split_reference_id[ row['split_reference_name'] ] = row_id
+            self._split_reference_id = split_reference_id
+         return self._split_reference_id
+   #
+   # root_split_reference_id
+   @property
+   def root_split_reference_id(self) :
+      if 'root_split_reference_name' not in self.option_all_dict :
+         return None
+      name = self.option_all_dict['root_split_reference_name']
+      if name not in self.split_reference_id :
+         msg  = 'option_all table: root_split_reference_name = '
+         msg += f'{name} is not in the split_reference table'
+         assert False, msg
+      return self.split_reference_id[name]
+   #
+   # cov_reference_index
+   @property
+   def cov_reference_index(self) :
+      with self.lock :
+         if self._cov_reference_index is None :
+            cov_reference_index = dict()
+            for row in self.table('cov_reference') :
+               key = ( row['node_id'], row['split_reference_id'] )
+               if key not in cov_reference_index :
+                  cov_reference_index[key] = list()
+               cov_reference_index[key].append( row )
+            self._cov_reference_index = cov_reference_index
+         return self._cov_reference_index
+   #
+   # omega_index
+   @property
+   def omega_index(self) :
+      with self.lock :
+         if self._omega_index is None :
+            omega_index = dict()
+            for row in self.table('omega_index') :
+               key = ( row['node_id'], row['split_reference_id'] )
+               omega_index[key] = row['omega_all_id']
+            self._omega_index = omega_index
+         return self._omega_index
+# ----------------------------------------------------------------------------
+# BEGIN_DEF
+# at_cascade.get_cascade_context
+def get_cascade_context(all_node_database) :
+   assert type(all_node_database) == str
+   # END_DEF
+   #
+   # all_node_database, file_key
+   all_node_database = os.path.abspath(all_node_database)
+   stat              = os.stat(all_node_database)
+   file_key          = (stat.st_mtime_ns, stat.st_size)
+   #
+   # cascade_context
+   with cascade_context_lock :
+      if all_node_database in cascade_context_cache :
+         (cache_key, cascade_context) = \
+            cascade_context_cache[all_node_database]
+         if cache_key == file_key :
+            return cascade_context
+      cascade_context = cascade_context_class(all_node_database)
+      cascade_context_cache[all_node_database] = (file_key, cascade_context)
+   return cascade_context
@@ -0,0 +1,54 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: University of Washington <https://www.washington.edu>
+# SPDX-FileContributor: 2021-25 Bradley M. Bell
+# ----------------------------------------------------------------------------
+r'''
+{xrst_begin get_smooth_grid_index}
+
+Index the Smooth Grid Table by smooth_id
+########################################
+
+Prototype
+*********
+{xrst_literal ,
+   # BEGIN_DEF, # END_DEF
+   # BEGIN_RETURN, # END_RETURN
+}
+
+smooth_table
+************
+This is a ``list`` of ``dict`` containing the dismod_at smooth table.
+
+smooth_grid_table
+*****************
+This is a ``list`` of ``dict`` containing the dismod_at smooth_grid table.
+
+smooth_grid_index
+*****************
+This is a ``list`` with length equal to the length of *smooth_table* .
+For each *smooth_id* ,
+*smooth_grid_index* [ *smooth_id* ] is the ``list`` of
+*smooth_grid_table* rows with the specified *smooth_id*
+(in smooth_grid_id order).
+It is empty if there are no such rows.
+
+{xrst_end get_smooth_grid_index}
+'''
+# ----------------------------------------------------------------------------
+# BEGIN_DEF
+# at_cascade.get_smooth_grid_index
+def get_smooth_grid_index(smooth_table, smooth_grid_table) :
+   assert type(smooth_table) == list
+   assert type(smooth_grid_table) == list
+   # END_DEF
+   #
+   # smooth_grid_index
+   smooth_grid_index = [ list() for row in smooth_table ]
+   for grid_row in smooth_grid_table :
+      smooth_grid_index[ grid_row['smooth_id'] ].append( grid_row )
+   #
+   # BEGIN_RETURN
+   # ...
+   assert type(smooth_grid_index) == list
+   return smooth_grid_index
+   # END_RETURN
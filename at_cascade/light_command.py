@@ -0,0 +1,346 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: University of Washington <https://www.washington.edu>
+# SPDX-FileContributor: 2021-25 Bradley M. Bell
+# ----------------------------------------------------------------------------
+r'''
+{xrst_begin light_command}
+{xrst_spell
+  dismodat
+  mulcov
+  mulstd
+  py
+  rng
+  var
+}
+
+Run Lightweight dismod_at Commands in Process
+#############################################
+
+Prototype
+*********
+{xrst_literal ,
+   # BEGIN_DEF, # END_DEF
+   # BEGIN_RUN, # END_RUN
+}
+
+Purpose
+*******
+Each dismod_at (or dismodat.py) command that is run as a separate process
+opens the database, reads the tables it needs, and writes its results.
+This routine runs a list of the lightweight commands,
+using one connection and one transaction,
+without starting any new processes.
+It is used when :ref:`option_all_table@in_process_command` is true.
+
+command_list
+************
+is a ``list`` of commands. Each command is a ``list`` of ``str``
+that is the same as the command that would be run
+as a separate process; e.g.,
+
+| ``[ 'dismod_at'`` , *database* , ``'bnd_mulcov'`` , *max_abs_effect* ``]``
+
+The *database* must be the same for all of the commands
+and the commands are run in the order they appear in the list.
+
+root_database
+*************
+is the :ref:`glossary@root_database` .
+The :ref:`constant tables <module@at_cascade.constant_table_list>`
+are read from this database.
+
+Commands
+********
+
+set option
+==========
+| ``[ 'dismod_at'`` , *database* , ``'set', 'option'`` ,
+  *name* , *value* ``]``
+sets the option table value for *name* to *value* .
+If *value* is the empty string, the option table value is null.
+
+bnd_mulcov
+==========
+| ``[ 'dismod_at'`` , *database* , ``'bnd_mulcov'`` , *max_abs_effect* ``]``
+
+The bnd_mulcov table is created (replaced) with one row for each row
+of the mulcov table.
+The max_cov_diff column is the maximum, over the data_subset table,
+of the absolute difference between the covariate value and its reference.
+The max_mulcov column is *max_abs_effect* divided by max_cov_diff,
+or null (no bound) if max_cov_diff is zero
+or the mulcov_type is meas_noise.
+This is the same as the dismod_at bnd_mulcov command; see
+test/light_command.py .
+
+hold_out
+========
+The dismod_at ``hold_out`` command is not supported
+because its random subset must be the same as when it is run by dismod_at.
+It is always run as a separate process.
+
+perturb
+=======
+| ``[ 'dismodat.py'`` , *database* , ``'perturb'`` , *table_name* ,
+  *sigma* ``]``
+
+where *table_name* is ``start_var`` or ``scale_var`` .
+Each value in the table is multiplied by ``exp`` ( *sigma* * *z* )
+where *z* is an independent standard normal sample.
+The result is then projected onto the lower and upper limits for the
+variable; i.e., its value prior, the mulstd prior in the smooth table,
+and the bnd_mulcov table (if it exists).
+
+run_light_command
+*****************
+If *in_process_command* is true, this routine prints (or writes to
+*file_stdout* ) each command and then runs *command_list* using
+light_command.
+Otherwise each command is run as a separate process using
+:ref:`system_command-name` with the specified
+*file_stdout* , *stage_resource* and *memory_limit* .
+
+{xrst_end light_command}
+'''
+# ----------------------------------------------------------------------------
+import os
+import math
+import time
+import random
+import dismod_at
+import at_cascade
+# ----------------------------------------------------------------------------
+# table = get_table(connection, fit_or_root, table_name)
+def get_table(connection, fit_or_root, table_name) :
+   if table_name in at_cascade.constant_table_list :
+      return fit_or_root.get_table(table_name)
+   return dismod_at.get_table_dict(connection, table_name)
+# ----------------------------------------------------------------------------
+# set_option(connection, name, value)
+def set_option(connection, name, value) :
+   if value == '' :
+      value = None
+   cursor  = connection.cursor()
+   command = 'UPDATE option SET option_value = ? WHERE option_name = ?'
+   cursor.execute(command, (value, name) )
+   if cursor.rowcount == 0 :
+      command  = 'INSERT INTO option (option_id, option_name, option_value) '
+      command += 'SELECT COALESCE( MAX(option_id) + 1, 0), ?, ? FROM option'
+      cursor.execute(command, (name, value) )
+# ----------------------------------------------------------------------------
+# bnd_mulcov(connection, fit_or_root, root_schema, argument)
+# root_schema is the schema name for the root database in connection.
+def bnd_mulcov(connection, fit_or_root, root_schema, argument) :
+   if len(argument) != 1 :
+      msg  = 'light_command: bnd_mulcov: only max_abs_effect is supported'
+      assert False, msg
+   max_abs_effect = float( argument[0] )
+   #
+   # covariate_table, mulcov_table
+   covariate_table = get_table(connection, fit_or_root, 'covariate')
+   mulcov_table    = get_table(connection, fit_or_root, 'mulcov')
+   #
+   # max_cov_diff
+   # a null covariate value is equal to its reference
+   max_cov_diff = len(covariate_table) * [ 0.0 ]
+   if len(covariate_table) > 0 :
+      column_list = list()
+      for (covariate_id, row) in enumerate(covariate_table) :
+         reference = float( row['reference'] )
+         column_list.append(
+            f'MAX( ABS( data.x_{covariate_id} - {reference} ) )'
+         )
+      command  = 'SELECT ' + ', '.join(column_list) + ' FROM data_subset '
+      command += f'JOIN {root_schema}.data AS data '
+      command += 'ON data_subset.data_id = data.data_id'
+      result   = connection.execute(command).fetchone()
+      for (covariate_id, value) in enumerate(result) :
+         if value is not None :
+            max_cov_diff[covariate_id] = value
+   #
+   # row_list
+   row_list = list()
+   for (mulcov_id, row) in enumerate( mulcov_table ) :
+      cov_diff   = max_cov_diff[ row['covariate_id'] ]
+      max_mulcov = None
+      if row['mulcov_type'] != 'meas_noise' and cov_diff > 0.0 :
+         max_mulcov = max_abs_effect / cov_diff
+      row_list.append( (mulcov_id, cov_diff, max_mulcov) )
+   #
+   # bnd_mulcov table
+   connection.execute( 'DROP TABLE IF EXISTS bnd_mulcov' )
+   command  = 'CREATE TABLE bnd_mulcov('
+   command += 'bnd_mulcov_id integer primary key, '
+   command += 'max_cov_diff real, max_mulcov real)'
+   connection.execute(command)
+   command = 'INSERT INTO bnd_mulcov VALUES (?, ?, ?)'
+   connection.executemany(command, row_list)
+# ----------------------------------------------------------------------------
+# perturb(connection, fit_or_root, argument, rng)
+def perturb(connection, fit_or_root, argument, rng) :
+   table_name = argument[0]
+   sigma      = float( argument[1] )
+   if table_name not in [ 'start_var', 'scale_var' ] :
+      msg  = f'light_command: perturb: {table_name} is not '
+      msg += 'start_var or scale_var'
+      assert False, msg
+   #
+   # var_table, smooth_table, prior_table
+   var_table    = get_table(connection, fit_or_root, 'var')
+   smooth_table = get_table(connection, fit_or_root, 'smooth')
+   prior_table  = get_table(connection, fit_or_root, 'prior')
+   #
+   # grid_index
+   grid_index = dict()
+   for row in get_table(connection, fit_or_root, 'smooth_grid') :
+      key = ( row['smooth_id'], row['age_id'], row['time_id'] )
+      grid_index[key] = row
+   #
+   # max_mulcov
+   max_mulcov = dict()
+   if at_cascade.table_exists(connection, 'bnd_mulcov') :
+      bnd_mulcov_table = get_table(connection, fit_or_root, 'bnd_mulcov')
+      for (mulcov_id, row) in enumerate(bnd_mulcov_table) :
+         max_mulcov[mulcov_id] = row['max_mulcov']
+   #
+   # row_list
+   col_name = f'{table_name}_value'
+   row_list = list()
+   for (var_id, row) in enumerate(
+      get_table(connection, fit_or_root, table_name)
+   ) :
+      var_row = var_table[var_id]
+      #
+      # lower, upper
+      var_type = var_row['var_type']
+      if var_type.startswith('mulstd_') :
+         prior_id    = smooth_table[ var_row['smooth_id'] ][
+            f'{var_type}_prior_id'
+         ]
+         const_value = None
+      else :
+         key         = ( var_row['smooth_id'], var_row['age_id'],
+            var_row['time_id']
+         )
+         prior_id    = grid_index[key]['value_prior_id']
+         const_value = grid_index[key]['const_value']
+      if prior_id is None :
+         lower = const_value
+         upper = const_value
+      else :
+         lower = prior_table[prior_id]['lower']
+         upper = prior_table[prior_id]['upper']
+      if lower is None :
+         lower = - math.inf
+      if upper is None :
+         upper = + math.inf
+      mulcov_id = var_row['mulcov_id']
+      if mulcov_id is not None and max_mulcov.get(mulcov_id) is not None :
+         lower = max(lower, - max_mulcov[mulcov_id] )
+         upper = min(upper, + max_mulcov[mulcov_id] )
+      #
+      # value
+      value = row[col_name] * math.exp( sigma * rng.gauss(0.0, 1.0) )
+      value = min( max(value, lower), upper )
+      row_list.append( (value, var_id) )
+   #
+   # table_name
+   command  = f'UPDATE {table_name} SET {col_name} = ? '
+   command += f'WHERE {table_name}_id = ?'
+   connection.executemany(command, row_list)
+# ----------------------------------------------------------------------------
+# BEGIN_DEF
+# at_cascade.light_command
+def light_command(command_list, root_database) :
+   assert type(command_list) == list
+   assert type(root_database) == str
+   # END_DEF
+   #
+   # database
+   database = command_list[0][1]
+   for command in command_list :
+      assert type(command) == list
+      if command[1] != database :
+         msg  = 'light_command: all commands must use the same database: '
+         msg += ' '.join(command)
+         assert False, msg
+   #
+   # connection, fit_or_root
+   connection  = dismod_at.create_connection(
+      database, new = False, readonly = False
+   )
+   fit_or_root = at_cascade.fit_or_root_class(database, root_database)
+   #
+   # root_schema
+   # The bnd_mulcov command reads the root database data table.
+   # The attach must be done before the transaction starts.
+   root_schema = 'main'
+   attach_root = False
+   for command in command_list :
+      if command[0] == 'dismod_at' and command[2] == 'bnd_mulcov' :
+         attach_root = not os.path.samefile(database, root_database)
+   if attach_root :
+      root_schema = 'root_db'
+      connection.execute( 'ATTACH DATABASE ? AS root_db', (root_database,) )
+   #
+   # rng
+   random_seed = 0
+   for row in get_table(connection, fit_or_root, 'option') :
+      if row['option_name'] == 'random_seed' :
+         if row['option_value'] is not None :
+            random_seed = int( row['option_value'] )
+   if random_seed == 0 :
+      random_seed = int( time.time() )
+   rng = random.Random(random_seed)
+   #
+   for command in command_list :
+      program = command[0]
+      name    = command[2]
+      if program == 'dismod_at' and name == 'set' and command[3] == 'option' :
+         set_option(connection, command[4], command[5])
+      elif program == 'dismod_at' and name == 'bnd_mulcov' :
+         bnd_mulcov(connection, fit_or_root, root_schema, command[3 :])
+      elif program == 'dismodat.py' and name == 'perturb' :
+         perturb(connection, fit_or_root, command[3 :], rng)
+      else :
+         msg = 'light_command: not supported: ' + ' '.join(command)
+         assert False, msg
+   #
+   # connection, fit_or_root
+   connection.commit()
+   connection.close()
+   fit_or_root.close()
+# ----------------------------------------------------------------------------
+# BEGIN_RUN
+# at_cascade.run_light_command
+def run_light_command(
+   command_list       ,
+   root_database      ,
+   in_process_command ,
+   file_stdout        ,
+   stage_resource     ,
+   memory_limit = None,
+) :
+   assert type(command_list) == list
+   assert type(root_database) == str
+   assert type(in_process_command) == bool
+   # END_RUN
+   #
+   if len(command_list) == 0 :
+      return
+   if not in_process_command :
+      for command in command_list :
+         at_cascade.system_command(
+            command,
+            file_stdout,
+            stage_resource,
+            memory_limit = memory_limit,
+         )
+      return
+   for command in command_list :
+      line = 'in process: ' + ' '.join(command)
+      if file_stdout is None :
+         print( line )
+      else :
+         file_stdout.write( line + '\n' )
+   light_command(command_list, root_database)
@@ -84,6 +84,14 @@ have been replace by the optimal estimate for fitting with out the integrands
 that use the ODE.
 The last operation on this database is a dismod_at init command.
 
+c_stage_resource
+****************
+The resources used by each stage of the no_ode fit are recorded in the
+:ref:`stage_resource_class@c_stage_resource Table` of *no_ode_database* .
+Each command run by the no_ode fit is in one of these stages;
+this includes the commands that set hold_out_integrand
+in *no_ode_database* and in *root_fit_database* .
+
 {xrst_end no_ode_fit}
 '''
 import datetime
@@ -94,28 +102,6 @@ import os
 import copy
 import dismod_at
 import at_cascade
-# -----------------------------------------------------------------------------
-def system_command(command, file_stdout) :
-   if file_stdout is None :
-      dismod_at.system_command_prc(
-         command,
-         print_command = True,
-         return_stdout = False,
-         return_stderr = False,
-         file_stdout   = None,
-         file_stderr   = None,
-         write_command = False,
-      )
-   else :
-      dismod_at.system_command_prc(
-         command,
-         print_command = False,
-         return_stdout = False,
-         return_stderr = False,
-         file_stdout   = file_stdout,
-         file_stderr   = None,
-         write_command = True,
-      )
 # ----------------------------------------------------------------------------
 def add_index_to_name(table, name_col) :
    row   = table[-1]
@@ -159,6 +145,14 @@ def no_ode_fit(
       max_number_cpu = float( option_all_dict['max_number_cpu'] )
    assert result_dir is not None
    #
+   # in_process_command
+   in_process_command = option_all_dict.get('in_process_command', 'false')
+   if in_process_command not in [ 'true', 'false' ] :
+      msg  = 'option_all table: in_process_command = '
+      msg += f'{in_process_command} is not true or false'
+      assert False, msg
+   in_process_command = in_process_command == 'true'
+   #
    # name_rate2integrand
    name_rate2integrand = {
       'pini'  : 'prevalence',
@@ -249,12 +243,17 @@ def no_ode_fit(
    # move avgint -> c_root_avgint
    at_cascade.move_table(connection, 'avgint', 'c_root_avgint')
    #
+   # stage_resource
+   stage_resource = at_cascade.stage_resource_class(no_ode_database)
+   #
    # avgint_parent_grid
+   stage_resource.start('avgint_parent_grid')
    at_cascade.avgint_parent_grid(
       all_node_database = all_node_database ,
       fit_database      = no_ode_database   ,
    )
    at_cascade.add_log_entry(connection, 'avgint_parent_grid')
+   stage_resource.stop()
    #
    # hold_out_integrand
    hold_out_integrand = ''
@@ -269,18 +268,33 @@ def no_ode_fit(
    command = [
       'dismod_at', no_ode_database, 'set', 'option', name, value
    ]
-   system_command(command, file_stdout)
+   stage_resource.start('hold_out_integrand')
+   at_cascade.run_light_command(
+      [ command ], root_database, in_process_command, file_stdout,
+      stage_resource
+   )
+   stage_resource.stop()
    #
    # init
    command = [ 'dismod_at', no_ode_database, 'init' ]
-   system_command(command, file_stdout)
+   stage_resource.start('init')
+   at_cascade.system_command(command, file_stdout, stage_resource)
+   stage_resource.stop()
+   #
+   # light_command_list
+   light_command_list = list()
+   stage_resource.start('hold_out')
    #
    # bnd_mulcov
    if not max_abs_effect is None :
       command = [
          'dismod_at', no_ode_database, 'bnd_mulcov', str(max_abs_effect)
       ]
-      system_command(command, file_stdout)
+      light_command_list.append( command )
+   at_cascade.run_light_command(
+      light_command_list, root_database, in_process_command, file_stdout,
+      stage_resource
+   )
    #
    # enforce max_fit
    fit_integrand = set()
@@ -299,13 +313,14 @@ def no_ode_fit(
          nu           = '5'    # not used for gaussian
          command  = ['dismod_at', no_ode_database, 'data_density' ]
          command += [integrand_name, density_name, eta_factor, nu]
-         system_command(command, file_stdout)
+         at_cascade.system_command(command, file_stdout, stage_resource)
          if not max_fit is None :
             command  = [ 'dismod_at', no_ode_database ]
             command += [ 'hold_out', integrand_name, str(max_fit) ]
             if not balance_fit is None :
                command += balance_fit
-            system_command(command, file_stdout)
+            at_cascade.system_command(command, file_stdout, stage_resource)
+   stage_resource.stop()
    #
    # perturb start and scale
    if False :
@@ -315,23 +330,28 @@ def no_ode_fit(
             table = f'{perturb}_var'
             sigma = option_all_dict[key]
             command = ['dismodat.py', no_ode_database, 'perturb', table, sigma]
-            system_command(command, file_stdout)
+            at_cascade.system_command(command, file_stdout, stage_resource)
 
    #
    # fit both
    command = [ 'dismod_at', no_ode_database, 'fit', fit_type ]
-   system_command(command, file_stdout)
+   stage_resource.start('fit')
+   at_cascade.system_command(command, file_stdout, stage_resource)
+   stage_resource.stop()
    #
    # c_shift_predict_fit_var
    command = [ 'dismod_at', no_ode_database, 'predict', 'fit_var' ]
-   system_command(command, file_stdout)
+   stage_resource.start('predict_fit_var')
+   at_cascade.system_command(command, file_stdout, stage_resource)
    at_cascade.move_table(connection, 'predict', 'c_shift_predict_fit_var')
+   stage_resource.stop()
    #
    # c_shift_avgint
    at_cascade.move_table(connection, 'avgint', 'c_shift_avgint')
    #
    # root_fit_database
    shift_databases = { root_node_name : root_fit_database }
+   stage_resource.start('create_shift_db')
    at_cascade.create_shift_db(
       all_node_database = all_node_database ,
       fit_database      = no_ode_database   ,
@@ -339,6 +359,7 @@ def no_ode_fit(
       no_ode_fit        = True              ,
       job_table         = None              ,
    )
+   stage_resource.stop()
    #
    # move c_root_avgint -> avgint
    at_cascade.move_table(connection, 'c_root_avgint', 'avgint')
@@ -347,7 +368,8 @@ def no_ode_fit(
    connection.close()
    #
    # hold_out_integrand
-   # restore to original values in option table
+   # restore to original values in option table. The resources used are
+   # recorded in no_ode_database because this is part of the no_ode fit.
    hold_out_integrand = ''
    for row in root_table['option'] :
       if row['option_name'] == 'hold_out_integrand' :
@@ -356,7 +378,12 @@ def no_ode_fit(
    name     = 'hold_out_integrand'
    command  = [ 'dismod_at', root_fit_database ]
    command += [ 'set', 'option', name, hold_out_integrand ]
-   system_command(command, file_stdout)
+   stage_resource.start('hold_out_integrand')
+   at_cascade.run_light_command(
+      [ command ], root_database, in_process_command, file_stdout,
+      stage_resource
+   )
+   stage_resource.stop()
    #
    if max_number_cpu > 1 :
       now            = datetime.datetime.now()
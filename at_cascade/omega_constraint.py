@@ -88,6 +88,24 @@ def child_node_id_list(node_table, parent_node_id) :
          result.append(node_id)
    return result
 # ----------------------------------------------------------------------------
+# omega_list = get_omega_slice(all_connection, omega_all_id, n_value)
+# returns the n_value omega_all_value values that start at omega_all_id
+# in the omega_all table. The query uses the primary key index,
+# so it does not read the rest of the table.
+def get_omega_slice(all_connection, omega_all_id, n_value) :
+   command  = 'SELECT omega_all_value FROM omega_all '
+   command += 'WHERE omega_all_id >= ? AND omega_all_id < ? '
+   command += 'ORDER BY omega_all_id'
+   cursor   = all_connection.execute(
+      command, (omega_all_id, omega_all_id + n_value)
+   )
+   omega_list = [ row[0] for row in cursor.fetchall() ]
+   if len(omega_list) != n_value :
+      msg  = 'omega_all table: expected rows with omega_all_id '
+      msg += f'from {omega_all_id} to {omega_all_id + n_value - 1}'
+      assert False, msg
+   return omega_list
+# ----------------------------------------------------------------------------
 # BEGIN_DEF
 # at_cascade.omega_constraint
 def omega_constraint(
@@ -99,25 +117,22 @@ def omega_constraint(
    # END_DEF
    #
    # all_tables
-   connection        = dismod_at.create_connection(
-      all_node_database, new = False, readonly = True
-   )
-   all_tables = dict()
+   cascade_context = at_cascade.get_cascade_context(all_node_database)
+   all_tables      = dict()
    for name in [
       'option_all',
-      'omega_all',
-      'omega_index',
       'omega_age_grid',
       'omega_time_grid',
       'split_reference',
    ] :
-      all_tables[name] = dismod_at.get_table_dict(connection, name)
-   connection.close()
+      all_tables[name] = cascade_context.table(name)
+   #
+   # omega_index
+   omega_index = cascade_context.omega_index
    #
    # case where omega constrained to zero
    if len( all_tables['omega_time_grid']) == 0 :
-      assert len( all_tables['omega_all'] ) == 0
-      assert len( all_tables['omega_index'] ) == 0
+      assert len( omega_index ) == 0
       assert len( all_tables['omega_age_grid'] ) == 0
       return
    #
@@ -126,10 +141,7 @@ def omega_constraint(
    n_omega_time = len( all_tables['omega_time_grid'] )
    #
    # root_database
-   root_database      = None
-   for row in all_tables['option_all'] :
-      if row['option_name'] == 'root_database' :
-         root_database      = row['option_value']
+   root_database = cascade_context.root_database
    assert root_database != None
    #
    # fit_tables
@@ -199,19 +211,36 @@ def omega_constraint(
       fit_tables['node'], 'node', parent_node_name
    )
    #
+   # child_node_list
+   child_node_list = child_node_id_list(fit_tables['node'], parent_node_id)
+   #
    # node_id2omega_all_id
+   # only the parent, its ancestors, and its children are used
    node_id2omega_all_id = dict()
-   for row in all_tables['omega_index'] :
-      omega_all_id = row['omega_all_id']
-      if omega_all_id % (n_omega_age * n_omega_time) != 0 :
-         msg  = 'omega_index table: Expect omega_all_id to be a multipler '
-         msg += 'of n_omega_age * n_omega_time\n'
-         msg += f'omega_all_id = {omega_all_id} '
-         msg += f'n_omega_age = {n_omega_age} '
-         msg += f'n_omega_time = {n_omega_time} '
-         assert False, msg
-      if row['split_reference_id'] == split_reference_id :
-         node_id2omega_all_id[ row['node_id'] ] = omega_all_id
+   node_id_list         = list( child_node_list )
+   node_id              = parent_node_id
+   while node_id is not None :
+      node_id_list.append( node_id )
+      node_id = fit_tables['node'][node_id]['parent']
+   for node_id in node_id_list :
+      key = (node_id, split_reference_id)
+      if key in omega_index :
+         omega_all_id = omega_index[key]
+         if omega_all_id % (n_omega_age * n_omega_time) != 0 :
+            msg  = 'omega_index table: Expect omega_all_id to be a multipler '
+            msg += 'of n_omega_age * n_omega_time\n'
+            msg += f'omega_all_id = {omega_all_id} '
+            msg += f'n_omega_age = {n_omega_age} '
+            msg += f'n_omega_time = {n_omega_time} '
+            assert False, msg
+         node_id2omega_all_id[node_id] = omega_all_id
+   #
+   # all_connection
+   # The omega_all table is not read as a whole. Each slice is read using
+   # a range of its primary key.
+   all_connection = dismod_at.create_connection(
+      all_node_database, new = False, readonly = True
+   )
    #
    # omega_ancestor_node_id
    node_id = parent_node_id
@@ -226,10 +255,9 @@ def omega_constraint(
    #
    # parent_omega
    omega_all_id = node_id2omega_all_id[omega_ancestor_node_id]
-   parent_omega   = list()
-   for ij in range( n_omega_age * n_omega_time ) :
-      row  = all_tables['omega_all'][omega_all_id + ij ]
-      parent_omega.append( row['omega_all_value'] )
+   parent_omega = get_omega_slice(
+      all_connection, omega_all_id, n_omega_age * n_omega_time
+   )
    #
    # parent_smooth_id
    parent_smooth_id  = len(fit_tables['smooth'])
@@ -254,9 +282,6 @@ def omega_constraint(
          row['const_value'] = omega
          fit_tables['smooth_grid'].append( row )
    #
-   # child_node_list
-   child_node_list = child_node_id_list(fit_tables['node'], parent_node_id)
-   #
    # nslist_id
    nslist_id = len( fit_tables['nslist'] )
    #
@@ -268,10 +293,9 @@ def omega_constraint(
          child_omega = parent_omega
       else :
          omega_all_id = node_id2omega_all_id[child_node_id]
-         child_omega  = list()
-         for ij in range( n_omega_age * n_omega_time ) :
-               row  = all_tables['omega_all'][omega_all_id + ij ]
-               child_omega.append( row['omega_all_value'] )
+         child_omega  = get_omega_slice(
+            all_connection, omega_all_id, n_omega_age * n_omega_time
+         )
       #
       # random_effect
       random_effect = list()
@@ -322,6 +346,9 @@ def omega_constraint(
             row['const_value'] = random_effect[i * n_omega_time + j]
             fit_tables['smooth_grid'].append( row )
    #
+   # all_connection
+   all_connection.close()
+   #
    # fit_tables['nslist']
    row                = copy.copy( fit_null_row['nslist'] )
    row['nslist_name'] = 'child_omega'
@@ -0,0 +1,309 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: University of Washington <https://www.washington.edu>
+# SPDX-FileContributor: 2021-25 Bradley M. Bell
+# ----------------------------------------------------------------------------
+'''
+{xrst_begin stage_resource_class}
+{xrst_spell
+  kb
+  popen
+  rss
+  rusage
+}
+
+Record the Resources Used by Each Stage of a Fit
+################################################
+
+stage_resource_class
+********************
+{xrst_code py}
+stage_resource = stage_resource_class(database)
+{xrst_code}
+
+database
+========
+This ``str`` is the name of the database where the resources are recorded;
+e.g., a :ref:`glossary@fit_database` .
+
+start
+*****
+{xrst_code py}
+stage_resource.start(stage)
+{xrst_code}
+Starts the timing for the specified stage.
+
+stage
+=====
+This ``str`` is the name of the stage; e.g., ``init`` .
+
+communicate
+***********
+{xrst_code py}
+(stdout, stderr) = stage_resource.communicate(process, timeout)
+{xrst_code}
+Waits for a child process to finish
+and adds the resources that it used to the current stage
+(if a stage has been started and not stopped).
+The child is waited for using ``os.wait4`` ,
+so the resources are for this child only.
+
+process
+=======
+This is a ``subprocess.Popen`` object for a child process
+that has not been waited for.
+Its standard output and standard error are read while waiting
+(if they are pipes) so that the child can not block writing to them.
+Upon return, *process* . ``returncode`` is the return code for the child.
+
+timeout
+=======
+This is the maximum number of seconds to wait for the child.
+If it is None (the default), there is no limit.
+Otherwise, if the child does not finish in *timeout* seconds,
+it is killed, its resources are added to the current stage,
+and ``subprocess.TimeoutExpired`` is raised.
+
+stdout, stderr
+==============
+These are the output read from the corresponding pipe
+(None if the corresponding output is not a pipe).
+
+stop
+****
+{xrst_code py}
+stage_resource.stop()
+{xrst_code}
+Adds a row to the c_stage_resource table in *database*
+for the most recent stage started (and not yet stopped).
+If the c_stage_resource table does not exist, it is created.
+
+c_stage_resource Table
+**********************
+The user and system times, and the bytes read and written,
+are the change during the stage for the thread that called start and stop
+( ``resource.RUSAGE_THREAD`` ) plus the sum for the child processes
+that were waited for using *communicate* during the stage.
+(If ``resource.RUSAGE_THREAD`` is not available,
+``resource.RUSAGE_SELF`` is used.)
+Work done by other threads in this process is not included;
+e.g., the pipeline worker thread that prepares the next job.
+The bytes read and written only count actual file system input and output
+(not reads that are satisfied by the operating system cache).
+
+.. csv-table::
+   :header-rows: 1
+
+   Column,         Type,    Meaning
+   stage,          text,    the *stage* argument to start
+   unix_time,      integer, unix time when the stage was stopped
+   wall_seconds,   real,    wall clock seconds for the stage
+   user_seconds,   real,    user cpu seconds for the stage
+   system_seconds, real,    system cpu seconds for the stage
+   max_rss_kb,     integer, peak resident set size in kilobytes
+   read_bytes,     integer, bytes read during the stage
+   write_bytes,    integer, bytes written during the stage
+
+The peak resident set size is the maximum of the peak resident set size
+for the child processes that were waited for using *communicate*
+during the stage (zero if there are no such child processes).
+The peak for this process is not included because it is a maximum over
+the lifetime of the process (not just this stage).
+On Linux, the peak for a child process includes the memory that
+this process was using when the child was created.
+
+drop
+****
+{xrst_code py}
+stage_resource.drop()
+{xrst_code}
+Drops the c_stage_resource table from *database* (if it exists).
+
+{xrst_end stage_resource_class}
+'''
+import os
+import time
+import signal
+import resource
+import threading
+import subprocess
+import dismod_at
+import at_cascade
+#
+# usage = get_usage(rusage)
+# convert a resource.struct_rusage to a dict
+def get_usage(rusage) :
+   usage = {
+      'user_seconds'   : rusage.ru_utime ,
+      'system_seconds' : rusage.ru_stime ,
+      'read_bytes'     : rusage.ru_inblock ,
+      'write_bytes'    : rusage.ru_oublock ,
+      'max_rss_kb'     : rusage.ru_maxrss ,
+   }
+   # ru_inblock and ru_oublock are in units of 512 byte blocks
+   usage['read_bytes']  *= 512
+   usage['write_bytes'] *= 512
+   return usage
+#
+# usage = get_thread_usage()
+# resource usage for the thread that calls this routine
+def get_thread_usage() :
+   if hasattr(resource, 'RUSAGE_THREAD') :
+      return get_usage( resource.getrusage(resource.RUSAGE_THREAD) )
+   return get_usage( resource.getrusage(resource.RUSAGE_SELF) )
+#
+class stage_resource_class :
+   #
+   # __init__
+   def __init__(self, database) :
+      assert type(database) == str
+      self.database    = database
+      self.stage       = None
+      self.start_time  = None
+      self.start_usage = None
+      self.child_usage = None
+   #
+   # start
+   def start(self, stage) :
+      assert type(stage) == str
+      self.stage       = stage
+      self.start_time  = time.time()
+      self.start_usage = get_thread_usage()
+      self.child_usage = {
+         'user_seconds'   : 0.0 ,
+         'system_seconds' : 0.0 ,
+         'read_bytes'     : 0 ,
+         'write_bytes'    : 0 ,
+         'max_rss_kb'     : 0 ,
+      }
+   #
+   # communicate
+   def communicate(self, process, timeout = None) :
+      assert isinstance(process, subprocess.Popen)
+      assert process.returncode is None
+      #
+      # output, reader_list
+      # read the pipes in separate threads so the child can not block
+      output = { 'stdout' : None, 'stderr' : None }
+      def read_pipe(name, pipe) :
+         output[name] = pipe.read()
+         pipe.close()
+      reader_list = list()
+      for (name, pipe) in [
+         ('stdout', process.stdout), ('stderr', process.stderr)
+      ] :
+         if pipe is not None :
+            reader = threading.Thread(target = read_pipe, args = (name, pipe))
+            reader.start()
+            reader_list.append( reader )
+      #
+      # wait4_result
+      wait4_result = list()
+      def wait_child() :
+         wait4_result.append( os.wait4(process.pid, 0) )
+      waiter = threading.Thread(target = wait_child)
+      waiter.start()
+      waiter.join(timeout)
+      timed_out = waiter.is_alive()
+      if timed_out :
+         os.kill(process.pid, signal.SIGKILL)
+         waiter.join()
+      #
+      # reader_list
+      # If the child timed out, a process that it started may still have
+      # the pipes open, so do not wait long for them to close.
+      for reader in reader_list :
+         if timed_out :
+            reader.join(1.0)
+         else :
+            reader.join()
+      #
+      # process.returncode
+      (pid, status, rusage) = wait4_result[0]
+      process.returncode    = os.waitstatus_to_exitcode(status)
+      #
+      # child_usage
+      if self.stage is not None :
+         usage = get_usage(rusage)
+         for key in [
+            'user_seconds', 'system_seconds', 'read_bytes', 'write_bytes'
+         ] :
+            self.child_usage[key] += usage[key]
+         self.child_usage['max_rss_kb'] = max(
+            self.child_usage['max_rss_kb'], usage['max_rss_kb']
+         )
+      #
+      if timed_out :
+         raise subprocess.TimeoutExpired(process.args, timeout)
+      return (output['stdout'], output['stderr'])
+   #
+   # stop
+   def stop(self) :
+      assert self.stage is not None
+      #
+      # row
+      stop_usage = get_thread_usage()
+      stop_time  = time.time()
+      row = [
+         self.stage,
+         int( stop_time ),
+         stop_time - self.start_time ,
+      ]
+      for key in [ 'user_seconds', 'system_seconds' ] :
+         row.append(
+            stop_usage[key] - self.start_usage[key] + self.child_usage[key]
+         )
+      row.append( self.child_usage['max_rss_kb'] )
+      for key in [ 'read_bytes', 'write_bytes' ] :
+         row.append(
+            stop_usage[key] - self.start_usage[key] + self.child_usage[key]
+         )
+      #
+      # c_stage_resource
+      connection = dismod_at.create_connection(
+         self.database, new = False, readonly = False
+      )
+      if not at_cascade.table_exists(connection, 'c_stage_resource') :
+         col_name = [
+            'stage',
+            'unix_time',
+            'wall_seconds',
+            'user_seconds',
+            'system_seconds',
+            'max_rss_kb',
+            'read_bytes',
+            'write_bytes',
+         ]
+         col_type = [
+            'text',
+            'integer',
+            'real',
+            'real',
+            'real',
+            'integer',
+            'integer',
+            'integer',
+         ]
+         dismod_at.create_table(
+            connection, 'c_stage_resource', col_name, col_type, [ row ]
+         )
+      else :
+         command  = 'INSERT INTO c_stage_resource '
+         command += '(c_stage_resource_id, stage, unix_time, wall_seconds, '
+         command += 'user_seconds, system_seconds, max_rss_kb, '
+         command += 'read_bytes, write_bytes) '
+         command += 'SELECT COUNT(*), ?, ?, ?, ?, ?, ?, ?, ? '
+         command += 'FROM c_stage_resource'
+         connection.execute(command, row)
+         connection.commit()
+      connection.close()
+      #
+      self.stage = None
+   #
+   # drop
+   def drop(self) :
+      connection = dismod_at.create_connection(
+         self.database, new = False, readonly = False
+      )
+      command = 'DROP TABLE IF EXISTS c_stage_resource'
+      dismod_at.sql_command(connection, command)
+      connection.close()
@@ -0,0 +1,153 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: University of Washington <https://www.washington.edu>
+# SPDX-FileContributor: 2021-25 Bradley M. Bell
+# ----------------------------------------------------------------------------
+'''
+{xrst_begin subtree_data_count}
+
+Number of Data Values That a Job Could Include
+##############################################
+
+Prototype
+*********
+{xrst_literal ,
+   # BEGIN_DEF, # END_DEF
+   # BEGIN_RETURN, # END_RETURN
+}
+
+all_node_database
+*****************
+is a python string specifying the location of the
+:ref:`all_node_db-name`
+relative to the current working directory.
+
+node_table
+**********
+is a ``list`` of ``dict`` containing the node table for this cascade.
+
+data_count
+**********
+The return value *data_count* is a ``dict`` where
+*data_count* [ ( *node_id* , *split_reference_id* ) ]
+is the number of rows in the :ref:`glossary@root_database` data table
+that could be included in the fit for the corresponding job.
+If the :ref:`split_reference_table-name` is empty,
+*split_reference_id* is None.
+A data table row is counted if:
+
+#. Its node_id is *node_id* or a descendant of *node_id* .
+#. Its hold_out is zero or null.
+#. Its integrand is not in the root_database
+   hold_out_integrand option.
+#. If there is a
+   :ref:`option_all_table@split_covariate_name` ,
+   the splitting covariate value is null, or it is within the
+   root_database covariate table max_difference
+   of the split_reference_value for *split_reference_id* .
+
+The max_difference for the other covariates depends on their reference
+values for each fit, so they are not used.
+It follows that, if *data_count* is zero for a job,
+the job has no data to fit; i.e., it would fail with the
+:ref:`fit_one_job@Exception` ``no data: abort`` .
+
+{xrst_end subtree_data_count}
+'''
+import math
+import dismod_at
+import at_cascade
+# ----------------------------------------------------------------------------
+# BEGIN_DEF
+# at_cascade.subtree_data_count
+def subtree_data_count(all_node_database, node_table) :
+   assert type(all_node_database) == str
+   assert type(node_table) == list
+   # END_DEF
+   #
+   # cascade_context, option_all_dict
+   cascade_context = at_cascade.get_cascade_context(all_node_database)
+   option_all_dict = cascade_context.option_all_dict
+   #
+   # split_reference_table
+   split_reference_table = cascade_context.table('split_reference')
+   #
+   # root_table
+   root_database = option_all_dict['root_database']
+   connection    = dismod_at.create_connection(
+      root_database, new = False, readonly = True
+   )
+   root_table = dict()
+   for tbl_name in [ 'covariate', 'integrand', 'option' ] :
+      root_table[tbl_name] = dismod_at.get_table_dict(connection, tbl_name)
+   #
+   # hold_out_id
+   hold_out_id = list()
+   for row in root_table['option'] :
+      if row['option_name'] == 'hold_out_integrand' :
+         if row['option_value'] is not None :
+            for integrand_name in row['option_value'].split() :
+               integrand_id = at_cascade.table_name2id(
+                  root_table['integrand'], 'integrand', integrand_name
+               )
+               hold_out_id.append( str(integrand_id) )
+   #
+   # split_column, max_difference
+   split_column   = 'NULL'
+   max_difference = math.inf
+   if 'split_covariate_name' in option_all_dict :
+      covariate_id = at_cascade.table_name2id(
+         root_table['covariate'],
+         'covariate',
+         option_all_dict['split_covariate_name'],
+      )
+      split_column = f'x_{covariate_id}'
+      row          = root_table['covariate'][covariate_id]
+      if row['max_difference'] is not None :
+         max_difference = row['max_difference']
+   #
+   # result
+   # For each node_id and splitting covariate value, the number of
+   # data table rows that are not held out.
+   command  = f'SELECT node_id, {split_column}, COUNT(*) FROM data '
+   command += 'WHERE IFNULL(hold_out, 0) = 0 '
+   if len(hold_out_id) > 0 :
+      command += 'AND integrand_id NOT IN (' + ','.join(hold_out_id) + ') '
+   command += f'GROUP BY node_id, {split_column}'
+   result   = dismod_at.sql_command(connection, command)
+   connection.close()
+   #
+   # split_reference_list
+   if len(split_reference_table) == 0 :
+      split_reference_list = [ None ]
+   else :
+      split_reference_list = list( range( len(split_reference_table) ) )
+   #
+   # data_count
+   data_count = dict()
+   for node_id in range( len(node_table) ) :
+      for split_reference_id in split_reference_list :
+         data_count[ (node_id, split_reference_id) ] = 0
+   for (node_id, split_value, count) in result :
+      if node_id is None :
+         continue
+      for split_reference_id in split_reference_list :
+         #
+         # include
+         include = split_reference_id is None or split_value is None
+         if not include :
+            row = split_reference_table[split_reference_id]
+            reference = row['split_reference_value']
+            include   = abs(split_value - reference) <= max_difference
+         #
+         # data_count
+         if include :
+            ancestor_id = node_id
+            while ancestor_id is not None :
+               data_count[ (ancestor_id, split_reference_id) ] += count
+               ancestor_id = node_table[ancestor_id]['parent']
+   #
+   # BEGIN_RETURN
+   # ...
+   assert type(data_count) == dict
+   return data_count
+   # END_RETURN
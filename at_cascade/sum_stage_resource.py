@@ -0,0 +1,120 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: University of Washington <https://www.washington.edu>
+# SPDX-FileContributor: 2021-25 Bradley M. Bell
+# ----------------------------------------------------------------------------
+'''
+{xrst_begin sum_stage_resource}
+{xrst_spell
+  kb
+  rss
+}
+
+Sum the Stage Resources For a Cascade
+#####################################
+
+Prototype
+*********
+{xrst_literal ,
+   # BEGIN_DEF, # END_DEF
+   # BEGIN_RETURN, # END_RETURN
+}
+
+result_dir
+**********
+is the :ref:`option_all_table@result_dir` for the cascade.
+Every file named ``dismod.db`` below this directory that has a
+:ref:`stage_resource_class@c_stage_resource Table`
+is included in the sum.
+
+stage_sum
+*********
+The return value *stage_sum* is a ``list`` of ``dict`` with one element
+for each stage that appears in one of the c_stage_resource tables.
+It is sorted so that the stages with the most total wall clock time
+come first.
+Each element has the following keys:
+
+.. csv-table::
+   :header-rows: 1
+
+   Key,              Meaning
+   stage,            name of the stage
+   n_run,            number of times the stage was run
+   wall_seconds,     total wall clock seconds for the stage
+   max_wall_seconds, maximum wall clock seconds for one run of the stage
+   user_seconds,     total user cpu seconds for the stage
+   system_seconds,   total system cpu seconds for the stage
+   max_rss_kb,       maximum of the max_rss_kb values for the stage
+   read_bytes,       total bytes read during the stage
+   write_bytes,      total bytes written during the stage
+
+{xrst_end sum_stage_resource}
+'''
+import os
+import dismod_at
+import at_cascade
+# ----------------------------------------------------------------------------
+# BEGIN_DEF
+# at_cascade.sum_stage_resource
+def sum_stage_resource(result_dir) :
+   assert type(result_dir) == str
+   # END_DEF
+   #
+   # sum_dict
+   sum_dict = dict()
+   for (dirpath, dirnames, filenames) in os.walk(result_dir) :
+      if 'dismod.db' in filenames :
+         #
+         # resource_table
+         database   = f'{dirpath}/dismod.db'
+         connection = dismod_at.create_connection(
+            database, new = False, readonly = True
+         )
+         resource_table = list()
+         if at_cascade.table_exists(connection, 'c_stage_resource') :
+            resource_table = dismod_at.get_table_dict(
+               connection, 'c_stage_resource'
+            )
+         connection.close()
+         #
+         for row in resource_table :
+            stage = row['stage']
+            if stage not in sum_dict :
+               sum_dict[stage] = {
+                  'stage'            : stage ,
+                  'n_run'            : 0 ,
+                  'wall_seconds'     : 0.0 ,
+                  'max_wall_seconds' : 0.0 ,
+                  'user_seconds'     : 0.0 ,
+                  'system_seconds'   : 0.0 ,
+                  'max_rss_kb'       : 0 ,
+                  'read_bytes'       : 0 ,
+                  'write_bytes'      : 0 ,
+               }
+            stage_sum = sum_dict[stage]
+            stage_sum['n_run'] += 1
+            for key in [
+               'wall_seconds',
+               'user_seconds',
+               'system_seconds',
+               'read_bytes',
+               'write_bytes',
+            ] :
+               stage_sum[key] += row[key]
+            stage_sum['max_wall_seconds'] = max(
+               stage_sum['max_wall_seconds'], row['wall_seconds']
+            )
+            stage_sum['max_rss_kb'] = max(
+               stage_sum['max_rss_kb'], row['max_rss_kb']
+            )
+   #
+   # stage_sum
+   stage_sum = sorted(
+      sum_dict.values(), key = lambda row : row['wall_seconds'], reverse = True
+   )
+   #
+   # BEGIN_RETURN
+   # ...
+   assert type(stage_sum) == list
+   return stage_sum
+   # END_RETURN
@@ -0,0 +1,122 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: University of Washington <https://www.washington.edu>
+# SPDX-FileContributor: 2021-25 Bradley M. Bell
+# ----------------------------------------------------------------------------
+r'''
+{xrst_begin system_command}
+{xrst_spell
+  preexec
+  stderr
+  stdout
+}
+
+Run a dismod_at Command as a Separate Process
+#############################################
+
+Prototype
+*********
+{xrst_literal ,
+   # BEGIN_DEF, # END_DEF
+   # BEGIN_PREEXEC, # END_PREEXEC
+}
+
+command
+*******
+is a ``list`` of ``str`` containing the program and its arguments; e.g.,
+
+| ``[ 'dismod_at'`` , *database* , ``'init' ]``
+
+file_stdout
+***********
+If this is None, the command and its standard error are printed.
+Otherwise, the command, its standard output, and its standard error,
+are written to this file.
+
+stage_resource
+**************
+is a :ref:`stage_resource_class-name` object.
+The resources used by the command are added to its current stage.
+
+timeout
+*******
+If this is not None and the command takes more than *timeout* seconds,
+the command is killed and ``subprocess.TimeoutExpired`` is raised.
+
+memory_limit
+************
+If this is not None, it is the address space limit, in bytes,
+for the command.
+
+Errors
+******
+If the command fails, an assert is raised with the command
+and its standard error in the message.
+
+get_preexec_fn
+**************
+If *memory_limit* is None, *preexec_fn* is None.
+Otherwise it is a function that is run in a child process,
+before the command is executed,
+and sets the soft limit on the address space of the child
+to *memory_limit* bytes.
+
+{xrst_end system_command}
+'''
+import sys
+import resource
+import subprocess
+# ----------------------------------------------------------------------------
+# BEGIN_PREEXEC
+# preexec_fn = at_cascade.get_preexec_fn(memory_limit)
+def get_preexec_fn(memory_limit) :
+   assert memory_limit is None or type(memory_limit) == int
+   # END_PREEXEC
+   if memory_limit is None :
+      return None
+   def preexec_fn() :
+      (soft_limit, hard_limit) = resource.getrlimit(resource.RLIMIT_AS)
+      limit = memory_limit
+      if hard_limit != resource.RLIM_INFINITY :
+         limit = min(limit, hard_limit)
+      resource.setrlimit(resource.RLIMIT_AS, (limit, hard_limit) )
+   return preexec_fn
+# ----------------------------------------------------------------------------
+# BEGIN_DEF
+# at_cascade.system_command
+def system_command(
+   command, file_stdout, stage_resource, timeout = None, memory_limit = None
+) :
+   assert type(command) == list
+   assert type( command[0] ) == str
+   assert timeout is None or type(timeout) in [ int, float ]
+   assert memory_limit is None or type(memory_limit) == int
+   # END_DEF
+   #
+   # command_str
+   command_str = ' '.join(command)
+   if file_stdout is None :
+      print( command_str )
+   else :
+      file_stdout.write( command_str + '\n' )
+      file_stdout.flush()
+   #
+   # stderr
+   # stage_resource.communicate kills the child process when the timeout
+   # expires
+   process = subprocess.Popen(
+      command,
+      stdout     = file_stdout,
+      stderr     = subprocess.PIPE,
+      encoding   = 'utf-8',
+      preexec_fn = get_preexec_fn(memory_limit),
+   )
+   (stdout, stderr) = stage_resource.communicate(process, timeout)
+   if process.returncode != 0 :
+      msg  = f'system_command failed: {command_str}\n'
+      msg += stderr
+      assert False, msg
+   if stderr != '' :
+      if file_stdout is None :
+         sys.stderr.write( stderr )
+      else :
+         file_stdout.write( stderr )
@@ -1,6 +1,6 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 # SPDX-FileCopyrightText: University of Washington <https://www.washington.edu>
-# SPDX-FileContributor: 2021-24 Bradley M. Bell
+# SPDX-FileContributor: 2021-25 Bradley M. Bell
 # ----------------------------------------------------------------------------
 '''
                          (n0,s1)
@@ -34,6 +34,7 @@ check_job_table = [
 ]
 for row in check_job_table :
    row['prior_only'] = False
+   row['no_data']    = False
 #
 for job_id in range(5) :
    check_job_table[job_id]['start_child_job_id'] = 2 * job_id + 1
@@ -414,6 +415,51 @@ def main() :
       fit_goal_set              = fit_goal_set,
    )
    assert job_table == check_job_table
+   #
+   # data
+   # remove the data for n5 and the female data for n4
+   connection = dismod_at.create_connection(
+      root_database, new = False, readonly = False
+   )
+   female     = split_reference_list[0]
+   command    = 'DELETE FROM data WHERE node_id = 5 OR '
+   command   += f'( node_id = 4 AND x_0 = {female} )'
+   dismod_at.sql_command(connection, command)
+   #
+   # data
+   # the only n6 data row has a null hold_out, so (n6,s1) has data
+   command  = 'DELETE FROM data WHERE node_id = 6 AND data_id != '
+   command += '(SELECT MIN(data_id) FROM data WHERE node_id = 6)'
+   dismod_at.sql_command(connection, command)
+   command  = 'UPDATE data SET hold_out = NULL WHERE node_id = 6'
+   dismod_at.sql_command(connection, command)
+   connection.close()
+   #
+   # skip_no_data
+   connection = dismod_at.create_connection(
+      all_node_database, new = False, readonly = False
+   )
+   command  = 'INSERT INTO option_all (option_name, option_value) '
+   command += "VALUES ('skip_no_data', 'true')"
+   dismod_at.sql_command(connection, command)
+   connection.close()
+   #
+   # check_job_table
+   # The jobs (n5,s1) and (n4,s0) have no data. They are still in the
+   # job table and the child job ranges do not change.
+   # The job (n6,s1) has data because a null hold_out is the same as zero.
+   check_job_table[5]['no_data'] = True
+   check_job_table[8]['no_data'] = True
+   #
+   # job_table
+   job_table = at_cascade.create_job_table(
+      all_node_database         = all_node_database,
+      node_table                = node_table,
+      start_node_id             = root_node_id,
+      start_split_reference_id  = root_split_reference_id,
+      fit_goal_set              = fit_goal_set,
+   )
+   assert job_table == check_job_table
 #
 if __name__ == '__main__' :
    main()
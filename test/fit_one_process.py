@@ -0,0 +1,199 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: University of Washington <https://www.washington.edu>
+# SPDX-FileContributor: 2021-25 Bradley M. Bell
+# ----------------------------------------------------------------------------
+'''
+Test that the master process completes a job when its worker dies after
+setting the job status and before putting the job in done_queue.
+The fits are replaced by a function that does not run dismod_at.
+
+                           j0
+         j1          j2          j3          j4
+      j5 j6 j7    j8 j9 j10  j11 j12 j13  j14 j15 j16
+'''
+# -----------------------------------------------------------------------------
+# imports
+# ----------------------------------------------------------------------------
+import sys
+import os
+import time
+import json
+import numpy
+import multiprocessing
+import multiprocessing.shared_memory
+import dismod_at
+#
+# import at_cascade with a preference current directory version
+current_directory = os.getcwd()
+if os.path.isfile( current_directory + '/at_cascade/__init__.py' ) :
+   sys.path.insert(0, current_directory)
+import at_cascade
+#
+# fit_one_process_module
+fit_one_process_module = sys.modules['at_cascade.fit_one_process']
+# -----------------------------------------------------------------------------
+# global varables
+# -----------------------------------------------------------------------------
+#
+# kill_job_id
+# the worker that runs this job dies after it sets the job status
+kill_job_id = 2
+#
+# job_status_name
+job_status_name = [
+   'skip', 'wait', 'ready', 'run', 'done', 'error', 'abort'
+]
+# -----------------------------------------------------------------------------
+# ready_list = try_one_job(job_table, this_job_id, ...)
+try_one_job = fit_one_process_module.try_one_job
+def kill_after_status(*args) :
+   ready_list = try_one_job(*args)
+   if args[1] == kill_job_id :
+      os._exit(3)
+   return ready_list
+#
+# job_done, fit_type = run_fit_type_list(job_table, this_job_id, ...)
+def run_fit_type_list(*args) :
+   time.sleep(0.1)
+   return True, 'both'
+# -----------------------------------------------------------------------------
+# job_table = get_job_table()
+def get_job_table() :
+   job_table = [ { 'parent_job_id' : None } ]
+   for parent_job_id in [ 0, 1, 2, 3, 4 ] :
+      job_table[parent_job_id]['start_child_job_id'] = len(job_table)
+      n_child = 4 if parent_job_id == 0 else 3
+      for child in range(n_child) :
+         job_table.append( { 'parent_job_id' : parent_job_id } )
+      job_table[parent_job_id]['end_child_job_id'] = len(job_table)
+   for (job_id, row) in enumerate(job_table) :
+      row['job_name']   = f'j{job_id}'
+      row['prior_only'] = False
+      row['no_data']    = False
+      if 'start_child_job_id' not in row :
+         row['start_child_job_id'] = len(job_table)
+         row['end_child_job_id']   = len(job_table)
+   return job_table
+# -----------------------------------------------------------------------------
+def main() :
+   #
+   # work_dir
+   work_dir = 'build/test'
+   if not os.path.exists(work_dir) :
+      os.makedirs(work_dir)
+   #
+   # fit_one_process_module
+   fit_one_process_module.try_one_job       = kill_after_status
+   fit_one_process_module.run_fit_type_list = run_fit_type_list
+   #
+   # job_table
+   job_table = get_job_table()
+   n_job     = len(job_table)
+   #
+   # job_journal
+   job_journal = f'{work_dir}/job_journal.db'
+   connection  = dismod_at.create_connection(
+      job_journal, new = True, readonly = False
+   )
+   cmd  = 'create table job_journal('
+   cmd += 'job_journal_id integer primary key,'
+   cmd += 'job_id         integer,'
+   cmd += 'job_name       text,'
+   cmd += 'job_status     text,'
+   cmd += 'unix_time      integer)'
+   dismod_at.sql_command(connection, cmd)
+   connection.close()
+   #
+   # shared_job_status_name, shared_number_cpu_inuse_name
+   shared_job_status_name       = 'test_fit_one_process_job_status'
+   shared_number_cpu_inuse_name = 'test_fit_one_process_number_cpu_inuse'
+   #
+   # shm_job_status, shared_job_status
+   tmp    = numpy.empty(n_job, dtype = int )
+   mapped = at_cascade.map_shared(shared_job_status_name)
+   shm_job_status = multiprocessing.shared_memory.SharedMemory(
+      create = True, size = tmp.nbytes, name = mapped
+   )
+   shared_job_status = numpy.ndarray(
+      tmp.shape, dtype = tmp.dtype, buffer = shm_job_status.buf
+   )
+   shared_job_status[:] = job_status_name.index('wait')
+   shared_job_status[0] = job_status_name.index('ready')
+   #
+   # shm_number_cpu_inuse, shared_number_cpu_inuse
+   tmp    = numpy.empty(1, dtype = int )
+   mapped = at_cascade.map_shared(shared_number_cpu_inuse_name)
+   shm_number_cpu_inuse = multiprocessing.shared_memory.SharedMemory(
+      create = True, size = tmp.nbytes, name = mapped
+   )
+   shared_number_cpu_inuse = numpy.ndarray(
+      tmp.shape, dtype = tmp.dtype, buffer = shm_number_cpu_inuse.buf
+   )
+   shared_number_cpu_inuse[0] = 0
+   #
+   # status_file
+   status_file = f'{work_dir}/fit_status.json'
+   #
+   # fit_one_process
+   try :
+      at_cascade.fit_one_process(
+         job_table                    = job_table,
+         all_node_database            = f'{work_dir}/all_node.db',
+         node_table                   = list(),
+         fit_integrand                = set(),
+         max_number_cpu               = 3,
+         master_process               = True,
+         fit_type_list                = [ 'both' ],
+         job_status_name              = job_status_name,
+         shared_job_status_name       = shared_job_status_name,
+         shared_number_cpu_inuse_name = shared_number_cpu_inuse_name,
+         shared_lock                  = multiprocessing.Lock(),
+         job_queue                    = None,
+         done_queue                   = None,
+         job_priority                 = numpy.zeros(n_job),
+         job_journal                  = job_journal,
+         memory_budget                = None,
+         job_memory                   = numpy.zeros(n_job),
+         speculative_fit              = False,
+         status_file                  = status_file,
+         status_port                  = None,
+         pipeline_worker              = False,
+      )
+      #
+      # shared_job_status
+      # The job whose worker died and all its descendants are done.
+      for job_id in range(n_job) :
+         status = job_status_name[ shared_job_status[job_id] ]
+         assert status == 'done', (job_id, status)
+      #
+      # shared_number_cpu_inuse
+      assert shared_number_cpu_inuse[0] == 0
+   finally :
+      for shm in [ shm_job_status, shm_number_cpu_inuse ] :
+         shm.close()
+         shm.unlink()
+   #
+   # status_count
+   with open(status_file, 'r') as file_obj :
+      status_snapshot = json.load(file_obj)
+   status_count = status_snapshot['status_count']
+   assert status_count['done'] == n_job
+   for name in job_status_name :
+      if name != 'done' :
+         assert status_count[name] == 0
+   #
+   # job_journal
+   connection    = dismod_at.create_connection(
+      job_journal, new = False, readonly = True
+   )
+   journal_table = dismod_at.get_table_dict(connection, 'job_journal')
+   connection.close()
+   done_list = list()
+   for row in journal_table :
+      if row['job_status'] == 'done' :
+         done_list.append( row['job_id'] )
+   assert sorted( done_list ) == list( range(n_job) )
+#
+if __name__ == '__main__' :
+   main()
+   print('fit_one_process: OK')
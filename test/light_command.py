@@ -0,0 +1,309 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: University of Washington <https://www.washington.edu>
+# SPDX-FileContributor: 2021-25 Bradley M. Bell
+# ---------------------------------------------------------------------------
+import os
+import sys
+import copy
+import shutil
+#
+# import at_cascade with a preference current directory version
+current_directory = os.getcwd()
+if os.path.isfile( current_directory + '/at_cascade/__init__.py' ) :
+   sys.path.insert(0, current_directory)
+import at_cascade
+import dismod_at
+#
+# compare_dismod_at()
+# Check that the data_subset and bnd_mulcov tables are the same when
+# light_command is used as when dismod_at is used.
+def compare_dismod_at() :
+   #
+   # prior_table
+   prior_table = [
+      { 'name' : 'iota_prior',
+         'density' : 'uniform', 'lower' : 1e-4, 'upper' : 1.0, 'mean' : 1e-2
+      },
+      { 'name' : 'mulcov_prior',
+         'density' : 'uniform', 'lower' : -1.0, 'upper' : 1.0, 'mean' : 0.0
+      },
+   ]
+   #
+   # smooth_table
+   smooth_table = [
+      { 'name' : 'iota_smooth', 'age_id' : [0], 'time_id' : [0],
+         'fun' : lambda a, t : ('iota_prior', None, None)
+      },
+      { 'name' : 'mulcov_smooth', 'age_id' : [0], 'time_id' : [0],
+         'fun' : lambda a, t : ('mulcov_prior', None, None)
+      },
+   ]
+   #
+   # node_table
+   node_table = [
+      { 'name' : 'n0', 'parent' : ''   },
+      { 'name' : 'n1', 'parent' : 'n0' },
+      { 'name' : 'n2', 'parent' : 'n0' },
+   ]
+   #
+   # rate_table
+   rate_table = [ {
+      'name' : 'iota', 'parent_smooth' : 'iota_smooth', 'child_smooth' : None
+   } ]
+   #
+   # covariate_table
+   covariate_table = [
+      { 'name' : 'sex',    'reference' : 0.0, 'max_difference' : None },
+      { 'name' : 'income', 'reference' : 1.0, 'max_difference' : None },
+   ]
+   #
+   # mulcov_table
+   mulcov_table = [
+      { 'covariate' : 'income', 'type' : 'rate_value', 'effected' : 'iota',
+         'group' : 'world', 'smooth' : 'mulcov_smooth'
+      },
+      { 'covariate' : 'sex', 'type' : 'meas_value',
+         'effected' : 'Sincidence', 'group' : 'world',
+         'smooth' : 'mulcov_smooth'
+      },
+      { 'covariate' : 'income', 'type' : 'meas_noise',
+         'effected' : 'Sincidence', 'group' : 'world',
+         'smooth' : 'mulcov_smooth'
+      },
+   ]
+   #
+   # subgroup_table
+   subgroup_table = [ { 'subgroup' : 'world', 'group' : 'world' } ]
+   #
+   # integrand_table
+   integrand_table = [ { 'name' : 'Sincidence' }, { 'name' : 'remission' } ]
+   #
+   # data_table
+   # 24 Sincidence rows, 8 for each node, and 2 remission rows,
+   # one of which is held out.
+   data_table = list()
+   row = {
+      'subgroup'   : 'world',
+      'weight'     : '',
+      'age_lower'  : 50.0,
+      'age_upper'  : 50.0,
+      'time_lower' : 2000.0,
+      'time_upper' : 2000.0,
+      'density'    : 'gaussian',
+      'meas_value' : 1e-2,
+      'meas_std'   : 1e-3,
+      'hold_out'   : False,
+      'integrand'  : 'Sincidence',
+   }
+   for node in [ 'n0', 'n1', 'n2' ] :
+      for i in range(8) :
+         row['node']   = node
+         row['sex']    = i % 2 - 0.5
+         row['income'] = 0.5 + i / 4.0
+         data_table.append( copy.copy(row) )
+   row['integrand'] = 'remission'
+   row['node']      = 'n1'
+   row['income']    = 0.1
+   data_table.append( copy.copy(row) )
+   row['hold_out']  = True
+   row['income']    = 4.0
+   data_table.append( copy.copy(row) )
+   #
+   # option_table
+   option_table = [
+      { 'name' : 'parent_node_name', 'value' : 'n0' },
+      { 'name' : 'rate_case',        'value' : 'iota_pos_rho_zero' },
+      { 'name' : 'random_seed',      'value' : '123' },
+   ]
+   #
+   # dismod_at.db
+   dismod_at.create_database(
+      'dismod_at.db',
+      [ 0.0, 100.0 ],
+      [ 1980.0, 2020.0 ],
+      integrand_table,
+      node_table,
+      subgroup_table,
+      list(),
+      covariate_table,
+      list(),
+      data_table,
+      prior_table,
+      smooth_table,
+      dict(),
+      rate_table,
+      mulcov_table,
+      option_table,
+   )
+   dismod_at.system_command_prc(
+      [ 'dismod_at', 'dismod_at.db', 'init' ], print_command = False
+   )
+   shutil.copyfile('dismod_at.db', 'light.db')
+   #
+   # hold_out
+   # This command is always run by dismod_at.
+   for database in [ 'dismod_at.db', 'light.db' ] :
+      command = [ 'dismod_at', database, 'hold_out', 'Sincidence', '10' ]
+      dismod_at.system_command_prc(command, print_command = False)
+   #
+   # bnd_mulcov
+   command = [ 'dismod_at', 'dismod_at.db', 'bnd_mulcov', '2.0' ]
+   dismod_at.system_command_prc(command, print_command = False)
+   command = [ 'dismod_at', 'light.db', 'bnd_mulcov', '2.0' ]
+   at_cascade.light_command( [ command ], 'light.db')
+   #
+   # table
+   table = dict()
+   for database in [ 'dismod_at.db', 'light.db' ] :
+      connection = dismod_at.create_connection(
+         database, new = False, readonly = True
+      )
+      table[database] = dict()
+      for table_name in [ 'data_subset', 'bnd_mulcov' ] :
+         table[database][table_name] = dismod_at.get_table_dict(
+            connection, table_name
+         )
+      connection.close()
+   #
+   # data_subset
+   data_subset_table = table['dismod_at.db']['data_subset']
+   assert data_subset_table == table['light.db']['data_subset']
+   n_include = 0
+   for row in data_subset_table :
+      if row['hold_out'] == 0 :
+         n_include += 1
+   assert n_include < len(data_subset_table)
+   #
+   # bnd_mulcov
+   bnd_mulcov_table = table['dismod_at.db']['bnd_mulcov']
+   assert len(bnd_mulcov_table) == len(mulcov_table)
+   assert len(bnd_mulcov_table) == len( table['light.db']['bnd_mulcov'] )
+   for (check, row) in zip(bnd_mulcov_table, table['light.db']['bnd_mulcov']):
+      for key in [ 'max_cov_diff', 'max_mulcov' ] :
+         if check[key] is None :
+            assert row[key] is None
+         else :
+            assert abs( row[key] - check[key] ) <= 1e-10 * abs( check[key] )
+#
+def main() :
+   #
+   # work_dir
+   work_dir = 'build/test'
+   at_cascade.empty_directory(work_dir)
+   os.chdir(work_dir)
+   #
+   # file_name
+   # This database is used as both the fit and root database.
+   file_name  = 'example.db'
+   connection = dismod_at.create_connection(
+      file_name, new = True, readonly = False
+   )
+   #
+   # node table: n0 -> n1, n0 -> n2
+   col_name = [ 'node_name', 'parent' ]
+   col_type = [ 'text',      'integer' ]
+   row_list = [ [ 'n0', None ], [ 'n1', 0 ], [ 'n2', 0 ] ]
+   dismod_at.create_table(connection, 'node', col_name, col_type, row_list)
+   #
+   # integrand table
+   col_name = [ 'integrand_name', 'minimum_meas_cv' ]
+   col_type = [ 'text',           'real' ]
+   row_list = [ [ 'Sincidence', 0.0 ], [ 'remission', 0.0 ] ]
+   dismod_at.create_table(
+      connection, 'integrand', col_name, col_type, row_list
+   )
+   #
+   # option table
+   col_name = [ 'option_name', 'option_value' ]
+   col_type = [ 'text',        'text' ]
+   row_list = [ [ 'parent_node_name', 'n0' ], [ 'random_seed', '123' ] ]
+   dismod_at.create_table(connection, 'option', col_name, col_type, row_list)
+   #
+   # covariate table
+   col_name = [ 'covariate_name', 'reference', 'max_difference' ]
+   col_type = [ 'text',           'real',      'real' ]
+   row_list = [ [ 'sex', 0.0, None ] ]
+   dismod_at.create_table(
+      connection, 'covariate', col_name, col_type, row_list
+   )
+   #
+   # mulcov table
+   col_name = [ 'mulcov_type', 'covariate_id' ]
+   col_type = [ 'text',        'integer' ]
+   row_list = [ [ 'rate_value', 0 ], [ 'meas_noise', 0 ] ]
+   dismod_at.create_table(connection, 'mulcov', col_name, col_type, row_list)
+   #
+   # data table
+   # 12 Sincidence rows: 4 for each node, alternating sex = -0.5, +0.5.
+   # 2 remission rows for node n1.
+   col_name = [ 'integrand_id', 'node_id', 'hold_out', 'x_0' ]
+   col_type = [ 'integer',      'integer', 'integer',  'real' ]
+   row_list = list()
+   for node_id in range(3) :
+      for i in range(4) :
+         row_list.append( [ 0, node_id, 0, i % 2 - 0.5 ] )
+   row_list.append( [ 1, 1, 0, 0.5 ] )
+   row_list.append( [ 1, 1, 1, 0.5 ] )
+   dismod_at.create_table(connection, 'data', col_name, col_type, row_list)
+   n_data = len(row_list)
+   #
+   # data_subset table
+   col_name = [ 'data_id', 'hold_out' ]
+   col_type = [ 'integer', 'integer' ]
+   row_list = [ [ data_id, 0 ] for data_id in range(n_data) ]
+   dismod_at.create_table(
+      connection, 'data_subset', col_name, col_type, row_list
+   )
+   connection.close()
+   #
+   # command_list
+   command_list = [
+      [ 'dismod_at', file_name, 'set', 'option', 'random_seed', '321' ],
+      [ 'dismod_at', file_name, 'set', 'option', 'max_num_iter_fixed', '50' ],
+      [ 'dismod_at', file_name, 'bnd_mulcov', '2.0' ],
+   ]
+   at_cascade.light_command(command_list, file_name)
+   #
+   # hold_out
+   # The hold_out command is always run by dismod_at.
+   command = [ 'dismod_at', file_name, 'hold_out', 'Sincidence', '4' ]
+   ok      = False
+   try :
+      at_cascade.light_command( [ command ], file_name)
+   except AssertionError as error :
+      ok = str(error).startswith('light_command: not supported:')
+   assert ok
+   #
+   # connection
+   connection = dismod_at.create_connection(
+      file_name, new = False, readonly = True
+   )
+   #
+   # option table
+   option_value = dict()
+   for row in dismod_at.get_table_dict(connection, 'option') :
+      option_value[ row['option_name'] ] = row['option_value']
+   assert option_value['random_seed'] == '321'
+   assert option_value['max_num_iter_fixed'] == '50'
+   #
+   # data_subset table
+   data_subset_table = dismod_at.get_table_dict(connection, 'data_subset')
+   for row in data_subset_table :
+      assert row['hold_out'] == 0
+   #
+   # bnd_mulcov table
+   bnd_mulcov_table = dismod_at.get_table_dict(connection, 'bnd_mulcov')
+   assert len(bnd_mulcov_table) == 2
+   assert bnd_mulcov_table[0]['max_cov_diff'] == 0.5
+   assert bnd_mulcov_table[0]['max_mulcov']   == 4.0
+   assert bnd_mulcov_table[1]['max_mulcov']   is None
+   #
+   connection.close()
+   #
+   # compare_dismod_at
+   compare_dismod_at()
+   return
+#
+if __name__ == '__main__' :
+   main()
+   print('light_command: OK')
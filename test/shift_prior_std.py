@@ -0,0 +1,238 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: University of Washington <https://www.washington.edu>
+# SPDX-FileContributor: 2021-25 Bradley M. Bell
+# ---------------------------------------------------------------------------
+# Check that the vectorized standard deviations used for the child value
+# priors are the same as the per grid point calculation used previously.
+import os
+import sys
+import math
+import numpy
+#
+# import at_cascade with a preference current directory version
+current_directory = os.getcwd()
+if os.path.isfile( current_directory + '/at_cascade/__init__.py' ) :
+   sys.path.insert(0, current_directory)
+import at_cascade
+import dismod_at
+from at_cascade.create_shift_db import get_age_id_next_list
+from at_cascade.create_shift_db import get_time_id_next_list
+from at_cascade.create_shift_db import get_fit_std
+#
+# previous_std
+# This is the calculation that was done by add_shift_grid_row for each
+# grid point. Note that the samples for the last neighbor that was checked
+# (time before age) are used.
+def previous_std(
+   fit_fit_var, fit_sample, prior_row, key, age_id_next, time_id_next
+) :
+   (integrand_id, node_id, split_id, age_id, time_id) = key
+   #
+   # mean
+   mean = fit_fit_var[key]
+   mean = min(mean, prior_row['upper'])
+   mean = max(mean, prior_row['lower'])
+   #
+   # key
+   if age_id_next[age_id] != None :
+      key = (integrand_id, node_id, split_id, age_id_next[age_id], time_id)
+   if time_id_next[time_id] != None :
+      key = (integrand_id, node_id, split_id, age_id, time_id_next[time_id])
+   #
+   eta = prior_row['eta']
+   if eta is None :
+      return numpy.std(fit_sample[key], mean = mean)
+   log_sample = list()
+   for sample in fit_sample[key] :
+      sample = max( - eta / 5.0 , sample )
+      log_sample.append( math.log( sample + eta ) )
+   log_mean = math.log(mean + eta)
+   log_std  = numpy.std(log_sample, mean = log_mean, ddof = 0)
+   return (math.exp(log_std) - 1) * (mean + eta)
+#
+def main() :
+   #
+   # work_dir
+   work_dir = 'build/test'
+   at_cascade.empty_directory(work_dir)
+   os.chdir(work_dir)
+   #
+   # rng
+   rng = numpy.random.default_rng(seed = 123)
+   #
+   # age_table, time_table
+   age_table  = [ { 'age' : 0.0 }, { 'age' : 50.0 }, { 'age' : 100.0 } ]
+   time_table = [ { 'time' : 1990.0 }, { 'time' : 2020.0 } ]
+   #
+   # prior_table
+   prior_table = [
+      { 'lower' : 1e-6, 'upper' : 1.0, 'eta' : None },
+      { 'lower' : 1e-6, 'upper' : 1.0, 'eta' : 1e-3 },
+      { 'lower' : -1.0, 'upper' : 1.0, 'eta' : None },
+   ]
+   #
+   # smooth_table, smooth_grid_table
+   # smooth_id 0 is for iota, smooth_id 1 is for the covariate multiplier.
+   # The value prior alternates between with and without eta for iota.
+   smooth_table      = [
+      { 'n_age' : 3, 'n_time' : 2 }, { 'n_age' : 1, 'n_time' : 2 }
+   ]
+   smooth_grid_table = list()
+   for age_id in range(3) :
+      for time_id in range(2) :
+         smooth_grid_table.append( {
+            'smooth_id'      : 0,
+            'age_id'         : age_id,
+            'time_id'        : time_id,
+            'value_prior_id' : (age_id + time_id) % 2,
+         } )
+   for time_id in range(2) :
+      smooth_grid_table.append( {
+         'smooth_id'      : 1,
+         'age_id'         : 0,
+         'time_id'        : time_id,
+         'value_prior_id' : 2,
+      } )
+   smooth_grid_index = [ list(), list() ]
+   for row in smooth_grid_table :
+      smooth_grid_index[ row['smooth_id'] ].append( row )
+   #
+   # fit_table
+   # integrand_id 0 is Sincidence, integrand_id 1 is mulcov_0.
+   # The iota grid is for nodes 1 and 2, the mulcov grid has node None.
+   avgint_table = list()
+   for node_id in [ 1, 2 ] :
+      for row in smooth_grid_index[0] :
+         avgint_table.append( {
+            'integrand_id'         : 0,
+            'node_id'              : node_id,
+            'c_split_reference_id' : None,
+            'c_age_id'             : row['age_id'],
+            'c_time_id'            : row['time_id'],
+         } )
+   for row in smooth_grid_index[1] :
+      avgint_table.append( {
+         'integrand_id'         : 1,
+         'node_id'              : None,
+         'c_split_reference_id' : None,
+         'c_age_id'             : row['age_id'],
+         'c_time_id'            : row['time_id'],
+      } )
+   fit_table = {
+      'c_shift_avgint' : avgint_table,
+      'integrand'      : [
+         { 'integrand_name' : 'Sincidence' },
+         { 'integrand_name' : 'mulcov_0' },
+      ],
+      'mulcov'         : [ { 'group_smooth_id' : 1 } ],
+      'prior'          : prior_table,
+      'rate'           : [ { 'rate_name' : 'iota', 'parent_smooth_id' : 0 } ],
+   }
+   name_rate2integrand = { 'iota' : 'Sincidence' }
+   #
+   # fit_fit_var, fit_sample, row_list
+   n_sample    = 7
+   fit_fit_var = dict()
+   fit_sample  = dict()
+   row_list    = list()
+   for (avgint_id, row) in enumerate(avgint_table) :
+      key = (
+         row['integrand_id'],
+         row['node_id'],
+         row['c_split_reference_id'],
+         row['c_age_id'],
+         row['c_time_id'],
+      )
+      fit_fit_var[key] = rng.uniform(0.001, 0.05)
+      fit_sample[key]  = rng.uniform(0.0, 0.1, n_sample).tolist()
+      for sample_index in range(n_sample) :
+         value = fit_sample[key][sample_index]
+         row_list.append( [ sample_index, avgint_id, value ] )
+   #
+   # fit_database
+   fit_database = 'fit.db'
+   connection   = dismod_at.create_connection(
+      fit_database, new = True, readonly = False
+   )
+   dismod_at.create_table(
+      connection,
+      'c_shift_predict_sample',
+      [ 'sample_index', 'avgint_id', 'avg_integrand' ],
+      [ 'integer',      'integer',   'real' ],
+      row_list,
+   )
+   connection.close()
+   #
+   # age_id_next_list, time_id_next_list
+   age_id_next_list = get_age_id_next_list(
+      smooth_table, smooth_grid_table, age_table
+   )
+   time_id_next_list = get_time_id_next_list(
+      smooth_table, smooth_grid_table, time_table
+   )
+   #
+   # fit_std
+   fit_std = get_fit_std(
+      fit_database,
+      fit_table,
+      fit_fit_var,
+      name_rate2integrand,
+      smooth_grid_index,
+      age_id_next_list,
+      time_id_next_list,
+   )
+   #
+   # check
+   assert len(fit_std) == len(avgint_table)
+   for row in avgint_table :
+      smooth_id = 0 if row['integrand_id'] == 0 else 1
+      grid_row  = None
+      for candidate in smooth_grid_index[smooth_id] :
+         if candidate['age_id'] == row['c_age_id'] :
+            if candidate['time_id'] == row['c_time_id'] :
+               grid_row = candidate
+      prior_row = prior_table[ grid_row['value_prior_id'] ]
+      key = (
+         row['integrand_id'],
+         row['node_id'],
+         row['c_split_reference_id'],
+         row['c_age_id'],
+         row['c_time_id'],
+      )
+      check = previous_std(
+         fit_fit_var,
+         fit_sample,
+         prior_row,
+         key,
+         age_id_next_list[smooth_id],
+         time_id_next_list[smooth_id],
+      )
+      assert abs( fit_std[key] - check ) <= 1e-12 * abs(check)
+   #
+   # missing sample
+   # get_fit_std must not return a nan standard deviation
+   connection = dismod_at.create_connection(
+      fit_database, new = False, readonly = False
+   )
+   command = 'DELETE FROM c_shift_predict_sample WHERE avgint_id = 0'
+   dismod_at.sql_command(connection, command)
+   connection.close()
+   ok = False
+   try :
+      get_fit_std(
+         fit_database,
+         fit_table,
+         fit_fit_var,
+         name_rate2integrand,
+         smooth_grid_index,
+         age_id_next_list,
+         time_id_next_list,
+      )
+   except AssertionError as error :
+      ok = str(error).startswith('create_shift_db: c_shift_predict_sample')
+   assert ok
+   return
+#
+if __name__ == '__main__' :
+   main()
+   print('shift_prior_std: OK')
@@ -0,0 +1,93 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+# SPDX-FileCopyrightText: University of Washington <https://www.washington.edu>
+# SPDX-FileContributor: 2021-25 Bradley M. Bell
+# ---------------------------------------------------------------------------
+import os
+import sys
+import time
+import subprocess
+#
+# import at_cascade with a preference current directory version
+current_directory = os.getcwd()
+if os.path.isfile( current_directory + '/at_cascade/__init__.py' ) :
+   sys.path.insert(0, current_directory)
+import at_cascade
+import dismod_at
+#
+def main() :
+   #
+   # work_dir
+   work_dir = 'build/test'
+   at_cascade.empty_directory(work_dir)
+   os.chdir(work_dir)
+   #
+   # result_dir
+   result_dir = 'result'
+   for node_name in [ 'n0', 'n0/n1' ] :
+      os.makedirs( f'{result_dir}/{node_name}' )
+      database   = f'{result_dir}/{node_name}/dismod.db'
+      connection = dismod_at.create_connection(
+         database, new = True, readonly = False
+      )
+      connection.close()
+      #
+      # c_stage_resource
+      # The fit stage runs a child process that uses some cpu time.
+      stage_resource = at_cascade.stage_resource_class(database)
+      for stage in [ 'init', 'fit' ] :
+         stage_resource.start(stage)
+         if stage == 'fit' :
+            program  = 'import time\n'
+            program += 't = time.time()\n'
+            program += 'while time.time() < t + 0.1 : pass\n'
+            command  = [ sys.executable, '-c', program ]
+            process = subprocess.Popen(
+               command, stdout = subprocess.PIPE, encoding = 'utf-8'
+            )
+            (stdout, stderr) = stage_resource.communicate(process)
+            assert process.returncode == 0
+            assert stdout == '' and stderr is None
+         stage_resource.stop()
+   #
+   # drop
+   database       = f'{result_dir}/n0/n1/dismod.db'
+   stage_resource = at_cascade.stage_resource_class(database)
+   stage_resource.drop()
+   stage_resource.start('sample')
+   stage_resource.stop()
+   #
+   # stage_sum
+   stage_sum = at_cascade.sum_stage_resource(result_dir)
+   assert len(stage_sum) == 3
+   assert stage_sum[0]['stage'] == 'fit'
+   assert stage_sum[0]['n_run'] == 1
+   assert stage_sum[0]['wall_seconds'] >= 0.1
+   n_run = dict()
+   for row in stage_sum :
+      n_run[ row['stage'] ] = row['n_run']
+      assert row['user_seconds']   >= 0.0
+      assert row['system_seconds'] >= 0.0
+      if row['stage'] == 'fit' :
+         # the peak resident set size is only for the child processes
+         assert row['max_rss_kb']  > 0
+         assert row['user_seconds'] + row['system_seconds'] >= 0.05
+      else :
+         assert row['max_rss_kb'] == 0
+   assert n_run == { 'init' : 1, 'fit' : 1, 'sample' : 1 }
+   #
+   # timeout
+   stage_resource.start('fit')
+   command = [ sys.executable, '-c', 'import time\ntime.sleep(10)' ]
+   process = subprocess.Popen(command)
+   ok      = False
+   try :
+      stage_resource.communicate(process, timeout = 0.1)
+   except subprocess.TimeoutExpired :
+      ok = process.returncode != 0
+   assert ok
+   stage_resource.stop()
+   return
+#
+if __name__ == '__main__' :
+   main()
+   print('stage_resource: OK')